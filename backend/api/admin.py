@@ -0,0 +1,36 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import FileResponse
+from typing import List, Dict, Any
+
+from backend.db.models import User
+from backend.services.auth_service import get_current_admin_user
+from backend.utils.profiling import ProfileStore, FORMAT_COLLAPSED, PROFILE_EXTENSIONS
+from backend.config import PROFILING_DIR, PROFILING_MAX_FILES
+
+router = APIRouter()
+
+profile_store = ProfileStore(PROFILING_DIR, PROFILING_MAX_FILES)
+
+# List recently stored request profiles
+@router.get("/profiles", response_model=List[Dict[str, Any]])
+async def list_profiles(current_user: User = Depends(get_current_admin_user)):
+    """List stored request profiles, newest first (admin only)"""
+    return profile_store.list()
+
+# Download a stored profile
+@router.get("/profiles/{profile_id}")
+async def download_profile(profile_id: str, current_user: User = Depends(get_current_admin_user)):
+    """Download a profile as collapsed stacks or a pstats dump (admin only)"""
+    metadata = profile_store.get(profile_id)
+    path = profile_store.output_path(profile_id)
+    if metadata is None or path is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Profile {profile_id} not found"
+        )
+    fmt = metadata["format"]
+    return FileResponse(
+        path,
+        media_type="text/plain" if fmt == FORMAT_COLLAPSED else "application/octet-stream",
+        filename=f"{profile_id}.{PROFILE_EXTENSIONS[fmt]}"
+    )
@@ -1,10 +1,36 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional, Dict, Any
 import json
 
-from backend.db.models import get_db
+from backend.db.models import get_async_db
 from backend.services.agent_service import AgentService
+from backend.core.agent_manager import (
+    agent_manager,
+    task_manager,
+    TaskQueueFullError,
+    AGENT_ACTIVE,
+    AGENT_INACTIVE,
+)
+from backend.core.pipeline import Pipeline, PipelineStep, PipelineError
+from backend.core.analysis import (
+    StreamingAnalyzer,
+    CsvValueParser,
+    NdjsonValueParser,
+    LineBuffer,
+    DEFAULT_HISTOGRAM_BINS,
+)
+from backend.utils.serialization import ndjson_response, NDJSON_MEDIA_TYPE
+from backend.config import (
+    TASK_BATCH_LIMIT,
+    AGENT_BULK_LIMIT,
+    ANALYSIS_STREAM_BATCH_BYTES,
+    ANALYSIS_RESERVOIR_SIZE,
+    PAGE_SIZE_DEFAULT,
+    PAGE_SIZE_MAX,
+    PIPELINE_MAX_STEPS,
+)
 from pydantic import BaseModel
 
 # Create router
@@ -27,18 +53,147 @@ class AgentResponse(AgentBase):
     class Config:
         orm_mode = True
 
+class AgentBulkCreate(BaseModel):
+    agents: List[AgentCreate]
+
+class AgentBulkDelete(BaseModel):
+    ids: List[int]
+
+class AgentBulkItem(BaseModel):
+    index: int
+    status: str
+    id: Optional[int] = None
+    error: Optional[str] = None
+
+class AgentBulkCreateResponse(BaseModel):
+    total: int
+    created: int
+    failed: int
+    results: List[AgentBulkItem]
+
+class AgentBulkDeleteItem(BaseModel):
+    id: int
+    status: str
+    error: Optional[str] = None
+
+class AgentBulkDeleteResponse(BaseModel):
+    total: int
+    deleted: int
+    failed: int
+    results: List[AgentBulkDeleteItem]
+
+class TaskCreate(BaseModel):
+    type: str
+    data: Dict[str, Any] = {}
+
+class TaskJobResponse(BaseModel):
+    id: str
+    agent_id: int
+    type: str
+    status: str
+    progress: float
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    created_at: str
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+
+class TaskBatchCreate(BaseModel):
+    tasks: List[TaskCreate]
+
+class TaskBatchItem(BaseModel):
+    index: int
+    type: str
+    status: str
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+
+class TaskBatchResponse(BaseModel):
+    agent_id: int
+    total: int
+    succeeded: int
+    failed: int
+    results: List[TaskBatchItem]
+
+class PipelineStepCreate(BaseModel):
+    id: str
+    capability: str
+    input: Dict[str, Any] = {}
+    inputs: Dict[str, str] = {}
+    depends_on: List[str] = []
+
+class PipelineCreate(BaseModel):
+    steps: List[PipelineStepCreate]
+
+class PipelineStepResult(BaseModel):
+    id: str
+    capability: str
+    status: str
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    start_ms: Optional[float] = None
+    duration_ms: Optional[float] = None
+
+class PipelineResponse(BaseModel):
+    agent_id: int
+    status: str
+    duration_ms: float
+    layers: List[List[str]]
+    steps: List[PipelineStepResult]
+
 # Create agent service instance
 agent_service = AgentService()
 
-# Get all agents
+# Get a page of agents; the next page cursor is returned in the X-Next-Cursor header
 @router.get("/", response_model=List[AgentResponse])
-async def get_agents(db: Session = Depends(get_db)):
-    return agent_service.get_agents(db)
+async def get_agents(
+    limit: int = Query(PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX),
+    after: Optional[str] = None,
+    status_filter: Optional[str] = Query(None, alias="status"),
+    sort: str = "id",
+    capability: Optional[List[str]] = Query(None),
+    capability_match: str = Query("any", regex="^(any|all)$"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    try:
+        agents, next_cursor = await agent_service.get_agents(
+            db, limit=limit, after=after, status=status_filter, sort=sort,
+            capabilities=capability, capability_match=capability_match
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return Response(content=agents, media_type="application/json", headers=headers)
+
+# Create many agents in one transaction
+@router.post("/bulk", response_model=AgentBulkCreateResponse)
+async def bulk_create_agents(batch: AgentBulkCreate):
+    if len(batch.agents) > AGENT_BULK_LIMIT:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Batch exceeds the limit of {AGENT_BULK_LIMIT} agents"
+        )
+    return await agent_service.bulk_create_agents(batch.agents)
+
+# Soft delete many agents with one UPDATE
+@router.delete("/bulk", response_model=AgentBulkDeleteResponse)
+async def bulk_delete_agents(batch: AgentBulkDelete):
+    if len(batch.ids) > AGENT_BULK_LIMIT:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Batch exceeds the limit of {AGENT_BULK_LIMIT} agents"
+        )
+    return await agent_service.bulk_delete_agents(batch.ids)
+
+# Stream all active agents as NDJSON (gzipped if accepted); resume with after_id
+@router.get("/export", response_class=Response, responses={200: {"content": {NDJSON_MEDIA_TYPE: {}}}})
+async def export_agents(request: Request, after_id: Optional[int] = Query(None, ge=0)):
+    return ndjson_response(agent_service.export_agents(after_id), request.headers.get("accept-encoding"))
 
 # Get agent by ID
 @router.get("/{agent_id}", response_model=AgentResponse)
-async def get_agent(agent_id: int, db: Session = Depends(get_db)):
-    agent = agent_service.get_agent(db, agent_id)
+async def get_agent(agent_id: int, db: AsyncSession = Depends(get_async_db)):
+    agent = await agent_service.get_agent(db, agent_id)
     if not agent:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -48,13 +203,13 @@ async def get_agent(agent_id: int, db: Session = Depends(get_db)):
 
 # Create new agent
 @router.post("/", response_model=AgentResponse, status_code=status.HTTP_201_CREATED)
-async def create_agent(agent: AgentCreate, db: Session = Depends(get_db)):
-    return agent_service.create_agent(db, agent)
+async def create_agent(agent: AgentCreate):
+    return await agent_service.create_agent(agent)
 
 # Delete agent
 @router.delete("/{agent_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_agent(agent_id: int, db: Session = Depends(get_db)):
-    success = agent_service.delete_agent(db, agent_id)
+async def delete_agent(agent_id: int):
+    success = await agent_service.delete_agent(agent_id)
     if not success:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -66,3 +221,193 @@ async def delete_agent(agent_id: int, db: Session = Depends(get_db)):
 @router.get("/capabilities/available", response_model=List[str])
 async def get_available_capabilities():
     return agent_service.get_available_capabilities()
+
+# Get capability metadata
+@router.get("/capabilities/details", response_model=List[Dict[str, Any]])
+async def get_capability_details():
+    return agent_service.get_capability_details()
+
+# Get capability result cache statistics
+@router.get("/capabilities/cache/stats", response_model=Dict[str, Any])
+async def get_capability_cache_stats():
+    return agent_service.get_capability_cache_stats()
+
+# Get agent runtime cache statistics
+@router.get("/runtimes/stats", response_model=Dict[str, Any])
+async def get_runtime_stats():
+    return agent_manager.get_stats()
+
+# Activate an agent, warming its runtime for task dispatch
+@router.post("/{agent_id}/activate", response_model=AgentResponse)
+async def activate_agent(agent_id: int):
+    return await _set_agent_status(agent_id, AGENT_ACTIVE)
+
+# Deactivate an agent, dropping its runtime
+@router.post("/{agent_id}/deactivate", response_model=AgentResponse)
+async def deactivate_agent(agent_id: int):
+    return await _set_agent_status(agent_id, AGENT_INACTIVE)
+
+async def _set_agent_status(agent_id: int, agent_status: str) -> Dict[str, Any]:
+    agent = await agent_service.set_agent_status(agent_id, agent_status)
+    if not agent:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Agent with ID {agent_id} not found"
+        )
+    return agent
+
+# Get an agent's runtime: capabilities, status and task counters
+@router.get("/{agent_id}/runtime", response_model=Dict[str, Any])
+async def get_agent_runtime(agent_id: int, db: AsyncSession = Depends(get_async_db)):
+    agent = await agent_service.get_agent_runtime(db, agent_id)
+    if not agent:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Agent with ID {agent_id} not found"
+        )
+    return agent.to_dict()
+
+# Queue a task for an agent
+@router.post("/{agent_id}/tasks", response_model=TaskJobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def create_task(agent_id: int, task: TaskCreate, db: AsyncSession = Depends(get_async_db)):
+    agent = await agent_service.get_agent_runtime(db, agent_id)
+    if not agent:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Agent with ID {agent_id} not found"
+        )
+    try:
+        return task_manager.submit(agent, task.dict())
+    except TaskQueueFullError as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=str(e)
+        )
+
+# Run a batch of tasks for an agent
+@router.post("/{agent_id}/tasks/batch", response_model=TaskBatchResponse)
+async def run_task_batch(agent_id: int, batch: TaskBatchCreate, db: AsyncSession = Depends(get_async_db)):
+    if len(batch.tasks) > TASK_BATCH_LIMIT:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Batch exceeds the limit of {TASK_BATCH_LIMIT} tasks"
+        )
+    agent = await agent_service.get_agent_runtime(db, agent_id)
+    if not agent:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Agent with ID {agent_id} not found"
+        )
+    try:
+        results = await task_manager.run_batch(agent, [task.dict() for task in batch.tasks])
+    except TaskQueueFullError as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=str(e)
+        )
+    failed = sum(1 for item in results if item["error"])
+    return {
+        "agent_id": agent_id,
+        "total": len(results),
+        "succeeded": len(results) - failed,
+        "failed": failed,
+        "results": results
+    }
+
+# Run a DAG of capability steps for an agent in one request, feeding outputs into later steps
+@router.post("/{agent_id}/pipelines", response_model=PipelineResponse)
+async def run_pipeline(agent_id: int, spec: PipelineCreate, db: AsyncSession = Depends(get_async_db)):
+    if len(spec.steps) > PIPELINE_MAX_STEPS:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Pipeline exceeds the limit of {PIPELINE_MAX_STEPS} steps"
+        )
+    agent = await agent_service.get_agent_runtime(db, agent_id)
+    if not agent:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Agent with ID {agent_id} not found"
+        )
+    try:
+        pipeline = Pipeline([
+            PipelineStep(step.id, step.capability, step.input, step.inputs, step.depends_on)
+            for step in spec.steps
+        ])
+        pipeline.check_capabilities(agent.capabilities)
+    except PipelineError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    try:
+        result = await task_manager.run_pipeline(agent, pipeline)
+    except TaskQueueFullError as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=str(e)
+        )
+    return {"agent_id": agent_id, **result}
+
+# Stream a CSV or NDJSON upload through the data_analysis capability
+@router.post("/{agent_id}/analysis/stream", response_model=Dict[str, Any])
+async def stream_data_analysis(
+    agent_id: int,
+    request: Request,
+    format: Optional[str] = Query(None, regex="^(csv|ndjson)$"),
+    column: Optional[str] = None,
+    field: Optional[str] = None,
+    header: bool = True,
+    percentiles: Optional[List[float]] = Query(None),
+    bins: int = DEFAULT_HISTOGRAM_BINS,
+    db: AsyncSession = Depends(get_async_db)
+):
+    agent = await agent_service.get_agent_runtime(db, agent_id)
+    if not agent:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Agent with ID {agent_id} not found"
+        )
+    if "data_analysis" not in agent.capabilities:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Agent does not have the data_analysis capability"
+        )
+
+    # Pick the parser from the query string, falling back to the content type
+    if format is None:
+        content_type = request.headers.get("content-type", "")
+        format = "csv" if "csv" in content_type else "ndjson"
+    parser = CsvValueParser(column=column, has_header=header) if format == "csv" else NdjsonValueParser(field=field)
+    analyzer = StreamingAnalyzer(percentiles=percentiles, bins=bins, reservoir_size=ANALYSIS_RESERVOIR_SIZE)
+    lines_buffer = LineBuffer()
+
+    def consume(lines: List[str], final: bool = False):
+        analyzer.feed(parser.parse(lines, final))
+
+    # Parse in bounded batches off the event loop; only one batch is held at a time
+    try:
+        pending: List[str] = []
+        pending_bytes = 0
+        async for chunk in request.stream():
+            pending.extend(lines_buffer.feed(chunk))
+            pending_bytes += len(chunk)
+            if pending_bytes >= ANALYSIS_STREAM_BATCH_BYTES:
+                await run_in_threadpool(consume, pending)
+                pending, pending_bytes = [], 0
+        pending.extend(lines_buffer.close())
+        await run_in_threadpool(consume, pending, True)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid {format} input: {str(e)}"
+        )
+
+    return analyzer.result()
+
+# Get task status and result
+@router.get("/{agent_id}/tasks/{job_id}", response_model=TaskJobResponse)
+async def get_task(agent_id: int, job_id: str):
+    job = task_manager.get_job(job_id)
+    if not job or job["agent_id"] != agent_id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Task {job_id} not found for agent {agent_id}"
+        )
+    return job
@@ -1,18 +1,21 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
-from typing import Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional, Dict, Any
 from datetime import timedelta
 from pydantic import BaseModel, EmailStr, Field
 
-from backend.db.models import User, get_db
+from backend.db.models import User, get_async_db
 from backend.services.auth_service import (
     authenticate_user,
     create_user,
     create_access_token,
     create_refresh_token,
+    get_user_by_username,
     get_current_active_user,
+    get_current_admin_user,
     get_current_user,
+    get_principal_cache_stats,
 )
 from backend.config import ACCESS_TOKEN_EXPIRE_MINUTES
 
@@ -45,9 +48,9 @@ class TokenRefresh(BaseModel):
     refresh_token: str
 
 @router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-async def register(user_data: UserCreate, db: Session = Depends(get_db)):
+async def register(user_data: UserCreate, db: AsyncSession = Depends(get_async_db)):
     """Register a new user"""
-    user = create_user(
+    user = await create_user(
         db=db,
         username=user_data.username,
         email=user_data.email,
@@ -57,10 +60,10 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
     return user
 
 @router.post("/login", response_model=Token)
-async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
     """Login to get access token"""
     # Authenticate user
-    user = authenticate_user(db, form_data.username, form_data.password)
+    user = await authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -92,7 +95,7 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session =
     }
 
 @router.post("/refresh", response_model=Token)
-async def refresh_token(token_data: TokenRefresh, db: Session = Depends(get_db)):
+async def refresh_token(token_data: TokenRefresh, db: AsyncSession = Depends(get_async_db)):
     """Get a new access token using refresh token"""
     from jose import jwt, JWTError
     from backend.config import SECRET_KEY, ALGORITHM
@@ -113,7 +116,7 @@ async def refresh_token(token_data: TokenRefresh, db: Session = Depends(get_db))
             raise credentials_exception
         
         # Get user from database
-        user = db.query(User).filter(User.username == username).first()
+        user = await get_user_by_username(db, username)
         if user is None or not user.is_active:
             raise credentials_exception
         
@@ -139,3 +142,8 @@ async def refresh_token(token_data: TokenRefresh, db: Session = Depends(get_db))
 async def get_me(current_user: User = Depends(get_current_active_user)):
     """Get current user information"""
     return current_user
+
+@router.get("/cache/stats", response_model=Dict[str, Any])
+async def get_auth_cache_stats(current_user: User = Depends(get_current_admin_user)):
+    """Get authenticated principal cache statistics (admin only)"""
+    return get_principal_cache_stats()
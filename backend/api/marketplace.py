@@ -1,44 +1,212 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List, Dict, Any
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from typing import List, Dict, Any, Optional, AsyncIterator, Callable, Awaitable, Iterable, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
+import hashlib
+import json
 
-from backend.db.models import get_db
-from backend.services.marketplace_service import marketplace_service, MarketplaceListingCreate
+from backend.db.models import get_async_db
+from backend.services.marketplace_service import (
+    marketplace_service,
+    MarketplaceListingCreate,
+    LISTINGS_TAG,
+    listing_tag,
+)
+from backend.utils.serialization import dumps, ndjson_response, NDJSON_MEDIA_TYPE
+from backend.config import PAGE_SIZE_DEFAULT, PAGE_SIZE_MAX, MARKETPLACE_BULK_LIMIT, MARKETPLACE_BULK_MAX_LINE_BYTES
 
 # Create router
 router = APIRouter(prefix="/marketplace", tags=["marketplace"])
 
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Check an If-None-Match header against an ETag (weak comparison, as RFC 7232 requires for GET)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return any(tag[2:] == etag if tag.startswith("W/") else tag == etag for tag in candidates)
+
+async def _cached_response(request: Request, tags: Iterable[str],
+                           build: Callable[[], Awaitable[Tuple[Any, Dict[str, str]]]]) -> Response:
+    """
+    Serve a GET response from the marketplace response cache
+
+    Entries are keyed on path plus normalized query string and hold the encoded
+    body, a strong ETag and extra headers. build may return the body already
+    encoded as bytes. Clients revalidating with a matching If-None-Match get an
+    empty 304.
+    """
+    cache = marketplace_service.response_cache
+    key = f"{request.url.path}?{'&'.join(sorted(f'{k}={v}' for k, v in request.query_params.multi_items()))}"
+    entry = cache.get(key)
+    if entry is None:
+        generation = cache.generation
+        payload, headers = await build()
+        body = payload if isinstance(payload, bytes) else dumps(payload)
+        etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+        entry = (body, etag, headers)
+        cache.set(key, entry, tags=tags, generation=generation)
+
+    body, etag, headers = entry
+    response_headers = {"ETag": etag, "Cache-Control": "no-cache", **headers}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=response_headers)
+    return Response(content=body, media_type="application/json", headers=response_headers)
+
 @router.get("/listings", response_model=List[Dict[str, Any]])
-def get_all_listings(db: Session = Depends(get_db)):
-    """Get all marketplace listings"""
-    return marketplace_service.get_listings(db)
+async def get_all_listings(
+    request: Request,
+    limit: int = Query(PAGE_SIZE_DEFAULT, ge=1, le=PAGE_SIZE_MAX),
+    after: Optional[str] = None,
+    author: Optional[str] = None,
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    min_rating: Optional[float] = Query(None, ge=0),
+    sort: str = "id",
+    capability: Optional[List[str]] = Query(None),
+    capability_match: str = Query("any", regex="^(any|all)$"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get a page of marketplace listings; the next page cursor is returned in the X-Next-Cursor header"""
+    async def build():
+        try:
+            listings, next_cursor = await marketplace_service.get_listings(
+                db, limit=limit, after=after, author=author, min_price=min_price,
+                max_price=max_price, min_rating=min_rating, sort=sort,
+                capabilities=capability, capability_match=capability_match
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        return listings, {"X-Next-Cursor": next_cursor} if next_cursor else {}
+    
+    return await _cached_response(request, [LISTINGS_TAG], build)
+
+@router.get("/search", response_model=List[Dict[str, Any]])
+async def search_listings(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Search marketplace listings by name, description and author, ranked by relevance"""
+    body = await marketplace_service.search_listings(db, q, limit)
+    return Response(content=body, media_type="application/json")
+
+@router.get("/listings/export", response_class=Response, responses={200: {"content": {NDJSON_MEDIA_TYPE: {}}}})
+async def export_listings(request: Request, after_id: Optional[int] = Query(None, ge=0)):
+    """
+    Stream every listing as NDJSON in id order, gzipped if the client accepts it;
+    pass the last received id as after_id to resume an interrupted export
+    """
+    return ndjson_response(marketplace_service.export_listings(after_id), request.headers.get("accept-encoding"))
 
 @router.get("/listings/{listing_id}", response_model=Dict[str, Any])
-def get_listing(listing_id: int, db: Session = Depends(get_db)):
+async def get_listing(listing_id: int, request: Request, db: AsyncSession = Depends(get_async_db)):
     """Get a specific marketplace listing by ID"""
-    listing = marketplace_service.get_listing(db, listing_id)
-    if not listing:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Marketplace listing with id {listing_id} not found"
-        )
-    return listing
+    async def build():
+        listing = await marketplace_service.get_listing(db, listing_id)
+        if not listing:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Marketplace listing with id {listing_id} not found"
+            )
+        return listing, {}
+    
+    return await _cached_response(request, [listing_tag(listing_id)], build)
+
+@router.get("/cache/stats", response_model=Dict[str, Any])
+async def get_cache_stats():
+    """Get marketplace response cache and listing fragment cache hit/miss statistics"""
+    return dict(marketplace_service.response_cache.stats(), row_fragments=marketplace_service.row_fragments.stats())
 
 @router.post("/listings", response_model=Dict[str, Any], status_code=status.HTTP_201_CREATED)
-def create_listing(listing_data: MarketplaceListingCreate, db: Session = Depends(get_db)):
+async def create_listing(listing_data: MarketplaceListingCreate):
     """Create a new marketplace listing"""
     try:
-        return marketplace_service.create_listing(db, listing_data)
+        return await marketplace_service.create_listing(listing_data)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Failed to create listing: {str(e)}"
         )
 
+async def _ndjson_rows(request: Request, max_line_bytes: int = MARKETPLACE_BULK_MAX_LINE_BYTES) -> AsyncIterator[Any]:
+    """
+    Decode an NDJSON request body line by line as it streams in
+
+    Each line is decoded on its own, so a line that is not UTF-8, not JSON or
+    longer than max_line_bytes yields an exception for that row only; an
+    overlong line is skipped without being held in memory.
+    """
+    partial = b""
+    oversized = False
+    async for chunk in request.stream():
+        if oversized:
+            cut = chunk.find(b"\n")
+            if cut < 0:
+                continue
+            yield ValueError(f"Line exceeds {max_line_bytes} bytes")
+            oversized = False
+            chunk = chunk[cut + 1:]
+        lines = (partial + chunk).split(b"\n")
+        partial = lines.pop()
+        for line in lines:
+            row = _decode_row(line, max_line_bytes)
+            if row is not None:
+                yield row
+        if len(partial) > max_line_bytes:
+            partial, oversized = b"", True
+    if oversized:
+        yield ValueError(f"Line exceeds {max_line_bytes} bytes")
+    else:
+        row = _decode_row(partial, max_line_bytes)
+        if row is not None:
+            yield row
+
+def _decode_row(line: bytes, max_line_bytes: int) -> Any:
+    """Decode one NDJSON line; None for blank lines, an exception for bad ones"""
+    if len(line) > max_line_bytes:
+        return ValueError(f"Line exceeds {max_line_bytes} bytes")
+    try:
+        text = line.decode("utf-8")
+    except UnicodeDecodeError as e:
+        return ValueError(f"Invalid UTF-8: {str(e)}")
+    if not text.strip():
+        return None
+    try:
+        return json.loads(text)
+    except ValueError as e:
+        return ValueError(f"Invalid JSON: {str(e)}")
+
+async def _json_array_rows(request: Request) -> AsyncIterator[Any]:
+    """Decode a JSON array request body"""
+    try:
+        rows = json.loads(await request.body())
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid JSON: {str(e)}")
+    if not isinstance(rows, list):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Expected a JSON array of listings")
+    if len(rows) > MARKETPLACE_BULK_LIMIT:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Import exceeds the limit of {MARKETPLACE_BULK_LIMIT} listings"
+        )
+    for row in rows:
+        yield row
+
+@router.post("/listings/bulk", response_model=Dict[str, Any])
+async def bulk_create_listings(request: Request):
+    """
+    Import many listings at once from a JSON array or a streamed NDJSON body
+    (Content-Type application/x-ndjson); returns a result for every row
+    """
+    content_type = request.headers.get("content-type", "")
+    rows = _ndjson_rows(request) if "ndjson" in content_type else _json_array_rows(request)
+    return await marketplace_service.bulk_create_listings(rows)
+
 @router.put("/listings/{listing_id}", response_model=Dict[str, Any])
-def update_listing(listing_id: int, listing_data: Dict[str, Any], db: Session = Depends(get_db)):
+async def update_listing(listing_id: int, listing_data: Dict[str, Any]):
     """Update a marketplace listing"""
-    updated_listing = marketplace_service.update_listing(db, listing_id, listing_data)
+    updated_listing = await marketplace_service.update_listing(listing_id, listing_data)
     if not updated_listing:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -47,9 +215,9 @@ def update_listing(listing_id: int, listing_data: Dict[str, Any], db: Session =
     return updated_listing
 
 @router.delete("/listings/{listing_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_listing(listing_id: int, db: Session = Depends(get_db)):
+async def delete_listing(listing_id: int):
     """Delete a marketplace listing"""
-    success = marketplace_service.delete_listing(db, listing_id)
+    success = await marketplace_service.delete_listing(listing_id)
     if not success:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -58,9 +226,9 @@ def delete_listing(listing_id: int, db: Session = Depends(get_db)):
     return None
 
 @router.post("/listings/{listing_id}/install", status_code=status.HTTP_200_OK)
-def install_agent(listing_id: int, db: Session = Depends(get_db)):
+async def install_agent(listing_id: int, db: AsyncSession = Depends(get_async_db)):
     """Install an agent from the marketplace"""
-    success = marketplace_service.install_agent(db, listing_id)
+    success = await marketplace_service.install_agent(db, listing_id)
     if not success:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -11,10 +11,69 @@ SECRET_KEY = os.getenv("SECRET_KEY", "temporarysecretkeyforthisproject")  # In p
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30  # 30 minutes
 REFRESH_TOKEN_EXPIRE_DAYS = 7  # 7 days
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))  # bcrypt cost; stored hashes with another cost are rehashed on login
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "4"))  # Threads dedicated to bcrypt
+PASSWORD_HASH_QUEUE_LIMIT = int(os.getenv("PASSWORD_HASH_QUEUE_LIMIT", "64"))  # In-flight hash operations before 429
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))  # Verified tokens cached per worker
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", "60"))  # Seconds a verified token skips JWT decode + user lookup
 
 # Database settings
-DB_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "aistaff.db")
+DB_PATH = os.getenv("DB_PATH", os.path.join(os.path.dirname(os.path.dirname(__file__)), "aistaff.db"))
 DATABASE_URL = f"sqlite:///{DB_PATH}"
+DB_STORAGE_MODE = os.getenv("DB_STORAGE_MODE", "rollback")  # "rollback" (SQLite default journal) or "wal" (WAL, tuned pragmas, read-only read pool)
+DB_BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))  # How long a connection waits on a lock before "database is locked"
+DB_READ_POOL_SIZE = int(os.getenv("DB_READ_POOL_SIZE", "8"))  # Read-only connections kept open in wal mode
+DB_GROUP_COMMIT_MAX_BATCH = int(os.getenv("DB_GROUP_COMMIT_MAX_BATCH", "128"))  # Writes merged into one group commit
+
+# Pagination settings
+PAGE_SIZE_DEFAULT = 100
+PAGE_SIZE_MAX = 1000
+ROW_FRAGMENT_CACHE_SIZE = int(os.getenv("ROW_FRAGMENT_CACHE_SIZE", "50000"))  # Encoded rows cached per list endpoint (agents, listings)
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))  # Rows read per query by the NDJSON export endpoints
+
+# Marketplace response cache settings
+MARKETPLACE_CACHE_SIZE = int(os.getenv("MARKETPLACE_CACHE_SIZE", "1024"))  # Cached responses kept (LRU)
+MARKETPLACE_CACHE_TTL = float(os.getenv("MARKETPLACE_CACHE_TTL", "30"))  # Seconds before a cached response expires
+DOWNLOAD_FLUSH_INTERVAL = float(os.getenv("DOWNLOAD_FLUSH_INTERVAL", "5"))  # Seconds install counts are buffered before one batched UPDATE
+MARKETPLACE_BULK_LIMIT = int(os.getenv("MARKETPLACE_BULK_LIMIT", "100000"))  # Max rows accepted by one bulk import
+MARKETPLACE_BULK_CHUNK_SIZE = int(os.getenv("MARKETPLACE_BULK_CHUNK_SIZE", "500"))  # Rows inserted per executemany transaction
+MARKETPLACE_BULK_MAX_LINE_BYTES = int(os.getenv("MARKETPLACE_BULK_MAX_LINE_BYTES", str(1024 * 1024)))  # Longer NDJSON lines are reported as row errors
+
+# Agent settings
+AGENT_BULK_LIMIT = int(os.getenv("AGENT_BULK_LIMIT", "10000"))  # Max agents created or deleted by one bulk request
+AGENT_RUNTIME_CACHE_SIZE = int(os.getenv("AGENT_RUNTIME_CACHE_SIZE", "10000"))  # Agent runtimes kept in memory for task dispatch (LRU)
+
+# Task execution settings
+TASK_WORKERS = int(os.getenv("TASK_WORKERS", "4"))  # Size of the worker pool running agent tasks
+TASK_QUEUE_LIMIT = int(os.getenv("TASK_QUEUE_LIMIT", "1000"))  # Max queued + running jobs before rejecting
+TASK_RESULT_RETENTION = int(os.getenv("TASK_RESULT_RETENTION", "1000"))  # Finished jobs kept for polling
+TASK_BATCH_LIMIT = int(os.getenv("TASK_BATCH_LIMIT", "10000"))  # Max inputs accepted in one batch request
+TASK_BATCH_CHUNK_SIZE = int(os.getenv("TASK_BATCH_CHUNK_SIZE", "256"))  # Inputs per worker chunk within a capability group
+PIPELINE_MAX_STEPS = int(os.getenv("PIPELINE_MAX_STEPS", "100"))  # Max capability steps in one pipeline request
+
+# Capability result cache settings
+CAPABILITY_CACHE_ENABLED = os.getenv("CAPABILITY_CACHE_ENABLED", "false").lower() == "true"  # Memoize results of capabilities declared cacheable
+CAPABILITY_CACHE_SIZE = int(os.getenv("CAPABILITY_CACHE_SIZE", "10000"))  # Max cached results (LRU)
+CAPABILITY_CACHE_MAX_BYTES = int(os.getenv("CAPABILITY_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))  # Approximate memory held by cached results
+CAPABILITY_CACHE_TTL = float(os.getenv("CAPABILITY_CACHE_TTL", "300"))  # Seconds a result is reused unless its capability sets cache_ttl
+
+# Streaming analysis settings
+ANALYSIS_STREAM_BATCH_BYTES = int(os.getenv("ANALYSIS_STREAM_BATCH_BYTES", str(1024 * 1024)))  # Bytes parsed per worker hand-off
+ANALYSIS_RESERVOIR_SIZE = int(os.getenv("ANALYSIS_RESERVOIR_SIZE", "20000"))  # Sample size for approximate percentiles
+
+# Metrics settings
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"  # Request, query and capability metrics served at /metrics
+
+# Profiling settings
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() == "true"  # Install the request profiling middleware and admin profile routes
+PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", "0"))  # Fraction of requests profiled without an X-Profile header
+PROFILING_FORMAT = os.getenv("PROFILING_FORMAT", "collapsed")  # Default output: "collapsed" (flamegraph stacks) or "pstats" (cProfile)
+PROFILING_INTERVAL_MS = float(os.getenv("PROFILING_INTERVAL_MS", "1"))  # Stack sampling interval for collapsed output
+PROFILING_DIR = os.getenv("PROFILING_DIR", os.path.join(os.path.dirname(os.path.dirname(__file__)), "profiles"))  # Where profiles are stored
+PROFILING_MAX_FILES = int(os.getenv("PROFILING_MAX_FILES", "50"))  # Profiles kept before the oldest are deleted
+
+# Startup settings
+STARTUP_REPORT = os.getenv("STARTUP_REPORT", "false").lower() == "true"  # Log per-module import times and time to first request
 
 # CORS settings
 CORS_ORIGINS = [
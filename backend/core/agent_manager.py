@@ -0,0 +1,386 @@
+import asyncio
+import logging
+import math
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+from backend.config import (
+    TASK_WORKERS,
+    TASK_QUEUE_LIMIT,
+    TASK_RESULT_RETENTION,
+    TASK_BATCH_CHUNK_SIZE,
+    AGENT_RUNTIME_CACHE_SIZE,
+)
+from backend.core.intelligence import intelligence_engine
+from backend.core.pipeline import Pipeline
+from backend.utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Job states
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+
+# Agent statuses
+AGENT_ACTIVE = "active"
+AGENT_INACTIVE = "inactive"
+
+class TaskQueueFullError(Exception):
+    """Raised when the task queue cannot accept any more jobs"""
+
+class AgentRuntime:
+    """
+    In-memory state of an agent used to dispatch its tasks.
+    Holds the agent's capability set with each handler resolved up front, and
+    counts the tasks its capabilities run (updated from worker threads).
+    """
+
+    def __init__(self, agent_id: int, name: str, capabilities: Iterable[str], status: str):
+        self.id = agent_id
+        self.name = name
+        self.capabilities = frozenset(capabilities)
+        self.status = status
+        registry = intelligence_engine.registry
+        self.handlers = {
+            capability: registry.get_handler(capability)
+            for capability in self.capabilities if capability in registry
+        }
+        self.loaded_at = datetime.utcnow()
+        self.tasks_completed = 0
+        self.tasks_failed = 0
+        self.last_task_at: Optional[datetime] = None
+        self._lock = threading.Lock()
+
+    def process_task(self, task_input: Dict[str, Any]) -> Dict[str, Any]:
+        """Run a task input ("type" and "data" keys) with the capability matching its type"""
+        if not self.capabilities:
+            return {"error": "Agent has no capabilities configured"}
+        task_type = task_input.get("type", "")
+        if task_type not in self.capabilities:
+            return {"error": f"No matching capability for task type '{task_type}'"}
+        return self.execute(task_type, task_input.get("data", {}))
+
+    def execute(self, capability: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Execute one of the agent's capabilities and count the outcome"""
+        result = intelligence_engine.execute_capability(capability, data, self.handlers.get(capability))
+        failed = isinstance(result, dict) and "error" in result
+        with self._lock:
+            if failed:
+                self.tasks_failed += 1
+            else:
+                self.tasks_completed += 1
+            self.last_task_at = datetime.utcnow()
+        return result
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "id": self.id,
+                "name": self.name,
+                "capabilities": sorted(self.capabilities),
+                "status": self.status,
+                "loaded_at": self.loaded_at.isoformat(),
+                "tasks_completed": self.tasks_completed,
+                "tasks_failed": self.tasks_failed,
+                "last_task_at": self.last_task_at.isoformat() if self.last_task_at else None,
+            }
+
+class AgentManager:
+    """
+    Bounded LRU of active agent runtimes.
+    Dispatching a task for a cached agent needs no database reads. Runtimes are
+    loaded by AgentService on a miss and invalidated whenever an agent is
+    created, deleted or changes status; a load that raced with an invalidation,
+    or of an inactive agent, is returned but not cached.
+    """
+
+    def __init__(self, maxsize: int = AGENT_RUNTIME_CACHE_SIZE):
+        self._cache = TTLCache(maxsize=maxsize, ttl=math.inf)
+
+    @property
+    def generation(self) -> int:
+        """Observe before reading an agent from the database and pass to load()"""
+        return self._cache.generation
+
+    def get(self, agent_id: int) -> Optional[AgentRuntime]:
+        """Get a cached runtime, refreshing its LRU position"""
+        return self._cache.get(agent_id)
+
+    def load(self, agent: Dict[str, Any], generation: Optional[int] = None) -> AgentRuntime:
+        """
+        Build a runtime from an agent as formatted by AgentService, caching it if the agent is active
+
+        Args:
+            agent: Agent with id, name, capabilities and status
+            generation: Generation observed before the agent was read
+        """
+        runtime = AgentRuntime(agent["id"], agent["name"], agent["capabilities"], agent["status"])
+        if runtime.status == AGENT_ACTIVE:
+            self._cache.set(runtime.id, runtime, generation=generation)
+        return runtime
+
+    def invalidate(self, *agent_ids: int):
+        for agent_id in agent_ids:
+            self._cache.invalidate(agent_id)
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = self._cache.stats()
+        stats.pop("ttl", None)
+        return stats
+
+class TaskManager:
+    """
+    Runs agent tasks on a bounded worker pool.
+    Jobs are accepted immediately and executed off the request path; their
+    status, progress and result are kept in memory so clients can poll them.
+    """
+
+    def __init__(self, max_workers: int = TASK_WORKERS, max_pending: int = TASK_QUEUE_LIMIT,
+                 retention: int = TASK_RESULT_RETENTION):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.retention = retention
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._pending = 0
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        """Worker pool, created on first use"""
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    logger.info(f"Starting task worker pool with {self.max_workers} workers")
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers,
+                        thread_name_prefix="agent-task"
+                    )
+        return self._executor
+
+    def submit(self, agent: AgentRuntime, task_input: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Queue a task for an agent
+
+        Args:
+            agent: Runtime of the agent running the task
+            task_input: Task input with "type" and "data" keys
+
+        Returns:
+            Snapshot of the queued job
+
+        Raises:
+            TaskQueueFullError: If too many jobs are already queued or running
+        """
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._reserve(1)
+            job = {
+                "id": job_id,
+                "agent_id": agent.id,
+                "type": task_input.get("type", ""),
+                "status": JOB_QUEUED,
+                "progress": 0.0,
+                "result": None,
+                "error": None,
+                "created_at": datetime.utcnow().isoformat(),
+                "started_at": None,
+                "finished_at": None,
+            }
+            self._jobs[job_id] = job
+            snapshot = dict(job)
+
+        try:
+            self.executor.submit(self._run, job_id, agent, task_input)
+        except RuntimeError:
+            # Executor is shutting down
+            with self._lock:
+                self._pending -= 1
+                self._jobs.pop(job_id, None)
+            raise TaskQueueFullError("Task workers are shutting down")
+
+        logger.info(f"Queued task {job_id} for agent {agent.id}")
+        return snapshot
+
+    async def run_batch(self, agent: AgentRuntime, tasks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Run many task inputs for one agent and wait for all of them
+
+        Inputs are grouped by task type; each group is split into chunks that run
+        concurrently on the worker pool through AgentRuntime.execute.
+
+        Args:
+            agent: Runtime of the agent running the batch
+            tasks: Task inputs with "type" and "data" keys
+
+        Returns:
+            One result entry per input, in input order
+
+        Raises:
+            TaskQueueFullError: If the batch's chunks don't fit in the task queue
+        """
+        agent_capabilities = agent.capabilities
+        results: List[Optional[Dict[str, Any]]] = [None] * len(tasks)
+
+        # Group inputs by capability, rejecting unsupported types up front
+        groups: Dict[str, List[Tuple[int, Dict[str, Any]]]] = {}
+        for index, task in enumerate(tasks):
+            task_type = task.get("type", "")
+            if task_type not in agent_capabilities:
+                results[index] = self._batch_entry(
+                    index, task_type, None, f"No matching capability for task type '{task_type}'"
+                )
+                continue
+            groups.setdefault(task_type, []).append((index, task.get("data", {})))
+
+        chunks = [
+            (capability, items[start:start + TASK_BATCH_CHUNK_SIZE])
+            for capability, items in groups.items()
+            for start in range(0, len(items), TASK_BATCH_CHUNK_SIZE)
+        ]
+        # Each chunk counts as a pending job until it finishes on its worker
+        with self._lock:
+            self._reserve(len(chunks))
+
+        loop = asyncio.get_running_loop()
+        futures = []
+        for launched, (capability, chunk) in enumerate(chunks):
+            try:
+                futures.append(loop.run_in_executor(self.executor, self._run_chunk, agent, capability, chunk))
+            except RuntimeError:
+                # Executor is shutting down
+                self._release(len(chunks) - launched)
+                raise TaskQueueFullError("Task workers are shutting down")
+
+        for chunk_results in await asyncio.gather(*futures):
+            for entry in chunk_results:
+                results[entry["index"]] = entry
+        return results
+
+    async def run_pipeline(self, agent: AgentRuntime, pipeline: Pipeline) -> Dict[str, Any]:
+        """
+        Run a pipeline of capability steps for one agent on the worker pool
+
+        Capabilities must already be checked against the agent with
+        Pipeline.check_capabilities. Every step counts as a pending job until
+        the pipeline finishes.
+
+        Raises:
+            TaskQueueFullError: If the pipeline's steps don't fit in the task queue
+        """
+        step_count = len(pipeline.steps)
+        with self._lock:
+            self._reserve(step_count)
+        try:
+            return await pipeline.run(agent.execute, self.executor)
+        finally:
+            self._release(step_count)
+
+    def _reserve(self, count: int):
+        """Count jobs against the queue limit (lock must be held)"""
+        if self._pending + count > self.max_pending:
+            raise TaskQueueFullError(f"Task queue is full ({self.max_pending} pending jobs)")
+        self._pending += count
+
+    def _release(self, count: int = 1):
+        with self._lock:
+            self._pending -= count
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Get a snapshot of a job by ID"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get queue statistics"""
+        with self._lock:
+            running = sum(1 for job in self._jobs.values() if job["status"] == JOB_RUNNING)
+            return {
+                "workers": self.max_workers,
+                "pending": self._pending,
+                "running": running,
+                "queued": self._pending - running,
+                "max_pending": self.max_pending,
+                "tracked_jobs": len(self._jobs),
+            }
+
+    def shutdown(self, wait: bool = False):
+        """Stop the worker pool, dropping jobs that have not started"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+            self._executor = None
+
+    def _update(self, job_id: str, **fields):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job:
+                job.update(fields)
+
+    def _run(self, job_id: str, agent: AgentRuntime, task_input: Dict[str, Any]):
+        """Execute a job on a worker thread"""
+        self._update(job_id, status=JOB_RUNNING, progress=0.1, started_at=datetime.utcnow().isoformat())
+        try:
+            result = agent.process_task(task_input)
+        except Exception as e:
+            logger.error(f"Task {job_id} crashed: {str(e)}")
+            result = {"error": f"Error processing task: {str(e)}"}
+
+        error = result.get("error") if isinstance(result, dict) else None
+        with self._lock:
+            self._pending -= 1
+            job = self._jobs.get(job_id)
+            if job:
+                job.update(
+                    status=JOB_FAILED if error else JOB_COMPLETED,
+                    progress=1.0,
+                    result=None if error else result,
+                    error=error,
+                    finished_at=datetime.utcnow().isoformat(),
+                )
+            self._evict_finished()
+
+    def _run_chunk(self, agent: AgentRuntime, capability: str,
+                   items: List[Tuple[int, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        """Execute one chunk of a batch group on a worker thread"""
+        entries = []
+        try:
+            for index, data in items:
+                result = agent.execute(capability, data)
+                error = result.get("error") if isinstance(result, dict) else None
+                entries.append(self._batch_entry(index, capability, None if error else result, error))
+        finally:
+            self._release()
+        return entries
+
+    @staticmethod
+    def _batch_entry(index: int, task_type: str, result: Optional[Dict[str, Any]], error: Optional[str]) -> Dict[str, Any]:
+        return {
+            "index": index,
+            "type": task_type,
+            "status": JOB_FAILED if error else JOB_COMPLETED,
+            "result": result,
+            "error": error,
+        }
+
+    def _evict_finished(self):
+        """Drop the oldest finished jobs beyond the retention limit (lock must be held)"""
+        excess = len(self._jobs) - self.retention
+        if excess <= 0:
+            return
+        for job_id in list(self._jobs):
+            if excess <= 0:
+                break
+            if self._jobs[job_id]["status"] in (JOB_COMPLETED, JOB_FAILED):
+                del self._jobs[job_id]
+                excess -= 1
+
+# Create singleton instances
+agent_manager = AgentManager()
+task_manager = TaskManager()
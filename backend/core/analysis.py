@@ -0,0 +1,492 @@
+import csv
+import json
+import math
+import random
+from array import array
+from collections import Counter
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+
+_numpy = None
+_numpy_loaded = False
+
+def _np():
+    """NumPy, imported on first use so loading this module stays cheap; None if not installed"""
+    global _numpy, _numpy_loaded
+    if not _numpy_loaded:
+        try:
+            import numpy
+        except ImportError:  # NumPy is optional; fall back to array-backed pure Python
+            numpy = None
+        _numpy = numpy
+        _numpy_loaded = True
+    return _numpy
+
+DEFAULT_PERCENTILES = (25, 50, 75, 90, 95, 99)
+DEFAULT_HISTOGRAM_BINS = 10
+MAX_HISTOGRAM_BINS = 1000
+TOP_STRING_VALUES = 5
+
+# type_counts key for NaN and infinite numbers, which are left out of the statistics
+NON_FINITE = "non_finite"
+
+def _type_name(value: Any) -> str:
+    if value is None:
+        return "null"
+    if isinstance(value, str):
+        return "string"
+    if isinstance(value, dict):
+        return "object"
+    if isinstance(value, list):
+        return "array"
+    return type(value).__name__
+
+def partition_values(data: Sequence[Any]) -> Tuple[array, Dict[str, int], List[str]]:
+    """
+    Split raw input into a contiguous array of finite floats and the remainder
+
+    NaN and infinite numbers are counted under NON_FINITE instead of being kept
+    in the array.
+
+    Returns:
+        Tuple of (numeric values, counts per non-numeric type, string values)
+    """
+    # Fast path: homogeneous finite numeric input converts in one C-level pass
+    try:
+        numeric = array("d", data)
+    except (TypeError, OverflowError):
+        pass
+    else:
+        if _all_finite(numeric):
+            return numeric, {}, []
+
+    numeric = array("d")
+    append = numeric.append
+    isfinite = math.isfinite
+    type_counts: Dict[str, int] = {}
+    strings: List[str] = []
+    for value in data:
+        if isinstance(value, (int, float)):
+            try:
+                if isfinite(value):
+                    append(value)
+                    continue
+                name = NON_FINITE
+            except OverflowError:
+                name = _type_name(value)
+        else:
+            name = _type_name(value)
+        type_counts[name] = type_counts.get(name, 0) + 1
+        if name == "string":
+            strings.append(value)
+    return numeric, type_counts, strings
+
+def _all_finite(values: array) -> bool:
+    np = _np()
+    if np is not None:
+        return bool(np.isfinite(np.frombuffer(values, dtype=np.float64)).all())
+    return all(map(math.isfinite, values))
+
+def _normalize_bins(bins: Any) -> int:
+    try:
+        bins = int(bins)
+    except (TypeError, ValueError):
+        return DEFAULT_HISTOGRAM_BINS
+    return max(1, min(bins, MAX_HISTOGRAM_BINS))
+
+def _interpolate(sorted_values: Sequence[float], q: float) -> float:
+    """Linear-interpolated percentile of pre-sorted values (same method as numpy's default)"""
+    position = (len(sorted_values) - 1) * q / 100.0
+    lower = math.floor(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    fraction = position - lower
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * fraction
+
+def _histogram(values: Sequence[float], bins: int, minimum: float, maximum: float) -> Dict[str, List]:
+    """Equal-width histogram over [minimum, maximum] (pure Python fallback)"""
+    if maximum == minimum:
+        minimum, maximum = minimum - 0.5, maximum + 0.5
+    width = (maximum - minimum) / bins
+    counts = [0] * bins
+    last = bins - 1
+    for value in values:
+        index = int((value - minimum) / width)
+        counts[index if index < last else last] += 1
+    edges = [minimum + width * i for i in range(bins)] + [maximum]
+    return {"bin_edges": edges, "counts": counts}
+
+def format_numeric_stats(count: int, total: float, mean: float, variance: float,
+                         minimum: float, maximum: float, percentiles: Dict[str, float],
+                         histogram: Optional[Dict[str, List]]) -> Dict[str, Any]:
+    """Shape numeric statistics the way the data_analysis capability reports them"""
+    return {
+        "numeric_count": count,
+        "sum": total,
+        "average": mean,
+        "min": minimum,
+        "max": maximum,
+        "variance": variance,
+        "stddev": math.sqrt(variance),
+        "percentiles": percentiles,
+        "histogram": histogram,
+    }
+
+def describe_numeric(values: array, percentiles: Sequence[float] = DEFAULT_PERCENTILES,
+                     bins: int = DEFAULT_HISTOGRAM_BINS) -> Dict[str, Any]:
+    """Compute summary statistics over a non-empty array of finite floats"""
+    count = len(values)
+    np = _np()
+    if np is not None:
+        arr = np.frombuffer(values, dtype=np.float64)
+        total = float(arr.sum())
+        mean = total / count
+        variance = float(np.mean(np.square(arr - mean)))
+        sorted_arr = np.sort(arr)
+        minimum, maximum = float(sorted_arr[0]), float(sorted_arr[-1])
+        points = np.percentile(sorted_arr, percentiles) if percentiles else []
+        percentile_values = {f"p{q:g}": float(v) for q, v in zip(percentiles, points)}
+        hist_range = (minimum, maximum) if maximum > minimum else (minimum - 0.5, maximum + 0.5)
+        counts, edges = np.histogram(sorted_arr, bins=bins, range=hist_range)
+        histogram = {"bin_edges": edges.tolist(), "counts": counts.tolist()}
+    else:
+        total = math.fsum(values)
+        mean = total / count
+        variance = math.fsum((x - mean) ** 2 for x in values) / count
+        sorted_values = sorted(values)
+        minimum, maximum = sorted_values[0], sorted_values[-1]
+        percentile_values = {f"p{q:g}": _interpolate(sorted_values, q) for q in percentiles}
+        histogram = _histogram(sorted_values, bins, minimum, maximum)
+
+    return format_numeric_stats(count, total, mean, variance, minimum, maximum, percentile_values, histogram)
+
+def data_type_label(numeric_count: int, total_count: int) -> str:
+    if numeric_count == total_count:
+        return "numeric"
+    if numeric_count == 0:
+        return "non-numeric"
+    return "mixed"
+
+def analyze_data(data: Sequence[Any], percentiles: Optional[Sequence[float]] = None,
+                 bins: Any = DEFAULT_HISTOGRAM_BINS) -> Dict[str, Any]:
+    """
+    Analyze a list of values
+
+    Numeric values are coerced once into a contiguous float array and summarized
+    in vectorized passes; the remaining values are partitioned by type.
+
+    Args:
+        data: Values to analyze
+        percentiles: Percentiles (0-100) to report, defaults to DEFAULT_PERCENTILES
+        bins: Number of equal-width histogram bins
+
+    Returns:
+        Dictionary with the analysis results
+    """
+    if percentiles is None:
+        percentiles = DEFAULT_PERCENTILES
+    percentiles = [float(q) for q in percentiles if 0 <= float(q) <= 100]
+
+    numeric, type_counts, strings = partition_values(data)
+    result: Dict[str, Any] = {
+        "count": len(data),
+        "type": data_type_label(len(numeric), len(data)),
+    }
+    if numeric:
+        result.update(describe_numeric(numeric, percentiles, _normalize_bins(bins)))
+    if type_counts:
+        result["type_counts"] = dict(type_counts, number=len(numeric))
+    if strings:
+        result["strings"] = {
+            "count": len(strings),
+            "unique": len(set(strings)),
+            "top": [{"value": value, "count": count}
+                    for value, count in Counter(strings).most_common(TOP_STRING_VALUES)],
+        }
+    return result
+
+class _SpaceSaving:
+    """Bounded approximate frequency counter (Space-Saving algorithm)"""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.counts: Dict[str, int] = {}
+
+    def add(self, value: str):
+        counts = self.counts
+        if value in counts:
+            counts[value] += 1
+        elif len(counts) < self.capacity:
+            counts[value] = 1
+        else:
+            victim = min(counts, key=counts.get)
+            counts[value] = counts.pop(victim) + 1
+
+    def most_common(self, n: int) -> List[Tuple[str, int]]:
+        return sorted(self.counts.items(), key=lambda item: item[1], reverse=True)[:n]
+
+class StreamingAnalyzer:
+    """
+    Constant-memory data analysis over a stream of value chunks.
+
+    Count, mean, variance, min and max are exact (per-chunk moments merged with
+    Chan's parallel algorithm); percentiles and the histogram are estimated from
+    a fixed-size uniform reservoir sample. Results use the same shape as
+    analyze_data, with "approximate" set when the reservoir overflowed.
+    """
+
+    def __init__(self, percentiles: Optional[Sequence[float]] = None,
+                 bins: Any = DEFAULT_HISTOGRAM_BINS, reservoir_size: int = 20000,
+                 seed: Optional[int] = None):
+        if percentiles is None:
+            percentiles = DEFAULT_PERCENTILES
+        self.percentiles = [float(q) for q in percentiles if 0 <= float(q) <= 100]
+        self.bins = _normalize_bins(bins)
+        self.reservoir_size = reservoir_size
+        self.count = 0
+        self.numeric_count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.total = 0.0
+        self.minimum = math.inf
+        self.maximum = -math.inf
+        self.type_counts: Dict[str, int] = {}
+        self.string_count = 0
+        self._strings = _SpaceSaving(TOP_STRING_VALUES * 20)
+        self._reservoir = array("d")
+        np = _np()
+        if np is not None:
+            self._rng = np.random.default_rng(seed)
+        else:
+            self._rng = random.Random(seed)
+
+    def feed(self, values: Sequence[Any]):
+        """Add a chunk of raw values"""
+        if not values:
+            return
+        numeric, type_counts, strings = partition_values(values)
+        self.count += len(values)
+        for name, count in type_counts.items():
+            self.type_counts[name] = self.type_counts.get(name, 0) + count
+        self.string_count += len(strings)
+        for value in strings:
+            self._strings.add(value)
+        if numeric:
+            self._merge_moments(numeric)
+            self._sample(numeric)
+
+    def _merge_moments(self, chunk: array):
+        n_b = len(chunk)
+        np = _np()
+        if np is not None:
+            arr = np.frombuffer(chunk, dtype=np.float64)
+            total_b = float(arr.sum())
+            mean_b = total_b / n_b
+            m2_b = float(np.square(arr - mean_b).sum())
+            min_b, max_b = float(arr.min()), float(arr.max())
+        else:
+            total_b = math.fsum(chunk)
+            mean_b = total_b / n_b
+            m2_b = math.fsum((x - mean_b) ** 2 for x in chunk)
+            min_b, max_b = min(chunk), max(chunk)
+
+        n_a = self.numeric_count
+        n = n_a + n_b
+        delta = mean_b - self.mean
+        self.mean += delta * n_b / n
+        self.m2 += m2_b + delta * delta * n_a * n_b / n
+        self.total += total_b
+        self.numeric_count = n
+        self.minimum = min(self.minimum, min_b)
+        self.maximum = max(self.maximum, max_b)
+
+    def _sample(self, chunk: array):
+        """Reservoir sampling (Algorithm R) of the numeric values"""
+        reservoir = self._reservoir
+        seen = self.numeric_count - len(chunk)
+        free = self.reservoir_size - len(reservoir)
+        if free > 0:
+            reservoir.extend(chunk[:free])
+            seen += min(free, len(chunk))
+            chunk = chunk[free:]
+            if not chunk:
+                return
+        np = _np()
+        if np is not None:
+            arr = np.frombuffer(chunk, dtype=np.float64)
+            positions = np.arange(seen + 1, seen + len(arr) + 1)
+            slots = (self._rng.random(len(arr)) * positions).astype(np.int64)
+            keep = slots < self.reservoir_size
+            np.frombuffer(reservoir, dtype=np.float64)[slots[keep]] = arr[keep]
+        else:
+            randrange = self._rng.randrange
+            size = self.reservoir_size
+            for offset, value in enumerate(chunk, start=seen + 1):
+                slot = randrange(offset)
+                if slot < size:
+                    reservoir[slot] = value
+
+    def result(self) -> Dict[str, Any]:
+        """Build the analysis result for everything fed so far"""
+        if not self.count:
+            return {"error": "No data provided"}
+
+        result: Dict[str, Any] = {
+            "count": self.count,
+            "type": data_type_label(self.numeric_count, self.count),
+        }
+        if self.numeric_count:
+            sample = self._reservoir
+            approximate = self.numeric_count > len(sample)
+            np = _np()
+            if np is not None:
+                sorted_sample = np.sort(np.frombuffer(sample, dtype=np.float64))
+                points = np.percentile(sorted_sample, self.percentiles) if self.percentiles else []
+                percentile_values = {f"p{q:g}": float(v) for q, v in zip(self.percentiles, points)}
+            else:
+                sorted_sample = sorted(sample)
+                percentile_values = {f"p{q:g}": _interpolate(sorted_sample, q) for q in self.percentiles}
+            histogram = _histogram(sorted_sample, self.bins, self.minimum, self.maximum)
+            if approximate:
+                scale = self.numeric_count / len(sample)
+                histogram["counts"] = [round(count * scale) for count in histogram["counts"]]
+            variance = self.m2 / self.numeric_count
+            result.update(format_numeric_stats(
+                self.numeric_count, self.total, self.mean, variance,
+                self.minimum, self.maximum, percentile_values, histogram
+            ))
+            result["approximate"] = approximate
+        if self.type_counts:
+            result["type_counts"] = dict(self.type_counts, number=self.numeric_count)
+        if self.string_count:
+            result["strings"] = {
+                "count": self.string_count,
+                "top": [{"value": value, "count": count}
+                        for value, count in self._strings.most_common(TOP_STRING_VALUES)],
+            }
+        return result
+
+def _coerce_cell(cell: str) -> Any:
+    """Convert a CSV cell to a number when possible"""
+    cell = cell.strip()
+    if not cell:
+        return None
+    try:
+        return float(cell)
+    except ValueError:
+        return cell
+
+class CsvValueParser:
+    """
+    Extracts one column from CSV lines fed incrementally
+
+    `column` is looked up in the header first; a number that isn't a header
+    name (or any number when there is no header) is a 0-based column index.
+    Quoted fields may span lines: a record still inside quotes at the end of a
+    batch is carried over to the next one.
+    """
+
+    def __init__(self, column: Optional[str] = None, has_header: bool = True,
+                 max_record_bytes: int = 1024 * 1024):
+        self.column = column
+        self.has_header = has_header
+        self.max_record_bytes = max_record_bytes
+        self._index: Optional[int] = None
+        self._carry: List[str] = []
+        self._carry_quotes = 0
+
+    def parse(self, lines: List[str], final: bool = True) -> List[Any]:
+        """
+        Parse a batch of lines
+
+        Args:
+            lines: Lines without their line endings
+            final: Whether this is the last batch; pass False while more input follows
+
+        Raises:
+            ValueError: If the column can't be resolved or a quoted field is never closed
+        """
+        rows = csv.reader(self._records(lines, final))
+        if self._index is None:
+            header = None
+            if self.has_header:
+                header = next(rows, None)
+                if header is None:
+                    return []
+            self._index = self._resolve_column(header)
+        index = self._index
+        return [_coerce_cell(row[index]) if index < len(row) else None for row in rows if row]
+
+    def _resolve_column(self, header: Optional[List[str]]) -> int:
+        column = self.column
+        if column is None:
+            return 0
+        if header is not None and column in header:
+            return header.index(column)
+        if column.isdigit():
+            return int(column)
+        if header is None:
+            raise ValueError(f"Column '{column}' must be a 0-based index when the CSV has no header")
+        raise ValueError(f"Column '{column}' not found in CSV header")
+
+    def _records(self, lines: List[str], final: bool) -> List[str]:
+        """Join lines into complete CSV records, holding back one whose quotes are still open"""
+        records = []
+        carry, quotes = self._carry, self._carry_quotes
+        for line in lines:
+            carry.append(line)
+            quotes += line.count('"')
+            if quotes % 2 == 0:
+                records.append("\n".join(carry))
+                carry, quotes = [], 0
+        if carry:
+            if final:
+                raise ValueError("Quoted field is not closed at the end of the input")
+            if sum(len(line) + 1 for line in carry) > self.max_record_bytes:
+                raise ValueError(f"CSV record exceeds {self.max_record_bytes} bytes")
+        self._carry, self._carry_quotes = carry, quotes
+        return records
+
+class NdjsonValueParser:
+    """Extracts values from NDJSON lines; objects are read through `field`"""
+
+    def __init__(self, field: Optional[str] = None):
+        self.field = field
+
+    def parse(self, lines: List[str], final: bool = True) -> List[Any]:
+        values = []
+        loads = json.loads
+        field = self.field
+        for line in lines:
+            if not line.strip():
+                continue
+            value = loads(line)
+            if isinstance(value, dict):
+                if field is None:
+                    raise ValueError("NDJSON objects require a field name")
+                value = value.get(field)
+            values.append(value)
+        return values
+
+class LineBuffer:
+    """Splits a byte stream into complete text lines, holding at most one partial line"""
+
+    def __init__(self, max_line_bytes: int = 1024 * 1024, encoding: str = "utf-8"):
+        self.max_line_bytes = max_line_bytes
+        self.encoding = encoding
+        self._partial = b""
+
+    def feed(self, chunk: bytes) -> List[str]:
+        data = self._partial + chunk
+        cut = data.rfind(b"\n")
+        if cut < 0:
+            self._partial = data
+            lines = []
+        else:
+            self._partial = data[cut + 1:]
+            lines = data[:cut].decode(self.encoding).splitlines()
+        if len(self._partial) > self.max_line_bytes:
+            raise ValueError(f"Line exceeds {self.max_line_bytes} bytes")
+        return lines
+
+    def close(self) -> List[str]:
+        data, self._partial = self._partial, b""
+        return data.decode(self.encoding).splitlines()
@@ -0,0 +1,173 @@
+import importlib
+import logging
+import threading
+from importlib.metadata import entry_points
+from typing import Dict, Any, Callable, FrozenSet, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Entry point group third-party packages use to ship capabilities
+ENTRY_POINT_GROUP = "aistaff.capabilities"
+# Entry point group for plugins that describe their capabilities with a CapabilitySpec
+SPEC_ENTRY_POINT_GROUP = "aistaff.capability_specs"
+
+# Cost classes used for capability metadata
+COST_LOW = "low"
+COST_MEDIUM = "medium"
+COST_HIGH = "high"
+
+class CapabilitySpec:
+    """
+    Describes a capability without importing its implementation.
+
+    `target` is an import path of the form "package.module:function"; the module
+    is imported the first time the capability is executed. `cacheable` declares
+    the capability a pure function of its input, so its results may be memoized
+    (for `cache_ttl` seconds, or the configured default if None).
+    """
+
+    def __init__(self, name: str, target: str, description: str = "",
+                 cost_class: str = COST_LOW, cpu_bound: bool = False,
+                 cacheable: bool = False, cache_ttl: Optional[float] = None):
+        self.name = name
+        self.target = target
+        self.description = description
+        self.cost_class = cost_class
+        self.cpu_bound = cpu_bound
+        self.cacheable = cacheable
+        self.cache_ttl = cache_ttl
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "description": self.description,
+            "cost_class": self.cost_class,
+            "cpu_bound": self.cpu_bound,
+            "io_bound": not self.cpu_bound,
+            "cacheable": self.cacheable,
+            "cache_ttl": self.cache_ttl,
+        }
+
+class CapabilityRegistry:
+    """
+    Registry of capabilities available to agents.
+    Lookups are dict/frozenset based; implementations are resolved lazily and cached.
+    """
+
+    def __init__(self):
+        self._specs: Dict[str, CapabilitySpec] = {}
+        self._handlers: Dict[str, Callable[[Dict[str, Any]], Dict[str, Any]]] = {}
+        self._names: FrozenSet[str] = frozenset()
+        self._lock = threading.Lock()
+        self._discover_lock = threading.Lock()
+        self._discovered = False
+
+    def register(self, spec: CapabilitySpec, replace: bool = False):
+        """Register a capability spec"""
+        with self._lock:
+            if spec.name in self._specs and not replace:
+                logger.warning(f"Capability '{spec.name}' is already registered, ignoring duplicate")
+                return
+            self._specs[spec.name] = spec
+            self._handlers.pop(spec.name, None)
+            self._names = frozenset(self._specs)
+
+    def discover(self):
+        """
+        Register capabilities advertised through package entry points (once)
+
+        Entry points in ENTRY_POINT_GROUP name the handler itself and get default
+        metadata. Entry points in SPEC_ENTRY_POINT_GROUP name a CapabilitySpec
+        instead; its module is imported to read the metadata, while the handler
+        behind `target` still loads on first use.
+
+        Called on the first lookup, so scanning installed packages doesn't slow down import.
+        """
+        if self._discovered:
+            return
+        with self._discover_lock:
+            if self._discovered:
+                return
+            for entry_point in self._entry_points(SPEC_ENTRY_POINT_GROUP):
+                try:
+                    spec = entry_point.load()
+                except Exception as e:
+                    logger.error(f"Failed to load capability spec '{entry_point.name}': {str(e)}")
+                    continue
+                if not isinstance(spec, CapabilitySpec):
+                    logger.error(f"Capability spec '{entry_point.name}' is not a CapabilitySpec, ignoring it")
+                    continue
+                self.register(spec)
+                logger.info(f"Discovered capability plugin: {spec.name}")
+            for entry_point in self._entry_points(ENTRY_POINT_GROUP):
+                # Only the import path is recorded; the plugin module loads on first use
+                self.register(CapabilitySpec(name=entry_point.name, target=entry_point.value))
+                logger.info(f"Discovered capability plugin: {entry_point.name}")
+            self._discovered = True
+
+    @staticmethod
+    def _entry_points(group: str) -> List[Any]:
+        try:
+            return list(entry_points(group=group))
+        except Exception as e:
+            logger.error(f"Capability discovery failed: {str(e)}")
+            return []
+
+    @property
+    def names(self) -> FrozenSet[str]:
+        """Frozen set of registered capability names"""
+        if not self._discovered:
+            self.discover()
+        return self._names
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.names
+
+    def list_names(self) -> List[str]:
+        """Capability names in registration order"""
+        self.discover()
+        return list(self._specs)
+
+    def get_spec(self, name: str) -> Optional[CapabilitySpec]:
+        self.discover()
+        return self._specs.get(name)
+
+    def list_specs(self) -> List[CapabilitySpec]:
+        self.discover()
+        return list(self._specs.values())
+
+    def get_handler(self, name: str) -> Callable[[Dict[str, Any]], Dict[str, Any]]:
+        """
+        Resolve the implementation of a capability, importing its module on first use
+
+        Raises:
+            KeyError: If the capability is not registered
+        """
+        handler = self._handlers.get(name)
+        if handler is not None:
+            return handler
+
+        self.discover()
+        spec = self._specs[name]
+        module_name, _, attribute = spec.target.partition(":")
+        handler = getattr(importlib.import_module(module_name), attribute or "run")
+        self._handlers[name] = handler
+        logger.info(f"Loaded capability: {name}")
+        return handler
+
+def _builtin(name: str, description: str, cost_class: str = COST_LOW, cpu_bound: bool = False,
+             cacheable: bool = False) -> CapabilitySpec:
+    return CapabilitySpec(name, f"{__name__}.{name}:run", description, cost_class, cpu_bound, cacheable)
+
+BUILTIN_CAPABILITIES = (
+    _builtin("text_processing", "Basic text processing and statistics", COST_LOW, cpu_bound=True, cacheable=True),
+    _builtin("data_analysis", "Statistical analysis of numeric and mixed data", COST_HIGH, cpu_bound=True, cacheable=True),
+    _builtin("customer_service", "Customer query responses", COST_LOW, cacheable=True),
+    _builtin("code_generation", "Template-based code generation", COST_MEDIUM, cacheable=True),
+    _builtin("automation", "Task automation", COST_LOW),
+)
+
+# Create singleton instance
+capability_registry = CapabilityRegistry()
+for _spec in BUILTIN_CAPABILITIES:
+    capability_registry.register(_spec)
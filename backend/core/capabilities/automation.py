@@ -0,0 +1,9 @@
+from typing import Dict, Any
+
+def run(input_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Simple automation capability"""
+    task = input_data.get("task", "")
+    return {
+        "result": f"Automated task: {task}",
+        "status": "completed"
+    }
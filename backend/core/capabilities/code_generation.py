@@ -0,0 +1,17 @@
+from typing import Dict, Any
+
+def run(input_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Simple code generation capability"""
+    language = input_data.get("language", "python")
+    prompt = input_data.get("prompt", "")
+    
+    # Very simplified code generation (just a template)
+    if language == "python":
+        code = f"# Generated from: {prompt}\ndef main():\n    print('Hello, AI Staff!')\n\nif __name__ == '__main__':\n    main()"
+    else:
+        code = f"// Generated from: {prompt}\nfunction main() {{\n    console.log('Hello, AI Staff!');\n}}\n\nmain();"
+        
+    return {
+        "code": code,
+        "language": language
+    }
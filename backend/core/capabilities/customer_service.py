@@ -0,0 +1,8 @@
+from typing import Dict, Any
+
+def run(input_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Simple customer service capability"""
+    query = input_data.get("query", "")
+    return {
+        "response": f"Thank you for your query: '{query}'. Our team will assist you shortly."
+    }
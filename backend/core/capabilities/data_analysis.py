@@ -0,0 +1,15 @@
+from typing import Dict, Any
+
+from backend.core.analysis import analyze_data, DEFAULT_HISTOGRAM_BINS
+
+def run(input_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Statistical analysis of a list of values"""
+    data = input_data.get("data", [])
+    if not data:
+        return {"error": "No data provided"}
+    
+    return analyze_data(
+        data,
+        percentiles=input_data.get("percentiles"),
+        bins=input_data.get("bins", DEFAULT_HISTOGRAM_BINS)
+    )
@@ -0,0 +1,10 @@
+from typing import Dict, Any
+
+def run(input_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Simple text processing capability"""
+    text = input_data.get("text", "")
+    return {
+        "processed_text": f"Processed: {text}",
+        "word_count": len(text.split()),
+        "char_count": len(text)
+    }
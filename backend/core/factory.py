@@ -1,12 +1,10 @@
 import json
 import logging
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, FrozenSet, List, Optional
 from datetime import datetime
 
 from backend.core.intelligence import intelligence_engine
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class AgentFactory:
@@ -17,7 +15,11 @@ class AgentFactory:
     
     def __init__(self):
         logger.info("Initializing Agent Factory")
-        self.available_capabilities = intelligence_engine.get_available_capabilities()
+    
+    @property
+    def available_capabilities(self) -> FrozenSet[str]:
+        """Frozen set of capability names, shared with the capability registry"""
+        return intelligence_engine.capabilities
     
     def create_agent(self, name: str, description: Optional[str] = None, 
                     capabilities: Optional[List[str]] = None) -> Dict[str, Any]:
@@ -35,8 +37,9 @@ class AgentFactory:
         # Validate capabilities
         valid_capabilities = []
         if capabilities:
-            for cap in capabilities:
-                if cap in self.available_capabilities:
+            available = self.available_capabilities
+            for cap in dict.fromkeys(capabilities):
+                if cap in available:
                     valid_capabilities.append(cap)
                 else:
                     logger.warning(f"Ignoring unknown capability: {cap}")
@@ -55,7 +58,7 @@ class AgentFactory:
     
     def get_available_capabilities(self) -> List[str]:
         """Get list of available capabilities for agents"""
-        return self.available_capabilities
+        return intelligence_engine.get_available_capabilities()
     
     def validate_agent_config(self, agent_config: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -74,8 +77,9 @@ class AgentFactory:
             errors.append("Agent name is required")
         
         # Validate capabilities
-        capabilities = agent_config.get("capabilities", [])
-        invalid_capabilities = [cap for cap in capabilities if cap not in self.available_capabilities]
+        capabilities = agent_config.get("capabilities") or []
+        available = self.available_capabilities
+        invalid_capabilities = [cap for cap in capabilities if cap not in available]
         if invalid_capabilities:
             errors.append(f"Invalid capabilities: {', '.join(invalid_capabilities)}")
         
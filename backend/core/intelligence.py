@@ -1,118 +1,104 @@
 import json
 import logging
-from typing import Dict, List, Any, Optional
+import time
+from typing import Callable, Dict, List, Any, Optional
+
+from backend.core.capabilities import capability_registry, CapabilityRegistry
+from backend.core.result_cache import ResultCache
+from backend.utils.metrics import capability_duration
+from backend.config import METRICS_ENABLED, CAPABILITY_CACHE_ENABLED
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class IntelligenceEngine:
     """
     Core intelligence engine for AI Staff agent platform.
-    This simplified version just manages basic agent capabilities.
+    Dispatches agent tasks to capabilities from the capability registry.
     """
-    
-    def __init__(self):
-        logger.info("Initializing Intelligence Engine")
-        self.capabilities = {
-            "text_processing": self._text_processing,
-            "data_analysis": self._data_analysis,
-            "customer_service": self._customer_service,
-            "code_generation": self._code_generation,
-            "automation": self._automation,
-        }
-    
-    def _text_processing(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Simple text processing capability"""
-        text = input_data.get("text", "")
-        return {
-            "processed_text": f"Processed: {text}",
-            "word_count": len(text.split()),
-            "char_count": len(text)
-        }
-    
-    def _data_analysis(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Simple data analysis capability"""
-        data = input_data.get("data", [])
-        if not data:
-            return {"error": "No data provided"}
-        
-        # Check if all elements are numbers
-        if all(isinstance(x, (int, float)) for x in data):
-            return {
-                "count": len(data),
-                "sum": sum(data),
-                "average": sum(data) / len(data) if len(data) > 0 else 0
-            }
-        else:
-            return {
-                "count": len(data),
-                "type": "mixed or non-numeric data"
-            }
-    
-    def _customer_service(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Simple customer service capability"""
-        query = input_data.get("query", "")
-        return {
-            "response": f"Thank you for your query: '{query}'. Our team will assist you shortly."
-        }
-    
-    def _code_generation(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Simple code generation capability"""
-        language = input_data.get("language", "python")
-        prompt = input_data.get("prompt", "")
-        
-        # Very simplified code generation (just a template)
-        if language == "python":
-            code = f"# Generated from: {prompt}\ndef main():\n    print('Hello, AI Staff!')\n\nif __name__ == '__main__':\n    main()"
+
+    def __init__(self, registry: CapabilityRegistry = capability_registry,
+                 result_cache: Optional[ResultCache] = None):
+        # Plugin discovery happens on the registry's first lookup, not at import
+        self.registry = registry
+        # Memoizes capabilities declared cacheable; None disables memoization
+        self.result_cache = result_cache
+
+    @property
+    def capabilities(self):
+        """Frozen set of available capability names"""
+        return self.registry.names
+
+    def execute_capability(self, capability_name: str, input_data: Dict[str, Any],
+                           handler: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """
+        Execute a specific capability with the given input data
+
+        Results of cacheable capabilities are served from the result cache when
+        it is enabled; error results are never cached.
+
+        Args:
+            capability_name: Registered capability name
+            input_data: Capability input
+            handler: The capability's implementation if already resolved, skipping the registry lookup
+        """
+        if handler is None:
+            if capability_name not in self.registry.names:
+                return {"error": f"Capability '{capability_name}' not found"}
+            handler = self.registry.get_handler(capability_name)
+
+        started = time.perf_counter()
+        cache_key = None
+        spec = self.registry.get_spec(capability_name) if self.result_cache is not None else None
+        if spec is not None and spec.cacheable:
+            cache_key = self.result_cache.make_key(capability_name, input_data)
+        result = self.result_cache.get(cache_key) if cache_key is not None else None
+        if result is not None:
+            outcome = "cached"
         else:
-            code = f"// Generated from: {prompt}\nfunction main() {{\n    console.log('Hello, AI Staff!');\n}}\n\nmain();"
-            
-        return {
-            "code": code,
-            "language": language
-        }
-    
-    def _automation(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Simple automation capability"""
-        task = input_data.get("task", "")
-        return {
-            "result": f"Automated task: {task}",
-            "status": "completed"
-        }
-    
-    def execute_capability(self, capability_name: str, input_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Execute a specific capability with the given input data"""
-        if capability_name not in self.capabilities:
-            return {"error": f"Capability '{capability_name}' not found"}
-        
-        try:
-            return self.capabilities[capability_name](input_data)
-        except Exception as e:
-            logger.error(f"Error executing capability '{capability_name}': {str(e)}")
-            return {"error": f"Error executing capability: {str(e)}"}
-    
+            try:
+                result = handler(input_data)
+            except Exception as e:
+                logger.error(f"Error executing capability '{capability_name}': {str(e)}")
+                result, outcome = {"error": f"Error executing capability: {str(e)}"}, "error"
+            else:
+                outcome = "success"
+                if cache_key is not None and not (isinstance(result, dict) and "error" in result):
+                    self.result_cache.set(cache_key, result, spec.cache_ttl)
+        if METRICS_ENABLED:
+            capability_duration.observe(time.perf_counter() - started, (capability_name, outcome))
+        return result
+
     def get_available_capabilities(self) -> List[str]:
         """Get list of available capabilities"""
-        return list(self.capabilities.keys())
-    
+        return self.registry.list_names()
+
+    def get_capability_details(self) -> List[Dict[str, Any]]:
+        """Get metadata for every available capability"""
+        return [spec.to_dict() for spec in self.registry.list_specs()]
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Get result cache statistics"""
+        if self.result_cache is None:
+            return {"enabled": False}
+        return dict(self.result_cache.stats(), enabled=True)
+
     def process_agent_task(self, agent_config: Dict[str, Any], task_input: Dict[str, Any]) -> Dict[str, Any]:
         """
         Process a task using an agent's configuration
-        
-        This is a simplified version that just executes the first matching capability
+
+        Executes the capability matching the task type, if the agent has it
         """
-        agent_capabilities = agent_config.get("capabilities", [])
+        agent_capabilities = agent_config.get("capabilities")
         if not agent_capabilities:
             return {"error": "Agent has no capabilities configured"}
-        
-        # Find the first matching capability
+        if not isinstance(agent_capabilities, (set, frozenset)):
+            agent_capabilities = frozenset(agent_capabilities)
+
         task_type = task_input.get("type", "")
-        for capability in agent_capabilities:
-            if capability == task_type:
-                return self.execute_capability(capability, task_input.get("data", {}))
-        
+        if task_type in agent_capabilities:
+            return self.execute_capability(task_type, task_input.get("data", {}))
+
         return {"error": f"No matching capability for task type '{task_type}'"}
 
 # Create singleton instance
-intelligence_engine = IntelligenceEngine()
+intelligence_engine = IntelligenceEngine(result_cache=ResultCache() if CAPABILITY_CACHE_ENABLED else None)
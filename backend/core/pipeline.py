@@ -0,0 +1,224 @@
+import asyncio
+import re
+import time
+from concurrent.futures import Executor
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+# Step states
+STEP_COMPLETED = "completed"
+STEP_FAILED = "failed"
+STEP_SKIPPED = "skipped"
+
+# Pipeline states
+PIPELINE_COMPLETED = "completed"
+PIPELINE_FAILED = "failed"
+
+_STEP_ID = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+class PipelineError(ValueError):
+    """Raised when a pipeline spec is not a valid DAG of capability steps"""
+
+class PipelineStep:
+    """
+    One capability call in a pipeline.
+
+    The step's input is `input` with each field in `inputs` set from an earlier
+    step's output. References have the form "step" (the whole output) or
+    "step.key.0.key" (a nested value; numbers index lists). Referenced steps
+    are dependencies even if not listed in `depends_on`.
+    """
+
+    def __init__(self, step_id: str, capability: str, input: Optional[Dict[str, Any]] = None,
+                 inputs: Optional[Dict[str, str]] = None, depends_on: Iterable[str] = ()):
+        self.id = step_id
+        self.capability = capability
+        self.input = dict(input or {})
+        self.inputs = dict(inputs or {})
+        referenced = [reference.split(".", 1)[0] for reference in self.inputs.values()]
+        self.depends_on = tuple(dict.fromkeys(list(depends_on) + referenced))
+
+    def build_input(self, outputs: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Build the step's input from the outputs of its dependencies
+
+        Raises:
+            KeyError: If a reference doesn't resolve, with the reference as its argument
+        """
+        data = dict(self.input)
+        for field, reference in self.inputs.items():
+            data[field] = _resolve(outputs, reference)
+        return data
+
+def _resolve(outputs: Dict[str, Any], reference: str) -> Any:
+    step_id, _, path = reference.partition(".")
+    value = outputs[step_id]
+    for part in path.split(".") if path else ():
+        if isinstance(value, dict) and part in value:
+            value = value[part]
+        elif isinstance(value, list) and part.lstrip("-").isdigit() and -len(value) <= int(part) < len(value):
+            value = value[int(part)]
+        else:
+            raise KeyError(reference)
+    return value
+
+def _timed(execute: Callable[[str, Dict[str, Any]], Dict[str, Any]], capability: str,
+           data: Dict[str, Any]) -> Tuple[Dict[str, Any], float, float]:
+    started = time.perf_counter()
+    result = execute(capability, data)
+    return result, started, time.perf_counter()
+
+class Pipeline:
+    """
+    DAG of capability steps run server-side in one call.
+
+    The spec is validated up front with Kahn's algorithm: step ids must be
+    unique, dependencies must exist and there must be no cycle. `layers` groups
+    steps by depth. At run time a step starts as soon as all of its own
+    dependencies completed, so independent branches run concurrently on the
+    executor. When a step fails, the steps depending on it are skipped and the
+    other branches carry on.
+    """
+
+    def __init__(self, steps: List[PipelineStep]):
+        if not steps:
+            raise PipelineError("Pipeline has no steps")
+        self.steps: Dict[str, PipelineStep] = {}
+        for step in steps:
+            if not _STEP_ID.match(step.id):
+                raise PipelineError(f"Invalid step id '{step.id}' (use 1-64 letters, digits, '_' or '-')")
+            if step.id in self.steps:
+                raise PipelineError(f"Duplicate step id '{step.id}'")
+            self.steps[step.id] = step
+
+        self.dependents: Dict[str, List[str]] = {step_id: [] for step_id in self.steps}
+        for step in steps:
+            for dependency in step.depends_on:
+                if dependency == step.id:
+                    raise PipelineError(f"Step '{step.id}' depends on itself")
+                if dependency not in self.steps:
+                    raise PipelineError(f"Step '{step.id}' depends on unknown step '{dependency}'")
+                self.dependents[dependency].append(step.id)
+
+        # Kahn's algorithm, one layer at a time
+        self.layers: List[List[str]] = []
+        remaining = {step_id: len(step.depends_on) for step_id, step in self.steps.items()}
+        layer = [step_id for step_id, count in remaining.items() if count == 0]
+        while layer:
+            self.layers.append(layer)
+            next_layer = []
+            for step_id in layer:
+                for dependent in self.dependents[step_id]:
+                    remaining[dependent] -= 1
+                    if remaining[dependent] == 0:
+                        next_layer.append(dependent)
+            layer = next_layer
+        if sum(len(layer) for layer in self.layers) < len(self.steps):
+            cyclic = sorted(step_id for step_id, count in remaining.items() if count > 0)
+            raise PipelineError(f"Pipeline has a dependency cycle through steps: {', '.join(cyclic)}")
+
+    @property
+    def order(self) -> List[str]:
+        """Step ids in a topological order"""
+        return [step_id for layer in self.layers for step_id in layer]
+
+    def check_capabilities(self, available: FrozenSet[str]):
+        """
+        Check every step uses one of the given capabilities
+
+        Raises:
+            PipelineError: Naming the first step with an unavailable capability
+        """
+        for step in self.steps.values():
+            if step.capability not in available:
+                raise PipelineError(f"Step '{step.id}' uses unavailable capability '{step.capability}'")
+
+    async def run(self, execute: Callable[[str, Dict[str, Any]], Dict[str, Any]],
+                  executor: Optional[Executor] = None) -> Dict[str, Any]:
+        """
+        Run the pipeline
+
+        Args:
+            execute: Runs one capability on its input; called on the executor
+            executor: Executor running the steps (the loop's default if None)
+
+        Returns:
+            Dict with the pipeline status, total duration, layers, and one entry
+            per step (in spec order) with its status, result or error, and its
+            start offset and duration in milliseconds
+        """
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        outputs: Dict[str, Any] = {}
+        results: Dict[str, Dict[str, Any]] = {}
+        remaining = {step_id: len(step.depends_on) for step_id, step in self.steps.items()}
+        running: Dict[asyncio.Future, str] = {}
+
+        def finish(step_id: str, result: Optional[Dict[str, Any]], error: Optional[str],
+                   step_started: Optional[float] = None, step_finished: Optional[float] = None):
+            results[step_id] = {
+                "id": step_id,
+                "capability": self.steps[step_id].capability,
+                "status": STEP_FAILED if error else STEP_COMPLETED,
+                "result": None if error else result,
+                "error": error,
+                "start_ms": round((step_started - started) * 1000, 3) if step_started else None,
+                "duration_ms": round((step_finished - step_started) * 1000, 3) if step_started else None,
+            }
+            if error:
+                return
+            outputs[step_id] = result
+            for dependent in self.dependents[step_id]:
+                remaining[dependent] -= 1
+                if remaining[dependent] == 0:
+                    launch(dependent)
+
+        def launch(step_id: str):
+            step = self.steps[step_id]
+            try:
+                data = step.build_input(outputs)
+            except KeyError as e:
+                finish(step_id, None, f"Reference '{e.args[0]}' not found in the outputs of earlier steps")
+                return
+            try:
+                future = loop.run_in_executor(executor, _timed, execute, step.capability, data)
+            except RuntimeError as e:
+                finish(step_id, None, f"Could not start step: {str(e)}")
+                return
+            running[future] = step_id
+
+        for step_id in self.layers[0]:
+            launch(step_id)
+        while running:
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                step_id = running.pop(future)
+                try:
+                    result, step_started, step_finished = future.result()
+                except Exception as e:
+                    finish(step_id, None, f"Error executing step: {str(e)}")
+                    continue
+                error = result.get("error") if isinstance(result, dict) else None
+                finish(step_id, result, error, step_started, step_finished)
+
+        # Steps never started sit downstream of a failure
+        for step_id in self.order:
+            if step_id not in results:
+                blocked_by = [dependency for dependency in self.steps[step_id].depends_on
+                              if results[dependency]["status"] != STEP_COMPLETED]
+                results[step_id] = {
+                    "id": step_id,
+                    "capability": self.steps[step_id].capability,
+                    "status": STEP_SKIPPED,
+                    "result": None,
+                    "error": f"Skipped: dependency {', '.join(repr(d) for d in blocked_by)} did not complete",
+                    "start_ms": None,
+                    "duration_ms": None,
+                }
+
+        failed = any(result["status"] != STEP_COMPLETED for result in results.values())
+        return {
+            "status": PIPELINE_FAILED if failed else PIPELINE_COMPLETED,
+            "duration_ms": round((time.perf_counter() - started) * 1000, 3),
+            "layers": self.layers,
+            "steps": [results[step_id] for step_id in self.steps],
+        }
@@ -0,0 +1,135 @@
+import hashlib
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from backend.config import CAPABILITY_CACHE_SIZE, CAPABILITY_CACHE_MAX_BYTES, CAPABILITY_CACHE_TTL
+from backend.utils.serialization import canonical_json
+
+# Rough per-entry cost of the key, digest string and ordered dict slot
+ENTRY_OVERHEAD_BYTES = 256
+
+ResultKey = Tuple[str, str]
+
+class ResultCache:
+    """
+    Memoized capability results, bounded by entry count and approximate memory.
+
+    Keys are the capability name plus a SHA-256 of the input's canonical JSON,
+    so inputs that only differ in key order share an entry. Results are stored
+    pickled: every hit gets its own copy that callers may mutate, and the pickle
+    size is what counts against max_bytes. Least recently used entries are
+    evicted once either bound is exceeded; entries expire after the TTL given
+    when they were stored.
+    """
+
+    def __init__(self, maxsize: int = CAPABILITY_CACHE_SIZE, max_bytes: int = CAPABILITY_CACHE_MAX_BYTES,
+                 default_ttl: float = CAPABILITY_CACHE_TTL):
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self._data: "OrderedDict[ResultKey, Tuple[bytes, float, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._counters: Dict[str, Dict[str, int]] = {}
+
+    @staticmethod
+    def make_key(capability: str, input_data: Any) -> Optional[ResultKey]:
+        """Key for a capability input, or None if the input has no canonical JSON form"""
+        try:
+            encoded = canonical_json(input_data)
+        except (TypeError, ValueError):
+            return None
+        return capability, hashlib.sha256(encoded).hexdigest()
+
+    def get(self, key: ResultKey) -> Optional[Any]:
+        """Get a copy of a cached result, or None on a miss"""
+        now = time.monotonic()
+        with self._lock:
+            counters = self._counters_for(key[0])
+            entry = self._data.get(key)
+            if entry is not None and entry[1] <= now:
+                self._remove(key)
+                counters["expirations"] += 1
+                entry = None
+            if entry is None:
+                counters["misses"] += 1
+                return None
+            self._data.move_to_end(key)
+            counters["hits"] += 1
+            payload = entry[0]
+        return pickle.loads(payload)
+
+    def set(self, key: ResultKey, result: Any, ttl: Optional[float] = None) -> bool:
+        """
+        Store a result
+
+        Returns:
+            True if stored; results that can't be pickled or exceed max_bytes on their own are skipped
+        """
+        try:
+            payload = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            return False
+        size = len(payload) + ENTRY_OVERHEAD_BYTES
+        if size > self.max_bytes:
+            return False
+        expires_at = time.monotonic() + (self.default_ttl if ttl is None else ttl)
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (payload, expires_at, size)
+            self._bytes += size
+            self._counters_for(key[0])["stores"] += 1
+            while len(self._data) > self.maxsize or self._bytes > self.max_bytes:
+                oldest = next(iter(self._data))
+                self._remove(oldest)
+                self._counters_for(oldest[0])["evictions"] += 1
+        return True
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            capabilities = {
+                name: dict(counters, hit_rate=self._hit_rate(counters))
+                for name, counters in sorted(self._counters.items())
+            }
+            totals = {
+                field: sum(counters[field] for counters in self._counters.values())
+                for field in ("hits", "misses", "stores", "evictions", "expirations")
+            }
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "default_ttl": self.default_ttl,
+                **totals,
+                "hit_rate": self._hit_rate(totals),
+                "capabilities": capabilities,
+            }
+
+    @staticmethod
+    def _hit_rate(counters: Dict[str, int]) -> float:
+        lookups = counters["hits"] + counters["misses"]
+        return counters["hits"] / lookups if lookups else 0.0
+
+    def _counters_for(self, capability: str) -> Dict[str, int]:
+        """Counters of one capability (lock must be held)"""
+        counters = self._counters.get(capability)
+        if counters is None:
+            counters = self._counters[capability] = {
+                "hits": 0, "misses": 0, "stores": 0, "evictions": 0, "expirations": 0
+            }
+        return counters
+
+    def _remove(self, key: ResultKey):
+        """Remove an entry (lock must be held)"""
+        _, _, size = self._data.pop(key)
+        self._bytes -= size
@@ -0,0 +1,79 @@
+import json
+import logging
+from typing import Callable, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import OperationalError
+
+logger = logging.getLogger(__name__)
+
+def _column_exists(conn: Connection, table: str, column: str) -> bool:
+    return any(row[1] == column for row in conn.execute(text(f"PRAGMA table_info({table})")))
+
+def _move_capabilities(conn: Connection, table: str, link_table: str, key: str):
+    """Copy a JSON capabilities column into its association table, then drop the column"""
+    if not _column_exists(conn, table, "capabilities"):
+        return
+
+    rows = conn.execute(text(f"SELECT id, capabilities FROM {table} WHERE capabilities IS NOT NULL")).all()
+    links = []
+    for row_id, raw in rows:
+        try:
+            names = json.loads(raw) if raw else []
+        except ValueError:
+            logger.warning(f"Skipping unreadable capabilities on {table} row {row_id}")
+            continue
+        # Keep first occurrence order, dropping duplicates the primary key would reject
+        for position, name in enumerate(dict.fromkeys(str(name) for name in names)):
+            links.append({"owner": row_id, "name": name, "position": position})
+    if links:
+        conn.execute(
+            text(f"INSERT OR IGNORE INTO {link_table} ({key}, name, position) VALUES (:owner, :name, :position)"),
+            links
+        )
+
+    try:
+        conn.execute(text(f"ALTER TABLE {table} DROP COLUMN capabilities"))
+    except OperationalError as e:
+        # SQLite < 3.35 cannot drop columns; the column is simply no longer mapped
+        logger.warning(f"Could not drop {table}.capabilities: {str(e)}")
+    logger.info(f"Migrated {len(links)} capabilities from {table} into {link_table}")
+
+def _normalize_capabilities(conn: Connection):
+    _move_capabilities(conn, "agents", "agent_capabilities", "agent_id")
+    _move_capabilities(conn, "marketplace_listings", "marketplace_listing_capabilities", "listing_id")
+
+# Ordered schema migrations; the database records the last applied version in PRAGMA user_version
+MIGRATIONS: List[Tuple[int, Callable[[Connection], None]]] = [
+    (1, _normalize_capabilities),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+def get_schema_version(conn: Connection) -> int:
+    return conn.execute(text("PRAGMA user_version")).scalar() or 0
+
+def get_schema_fingerprint(conn: Connection) -> Optional[str]:
+    """Fingerprint recorded by the last schema build, or None if there is none"""
+    try:
+        return conn.execute(text("SELECT value FROM schema_info WHERE key = 'fingerprint'")).scalar()
+    except OperationalError:
+        return None
+
+def set_schema_fingerprint(conn: Connection, fingerprint: str):
+    conn.execute(text("CREATE TABLE IF NOT EXISTS schema_info (key TEXT PRIMARY KEY, value TEXT NOT NULL)"))
+    conn.execute(
+        text("INSERT OR REPLACE INTO schema_info (key, value) VALUES ('fingerprint', :value)"),
+        {"value": fingerprint}
+    )
+
+def run_migrations(engine: Engine):
+    """Apply pending migrations, each in its own transaction"""
+    for version, migration in MIGRATIONS:
+        with engine.begin() as conn:
+            if get_schema_version(conn) >= version:
+                continue
+            logger.info(f"Applying schema migration {version}: {migration.__name__}")
+            migration(conn)
+            conn.execute(text(f"PRAGMA user_version = {version}"))
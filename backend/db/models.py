@@ -1,12 +1,44 @@
-from sqlalchemy import Column, Integer, String, Boolean, Text, DateTime, Float, ForeignKey, create_engine
+from sqlalchemy import Column, Integer, String, Boolean, Text, DateTime, Float, ForeignKey, Index, create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.ext.associationproxy import association_proxy
+from sqlalchemy.ext.orderinglist import ordering_list
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, relationship
-import os
+from sqlalchemy.schema import CreateIndex, CreateTable
 from datetime import datetime
-from passlib.context import CryptContext
+from typing import Optional
+import hashlib
+import threading
 
-# Password context for hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from backend.db.search import create_search_index, load_search_index, LISTING_SEARCH_DDL
+from backend.db.migrations import (
+    SCHEMA_VERSION,
+    run_migrations,
+    get_schema_version,
+    get_schema_fingerprint,
+    set_schema_fingerprint,
+)
+from backend.config import (
+    BCRYPT_ROUNDS,
+    DB_PATH,
+    DATABASE_URL,
+    DB_STORAGE_MODE,
+    DB_BUSY_TIMEOUT_MS,
+    DB_READ_POOL_SIZE,
+)
+
+_pwd_context = None
+_pwd_context_lock = threading.Lock()
+
+def get_pwd_context():
+    """Password context for hashing, built on first use; hashes made with another cost report needs_update"""
+    global _pwd_context
+    if _pwd_context is None:
+        with _pwd_context_lock:
+            if _pwd_context is None:
+                from passlib.context import CryptContext
+                _pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+    return _pwd_context
 
 # Create Base class for declarative models
 Base = declarative_base()
@@ -25,11 +57,11 @@ class User(Base):
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     def verify_password(self, plain_password):
-        return pwd_context.verify(plain_password, self.hashed_password)
+        return get_pwd_context().verify(plain_password, self.hashed_password)
     
     @staticmethod
     def get_password_hash(password):
-        return pwd_context.hash(password)
+        return get_pwd_context().hash(password)
 
 class Agent(Base):
     __tablename__ = "agents"
@@ -37,11 +69,42 @@ class Agent(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String(100), nullable=False)
     description = Column(Text, nullable=True)
-    capabilities = Column(Text, nullable=True)  # JSON string of capabilities
     status = Column(String(20), default="inactive")
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     is_active = Column(Boolean, default=True)
+    
+    # Composite indexes backing keyset pagination (sort column + id tie-breaker)
+    __table_args__ = (
+        Index("ix_agents_active_id", "is_active", "id"),
+        Index("ix_agents_active_created_id", "is_active", "created_at", "id"),
+        Index("ix_agents_active_name_id", "is_active", "name", "id"),
+        Index("ix_agents_active_status_id", "is_active", "status", "id"),
+    )
+    
+    # Capabilities are stored one row per capability in agent_capabilities
+    capability_rows = relationship(
+        "AgentCapability",
+        order_by="AgentCapability.position",
+        collection_class=ordering_list("position"),
+        cascade="all, delete-orphan",
+        lazy="selectin"
+    )
+    capabilities = association_proxy(
+        "capability_rows", "name", creator=lambda name: AgentCapability(name=name)
+    )
+
+class AgentCapability(Base):
+    __tablename__ = "agent_capabilities"
+    
+    agent_id = Column(Integer, ForeignKey("agents.id", ondelete="CASCADE"), primary_key=True)
+    name = Column(String(100), primary_key=True)
+    position = Column(Integer, default=0)
+    
+    # Lookup of agents by capability
+    __table_args__ = (
+        Index("ix_agent_capabilities_name_agent", "name", "agent_id"),
+    )
 
 class MarketplaceListing(Base):
     __tablename__ = "marketplace_listings"
@@ -51,22 +114,152 @@ class MarketplaceListing(Base):
     description = Column(Text, nullable=True)
     price = Column(Float, default=0.0)
     author = Column(String(100))
-    capabilities = Column(Text, nullable=True)  # JSON string of capabilities
     rating = Column(Float, default=0.0)
     downloads = Column(Integer, default=0)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # Composite indexes backing keyset pagination and filters
+    __table_args__ = (
+        Index("ix_marketplace_listings_name_id", "name", "id"),
+        Index("ix_marketplace_listings_author_id", "author", "id"),
+        Index("ix_marketplace_listings_price_id", "price", "id"),
+        Index("ix_marketplace_listings_rating_id", "rating", "id"),
+        Index("ix_marketplace_listings_downloads_id", "downloads", "id"),
+        Index("ix_marketplace_listings_created_id", "created_at", "id"),
+    )
+    
+    # Capabilities are stored one row per capability in marketplace_listing_capabilities
+    capability_rows = relationship(
+        "ListingCapability",
+        order_by="ListingCapability.position",
+        collection_class=ordering_list("position"),
+        cascade="all, delete-orphan",
+        lazy="selectin"
+    )
+    capabilities = association_proxy(
+        "capability_rows", "name", creator=lambda name: ListingCapability(name=name)
+    )
+
+class ListingCapability(Base):
+    __tablename__ = "marketplace_listing_capabilities"
+    
+    listing_id = Column(Integer, ForeignKey("marketplace_listings.id", ondelete="CASCADE"), primary_key=True)
+    name = Column(String(100), primary_key=True)
+    position = Column(Integer, default=0)
+    
+    # Lookup of listings by capability
+    __table_args__ = (
+        Index("ix_marketplace_listing_capabilities_name_listing", "name", "listing_id"),
+    )
+
+# New objects start with an empty capability collection, so they can be
+# serialized after a flush without a lazy load (which AsyncSession cannot do)
+@event.listens_for(Agent, "init")
+@event.listens_for(MarketplaceListing, "init")
+def _init_capability_rows(target, args, kwargs):
+    target.capability_rows = []
 
 # Database connection
-DB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "aistaff.db")
-DATABASE_URL = f"sqlite:///{DB_PATH}"
+ASYNC_DATABASE_URL = f"sqlite+aiosqlite:///{DB_PATH}"
+ASYNC_READ_ONLY_DATABASE_URL = f"sqlite+aiosqlite:///file:{DB_PATH}?mode=ro&uri=true"
+WAL_MODE = DB_STORAGE_MODE == "wal"
+
+# Connection pragmas for wal mode; synchronous=NORMAL is durable across crashes in WAL
+SQLITE_WAL_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-16000",
+    "PRAGMA mmap_size=268435456",
+)
+
+def _configure_connection(pragmas, begin: Optional[str] = None):
+    """
+    Build a connect listener applying pragmas to each new SQLite connection
 
+    When `begin` is given, the driver's implicit transaction handling is turned
+    off and the listener's engine should emit `begin` itself (see
+    _emit_begin), which SAVEPOINT-based group commits rely on.
+    """
+    def on_connect(dbapi_connection, connection_record):
+        if begin is not None:
+            dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA busy_timeout={DB_BUSY_TIMEOUT_MS}")
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+    return on_connect
+
+def _emit_begin(statement: str):
+    def on_begin(connection):
+        connection.exec_driver_sql(statement)
+    return on_begin
+
+# Synchronous engine, used for DDL, migrations and scripts
 engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engines used by the API; each aiosqlite connection runs on its own thread.
+# Writes go through the group commit writer on a single connection that manages
+# its own transactions. Reads run without an explicit transaction so they hold no
+# locks once a statement finishes; in wal mode they use read-only connections.
+if WAL_MODE:
+    event.listen(engine, "connect", _configure_connection(SQLITE_WAL_PRAGMAS))
+    async_engine = create_async_engine(
+        ASYNC_READ_ONLY_DATABASE_URL, pool_size=DB_READ_POOL_SIZE, max_overflow=0
+    )
+    event.listen(async_engine.sync_engine, "connect", _configure_connection(()))
+    write_pragmas = SQLITE_WAL_PRAGMAS
+else:
+    async_engine = create_async_engine(ASYNC_DATABASE_URL)
+    event.listen(async_engine.sync_engine, "connect", _configure_connection(()))
+    write_pragmas = ()
+# BEGIN IMMEDIATE takes the write lock up front instead of upgrading mid-transaction
+async_write_engine = create_async_engine(ASYNC_DATABASE_URL, pool_size=1, max_overflow=0)
+event.listen(async_write_engine.sync_engine, "connect", _configure_connection(write_pragmas, begin="BEGIN IMMEDIATE"))
+event.listen(async_write_engine.sync_engine, "begin", _emit_begin("BEGIN IMMEDIATE"))
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+AsyncWriteSessionLocal = async_sessionmaker(async_write_engine, autoflush=False, expire_on_commit=False)
+
 # Create tables
 def create_tables():
     Base.metadata.create_all(bind=engine)
+    # create_all skips existing tables, so add indexes introduced since they were created
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+    create_search_index(engine)
+    run_migrations(engine)
+
+def schema_fingerprint() -> str:
+    """Digest of the DDL this code expects, so a database built from it can skip create_tables"""
+    tables = Base.metadata.sorted_tables
+    statements = [str(CreateTable(table).compile(engine)) for table in tables]
+    statements += [str(CreateIndex(index).compile(engine))
+                   for table in tables for index in sorted(table.indexes, key=lambda index: index.name)]
+    statements += LISTING_SEARCH_DDL
+    statements.append(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    return hashlib.sha256("\n".join(statements).encode()).hexdigest()
+
+def ensure_schema() -> bool:
+    """
+    Create and migrate the schema, unless the database already matches this code
+
+    Returns:
+        True if DDL ran, False if the recorded schema fingerprint was current
+    """
+    fingerprint = schema_fingerprint()
+    with engine.connect() as conn:
+        current = get_schema_version(conn) >= SCHEMA_VERSION and get_schema_fingerprint(conn) == fingerprint
+    if current:
+        load_search_index(engine)
+        return False
+    create_tables()
+    with engine.begin() as conn:
+        set_schema_fingerprint(conn, fingerprint)
+    return True
 
 # Get DB session
 def get_db():
@@ -75,3 +268,8 @@ def get_db():
         yield db
     finally:
         db.close()
+
+# Get async DB session (read-only in wal mode; write through backend.db.writer)
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
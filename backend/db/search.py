@@ -0,0 +1,106 @@
+import logging
+import re
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+
+logger = logging.getLogger(__name__)
+
+LISTING_SEARCH_TABLE = "marketplace_listings_fts"
+
+# Column weights for bm25 ranking: name, description, author
+LISTING_SEARCH_WEIGHTS = (10.0, 1.0, 5.0)
+
+# External-content FTS5 index over marketplace listings. Triggers keep it in sync
+# with every insert/update/delete, whichever code path writes the listing.
+LISTING_SEARCH_DDL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {LISTING_SEARCH_TABLE} USING fts5(
+        name, description, author,
+        content='marketplace_listings', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS marketplace_listings_fts_ai AFTER INSERT ON marketplace_listings BEGIN
+        INSERT INTO {LISTING_SEARCH_TABLE}(rowid, name, description, author)
+        VALUES (new.id, new.name, new.description, new.author);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS marketplace_listings_fts_ad AFTER DELETE ON marketplace_listings BEGIN
+        INSERT INTO {LISTING_SEARCH_TABLE}({LISTING_SEARCH_TABLE}, rowid, name, description, author)
+        VALUES ('delete', old.id, old.name, old.description, old.author);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS marketplace_listings_fts_au
+    AFTER UPDATE OF name, description, author ON marketplace_listings BEGIN
+        INSERT INTO {LISTING_SEARCH_TABLE}({LISTING_SEARCH_TABLE}, rowid, name, description, author)
+        VALUES ('delete', old.id, old.name, old.description, old.author);
+        INSERT INTO {LISTING_SEARCH_TABLE}(rowid, name, description, author)
+        VALUES (new.id, new.name, new.description, new.author);
+    END
+    """,
+]
+
+# Set by create_search_index; False when SQLite was built without FTS5
+fts_enabled = False
+
+def create_search_index(engine: Engine) -> bool:
+    """
+    Create the listing search index and its sync triggers if missing
+
+    A newly created index is rebuilt from the existing listings.
+
+    Returns:
+        True if the FTS5 index is available
+    """
+    global fts_enabled
+    try:
+        with engine.begin() as conn:
+            exists = conn.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                {"name": LISTING_SEARCH_TABLE}
+            ).first() is not None
+            for statement in LISTING_SEARCH_DDL:
+                conn.execute(text(statement))
+            if not exists:
+                conn.execute(text(f"INSERT INTO {LISTING_SEARCH_TABLE}({LISTING_SEARCH_TABLE}) VALUES ('rebuild')"))
+                logger.info("Built marketplace search index")
+        fts_enabled = True
+    except OperationalError as e:
+        logger.warning(f"FTS5 unavailable, marketplace search falls back to LIKE matching: {str(e)}")
+        fts_enabled = False
+    return fts_enabled
+
+def load_search_index(engine: Engine) -> bool:
+    """
+    Detect an existing listing search index without running any DDL
+
+    Returns:
+        True if the FTS5 index is available
+    """
+    global fts_enabled
+    with engine.connect() as conn:
+        fts_enabled = conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+            {"name": LISTING_SEARCH_TABLE}
+        ).first() is not None
+    return fts_enabled
+
+_TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+def build_match_query(query: str) -> Optional[str]:
+    """
+    Turn free text into an FTS5 MATCH expression
+
+    Every word becomes a quoted prefix term, so user input cannot inject FTS
+    syntax and "anal" matches "analysis". Terms are combined with AND.
+    """
+    terms = _TOKEN_PATTERN.findall(query)
+    if not terms:
+        return None
+    return " ".join(f'"{term}"*' for term in terms)
@@ -0,0 +1,139 @@
+import asyncio
+import contextvars
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from backend.db.models import AsyncWriteSessionLocal
+from backend.config import DB_GROUP_COMMIT_MAX_BATCH
+
+logger = logging.getLogger(__name__)
+
+WriteWork = Callable[[AsyncSession], Awaitable[Any]]
+
+class GroupCommitWriter:
+    """
+    Single database writer that merges concurrent transactions into group commits
+
+    Callers hand in a unit of work, an async function taking the writer's
+    session. The writer runs queued units one after another on one connection,
+    each inside its own SAVEPOINT so a failing unit is rolled back alone, then
+    commits everything that succeeded at once. Writes arriving while a commit
+    is in progress form the next group, so under load each fsync covers many
+    writes and writers never contend for the database lock.
+    """
+
+    def __init__(self, session_factory: async_sessionmaker, max_batch: int = DB_GROUP_COMMIT_MAX_BATCH):
+        self.session_factory = session_factory
+        self.max_batch = max(1, max_batch)
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self.commits = 0
+        self.writes = 0
+        self.failed = 0
+        self.largest_batch = 0
+
+    async def run(self, work: WriteWork) -> Any:
+        """
+        Run a unit of work in the writer and wait for the commit that includes it
+
+        Args:
+            work: Async function receiving the writer session; it should add or
+                modify objects and may flush, but must not commit
+
+        Returns:
+            The value returned by work, once committed
+
+        Raises:
+            Whatever work raised (its changes are rolled back), or the commit
+            error if the group commit failed
+        """
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((work, future))
+        return await future
+
+    async def stop(self):
+        """Finish queued writes and stop the writer task"""
+        if self._task is None or self._task.done():
+            return
+        self._queue.put_nowait(None)
+        await self._task
+        self._task = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "max_batch": self.max_batch,
+            "commits": self.commits,
+            "writes": self.writes,
+            "failed": self.failed,
+            "largest_batch": self.largest_batch,
+            "average_batch": self.writes / self.commits if self.commits else 0.0,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+        }
+
+    def _ensure_started(self):
+        # The task is bound to the running loop; start a new one if that loop went away.
+        # It runs in an empty context so it doesn't keep the first caller's request state
+        if self._task is not None and not self._task.done() and self._task.get_loop() is asyncio.get_running_loop():
+            return
+        self._queue = asyncio.Queue()
+        self._task = contextvars.Context().run(asyncio.get_running_loop().create_task, self._process(self._queue))
+
+    async def _process(self, queue: asyncio.Queue):
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            batch = [item]
+            stopping = False
+            while len(batch) < self.max_batch and not queue.empty():
+                item = queue.get_nowait()
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._commit_batch(batch)
+            if stopping:
+                return
+
+    async def _commit_batch(self, batch: List[Tuple[WriteWork, asyncio.Future]]):
+        """Run a group of units, each in a savepoint, and commit them together"""
+        committed = []
+        try:
+            async with self.session_factory() as session:
+                for work, future in batch:
+                    if future.cancelled():
+                        continue
+                    try:
+                        async with session.begin_nested():
+                            result = await work(session)
+                    except Exception as e:
+                        self.failed += 1
+                        if not future.done():
+                            future.set_exception(e)
+                        continue
+                    committed.append((future, result))
+                if committed:
+                    await session.commit()
+        except Exception as e:
+            # Nothing in the group was committed; fail every caller still waiting
+            logger.error(f"Group commit of {len(batch)} writes failed: {str(e)}")
+            for _, future in batch:
+                if not future.done():
+                    self.failed += 1
+                    future.set_exception(e)
+            return
+
+        if not committed:
+            return
+        self.commits += 1
+        self.writes += len(committed)
+        self.largest_batch = max(self.largest_batch, len(committed))
+        for future, result in committed:
+            if not future.done():
+                future.set_result(result)
+
+# Concurrent writes are merged into group commits in both storage modes
+db_writer = GroupCommitWriter(AsyncWriteSessionLocal)
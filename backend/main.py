@@ -1,12 +1,9 @@
-from fastapi import FastAPI, Depends, HTTPException
-from fastapi.middleware.cors import CORSMiddleware
 import logging
-import uvicorn
-from sqlalchemy.orm import Session
 
-from backend.db.models import create_tables, get_db
-from backend.api import agents, marketplace, auth
-from backend.config import CORS_ORIGINS
+# Start the startup timeline before anything heavy is imported
+from backend.config import STARTUP_REPORT
+from backend.utils.startup import startup_report, FirstRequestMiddleware
+startup_report.begin(track_imports=STARTUP_REPORT)
 
 # Configure logging
 logging.basicConfig(
@@ -14,13 +11,39 @@ logging.basicConfig(
     format="%(asctime)s [%(levelname)s] %(message)s",
     handlers=[logging.StreamHandler()]
 )
+
+from fastapi import FastAPI, Depends, HTTPException, Response
+from fastapi.middleware.cors import CORSMiddleware
+from sqlalchemy.orm import Session
+
+from backend.db.models import ensure_schema, get_db, engine, async_engine, async_write_engine
+from backend.db.writer import db_writer
+from backend.services.marketplace_service import marketplace_service
+from backend.api import agents, marketplace, auth, admin
+from backend.config import (
+    CORS_ORIGINS,
+    METRICS_ENABLED,
+    PROFILING_ENABLED,
+    PROFILING_SAMPLE_RATE,
+    PROFILING_FORMAT,
+    PROFILING_INTERVAL_MS,
+)
+from backend.core.agent_manager import agent_manager, task_manager
+from backend.services.password_hasher import password_hasher
+from backend.services.auth_service import is_admin_token
+from backend.utils.metrics import metrics, MetricsMiddleware, instrument_engine
+from backend.utils.profiling import ProfilingMiddleware, PROFILE_ID_HEADER
+from backend.utils.serialization import FastJSONResponse
+
 logger = logging.getLogger(__name__)
+startup_report.mark("imports")
 
 # Create FastAPI app
 app = FastAPI(
     title="AI Staff Development Agent",
     description="API for creating and managing AI agents for staffing",
-    version="0.1.0"
+    version="0.1.0",
+    default_response_class=FastJSONResponse
 )
 
 # Configure CORS
@@ -30,18 +53,61 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", PROFILE_ID_HEADER],
 )
 
+# Record request, query and capability metrics
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+    instrument_engine(engine, "sync")
+    instrument_engine(async_engine.sync_engine, "read")
+    instrument_engine(async_write_engine.sync_engine, "write")
+    metrics.callback("db_writer_queued", "Writes waiting for the database writer",
+                     lambda: db_writer.get_stats()["queued"])
+    metrics.callback("db_writer_commits_total", "Group commits made by the database writer",
+                     lambda: db_writer.commits, kind="counter")
+    metrics.callback("db_writer_writes_total", "Units of work committed by the database writer",
+                     lambda: db_writer.writes, kind="counter")
+    metrics.callback("agent_runtimes_cached", "Agent runtimes held in memory for task dispatch",
+                     lambda: agent_manager.get_stats()["size"])
+    metrics.callback("task_jobs_pending", "Agent task jobs queued or running",
+                     lambda: task_manager.get_stats()["pending"])
+    metrics.callback("marketplace_pending_downloads", "Install counts buffered but not yet written",
+                     lambda: marketplace_service.download_counter.get_stats()["pending_downloads"])
+
+# Report import times and time to first request
+if STARTUP_REPORT:
+    app.add_middleware(FirstRequestMiddleware, report=startup_report)
+
+# Profile requests on demand; nothing is installed unless enabled
+if PROFILING_ENABLED:
+    app.add_middleware(
+        ProfilingMiddleware,
+        store=admin.profile_store,
+        authorize=is_admin_token,
+        sample_rate=PROFILING_SAMPLE_RATE,
+        default_format=PROFILING_FORMAT,
+        interval=PROFILING_INTERVAL_MS / 1000,
+    )
+
 # Include routers
 app.include_router(auth.router, prefix="/api/auth", tags=["auth"])
 app.include_router(agents.router, prefix="/api/agents", tags=["agents"])
 app.include_router(marketplace.router, prefix="/api", tags=["marketplace"])
+if PROFILING_ENABLED:
+    app.include_router(admin.router, prefix="/api/admin", tags=["admin"])
 
 # Health check endpoint
 @app.get("/health", tags=["health"])
 async def health_check():
     return {"status": "healthy", "service": "ai-staff-dev-agent"}
 
+# Prometheus metrics endpoint
+if METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False)
+    async def get_metrics():
+        return Response(content=metrics.render(), media_type="text/plain; version=0.0.4")
+
 # Root endpoint
 @app.get("/", tags=["root"])
 async def root():
@@ -51,12 +117,30 @@ async def root():
         "version": "0.1.0"
     }
 
-# Create database tables on startup
+# Create or migrate database tables on startup, skipping DDL when the schema is current
 @app.on_event("startup")
 async def startup_event():
     logger.info("Starting AI Staff Development Agent API")
-    create_tables()
-    logger.info("Database tables created")
+    if ensure_schema():
+        logger.info("Database tables created")
+    else:
+        logger.info("Database schema is current")
+    startup_report.mark("startup")
+    if not STARTUP_REPORT:
+        startup_report.log()
+
+# Stop task workers and flush pending writes on shutdown
+@app.on_event("shutdown")
+async def shutdown_event():
+    task_manager.shutdown()
+    password_hasher.shutdown()
+    logger.info("Task workers stopped")
+    await marketplace_service.download_counter.stop()
+    await db_writer.stop()
+    await async_write_engine.dispose()
+    await async_engine.dispose()
+    logger.info("Database writer stopped")
 
 if __name__ == "__main__":
+    import uvicorn
     uvicorn.run("backend.main:app", host="0.0.0.0", port=8000, reload=True)
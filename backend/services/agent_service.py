@@ -1,23 +1,48 @@
-import json
 import logging
-from typing import List, Dict, Any, Optional
-from sqlalchemy.orm import Session
+from typing import List, Dict, Any, AsyncIterator, Optional, Tuple
 from datetime import datetime
-import json
+from sqlalchemy import insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from backend.db.models import Agent
+from backend.db.models import Agent, AgentCapability, AsyncSessionLocal
+from backend.db.writer import db_writer
 from backend.core.factory import agent_factory
+from backend.core.intelligence import intelligence_engine
+from backend.core.agent_manager import agent_manager, AgentRuntime, AGENT_ACTIVE
+from backend.utils.helpers import paginate_keyset, filter_by_capabilities, insert_returning_ids, load_capability_names, export_batches
+from backend.utils.serialization import FragmentCache, dumps, encode_array, encode_lines
+from backend.config import PAGE_SIZE_DEFAULT, ROW_FRAGMENT_CACHE_SIZE, EXPORT_BATCH_SIZE
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# Module logger; logging is configured once in backend.main
 logger = logging.getLogger(__name__)
 
+# Sort keys accepted by get_agents
+AGENT_SORT_COLUMNS = {
+    "id": Agent.id,
+    "name": Agent.name,
+    "created_at": Agent.created_at,
+}
+
+# Columns agent list responses are built from, without loading ORM objects
+AGENT_COLUMNS = (
+    Agent.id,
+    Agent.name,
+    Agent.description,
+    Agent.status,
+    Agent.created_at,
+    Agent.updated_at,
+)
+
 class AgentService:
     """
     Service class for agent-related business logic
     """
     
-    def create_agent(self, db: Session, agent_data) -> Agent:
+    def __init__(self):
+        # Encoded JSON of individual agents, reused across list pages
+        self.row_fragments = FragmentCache(ROW_FRAGMENT_CACHE_SIZE)
+    
+    async def create_agent(self, agent_data) -> Dict[str, Any]:
         """Create a new agent in the database"""
         
         # Use the agent factory to create the agent config
@@ -31,63 +56,291 @@ class AgentService:
         db_agent = Agent(
             name=agent_config["name"],
             description=agent_config["description"],
-            capabilities=json.dumps(agent_config["capabilities"]),
+            capabilities=agent_config["capabilities"],
             status=agent_config["status"]
         )
         
-        # Save to database
-        db.add(db_agent)
-        db.commit()
-        db.refresh(db_agent)
-        
-        # Fix data format before returning
-        if isinstance(db_agent.capabilities, str):
-            db_agent.capabilities = json.loads(db_agent.capabilities)
-        if isinstance(db_agent.created_at, datetime):
-            db_agent.created_at = db_agent.created_at.isoformat()
-        
-        logger.info(f"Created agent in database: {db_agent.id} - {db_agent.name}")
-        return db_agent
-    
-    def get_agents(self, db: Session) -> List[Agent]:
-        """Get all agents from the database"""
-        agents = db.query(Agent).filter(Agent.is_active == True).all()
-        # Process each agent to ensure correct data types
-        for agent in agents:
-            if isinstance(agent.capabilities, str):
-                agent.capabilities = json.loads(agent.capabilities)
-            if isinstance(agent.created_at, datetime):
-                agent.created_at = agent.created_at.isoformat()
-        return agents
-    
-    def get_agent(self, db: Session, agent_id: int) -> Optional[Agent]:
+        # Save to database through the group commit writer
+        async def insert(db: AsyncSession) -> Dict[str, Any]:
+            db.add(db_agent)
+            await db.flush()
+            return self._format_agent(db_agent)
+        
+        agent = await db_writer.run(insert)
+        agent_manager.invalidate(agent["id"])
+        
+        logger.info(f"Created agent in database: {agent['id']} - {agent['name']}")
+        return agent
+    
+    async def bulk_create_agents(self, agents_data: List[Any]) -> Dict[str, Any]:
+        """
+        Validate a set of agents and insert the valid ones in a single transaction
+        
+        Returns:
+            Dict with totals and per-item results ({index, status, id} or {index, status, error})
+        """
+        results: List[Dict[str, Any]] = []
+        configs: List[Tuple[int, Dict[str, Any]]] = []
+        for index, agent_data in enumerate(agents_data):
+            validation = agent_factory.validate_agent_config(agent_data.dict())
+            if not validation["valid"]:
+                results.append({"index": index, "status": "error", "error": "; ".join(validation["errors"])})
+                continue
+            configs.append((index, agent_factory.create_agent(
+                name=agent_data.name,
+                description=agent_data.description,
+                capabilities=agent_data.capabilities
+            )))
+        
+        if configs:
+            now = datetime.utcnow()
+            agent_rows = [
+                {
+                    "name": config["name"],
+                    "description": config["description"],
+                    "status": config["status"],
+                    "created_at": now,
+                    "updated_at": now,
+                }
+                for _, config in configs
+            ]
+            
+            async def insert_agents(db: AsyncSession) -> List[int]:
+                connection = await db.connection()
+                ids = await insert_returning_ids(connection, Agent.__table__, agent_rows)
+                capability_rows = [
+                    {"agent_id": agent_id, "name": name, "position": position}
+                    for agent_id, (_, config) in zip(ids, configs)
+                    for position, name in enumerate(config["capabilities"])
+                ]
+                if capability_rows:
+                    await connection.execute(insert(AgentCapability.__table__), capability_rows)
+                return ids
+            
+            try:
+                ids = await db_writer.run(insert_agents)
+            except Exception as e:
+                logger.error(f"Bulk agent insert failed: {str(e)}")
+                results.extend(
+                    {"index": index, "status": "error", "error": f"Insert failed: {str(e)}"} for index, _ in configs
+                )
+            else:
+                results.extend(
+                    {"index": index, "status": "created", "id": agent_id}
+                    for (index, _), agent_id in zip(configs, ids)
+                )
+                logger.info(f"Created {len(ids)} agents in database")
+        
+        results.sort(key=lambda result: result["index"])
+        created = sum(1 for result in results if result["status"] == "created")
+        return {"total": len(results), "created": created, "failed": len(results) - created, "results": results}
+    
+    async def get_agents(self, db: AsyncSession, limit: int = PAGE_SIZE_DEFAULT, after: Optional[str] = None,
+                   status: Optional[str] = None, sort: str = "id",
+                   capabilities: Optional[List[str]] = None,
+                   capability_match: str = "any") -> Tuple[bytes, Optional[str]]:
+        """
+        Get a page of agents from the database
+        
+        Args:
+            limit: Maximum number of agents to return
+            after: Cursor returned with the previous page
+            status: Only return agents with this status
+            sort: Sort key (id, name, created_at), prefixed with "-" for descending
+            capabilities: Only return agents with these capabilities
+            capability_match: "any" or "all" of the given capabilities
+            
+        Returns:
+            Tuple of (agents encoded as a JSON array, cursor for the next page or None)
+        """
+        query = select(*AGENT_COLUMNS).where(Agent.is_active == True)
+        if status:
+            query = query.where(Agent.status == status)
+        if capabilities:
+            query = filter_by_capabilities(
+                query, Agent.id, AgentCapability.agent_id, AgentCapability.name, capabilities, capability_match
+            )
+        agents, next_cursor = await paginate_keyset(db, query, AGENT_SORT_COLUMNS, Agent.id, sort, limit, after)
+        return await self._encode_agents(db, agents), next_cursor
+    
+    def export_agents(self, after_id: Optional[int] = None,
+                      batch_size: int = EXPORT_BATCH_SIZE) -> AsyncIterator[bytes]:
+        """
+        Stream every active agent as NDJSON in id order
+        
+        Batches are read in their own sessions, so the stream outlives the
+        request's session. Pass the last exported id as after_id to resume.
+        """
+        async def encode(db: AsyncSession, agents: List[Any]) -> bytes:
+            capabilities = await load_capability_names(
+                db, AgentCapability.agent_id, AgentCapability.name, AgentCapability.position,
+                [agent.id for agent in agents]
+            )
+            return encode_lines(self._agent_dict(agent, capabilities.get(agent.id, [])) for agent in agents)
+        
+        query = select(*AGENT_COLUMNS).where(Agent.is_active == True)
+        return export_batches(AsyncSessionLocal, query, Agent.id, encode, batch_size, after_id)
+    
+    async def get_agent(self, db: AsyncSession, agent_id: int) -> Optional[Dict[str, Any]]:
         """Get a specific agent by ID"""
-        agent = db.query(Agent).filter(Agent.id == agent_id, Agent.is_active == True).first()
-        if agent:
-            if isinstance(agent.capabilities, str):
-                agent.capabilities = json.loads(agent.capabilities)
-            if isinstance(agent.created_at, datetime):
-                agent.created_at = agent.created_at.isoformat()
+        agent = await self._get_active_agent(db, agent_id)
+        if not agent:
+            return None
+        return self._format_agent(agent)
+    
+    async def get_agent_runtime(self, db: AsyncSession, agent_id: int) -> Optional[AgentRuntime]:
+        """
+        Get the runtime that dispatches an agent's tasks
+        
+        Active agents are served from the runtime cache; inactive agents are read
+        from the database on every call.
+        """
+        runtime = agent_manager.get(agent_id)
+        if runtime is not None:
+            return runtime
+        generation = agent_manager.generation
+        agent = await self.get_agent(db, agent_id)
+        if not agent:
+            return None
+        return agent_manager.load(agent, generation)
+    
+    async def set_agent_status(self, agent_id: int, status: str) -> Optional[Dict[str, Any]]:
+        """
+        Move an agent to AGENT_ACTIVE or AGENT_INACTIVE
+        
+        Activating an agent warms its runtime so its first task needs no
+        database reads; deactivating drops the runtime.
+        
+        Returns:
+            The updated agent, or None if not found
+        """
+        async def set_status(db: AsyncSession) -> Optional[Dict[str, Any]]:
+            agent = await self._get_active_agent(db, agent_id)
+            if not agent:
+                return None
+            agent.status = status
+            await db.flush()
+            return self._format_agent(agent)
+        
+        agent = await db_writer.run(set_status)
+        if not agent:
+            return None
+        agent_manager.invalidate(agent_id)
+        if status == AGENT_ACTIVE:
+            agent_manager.load(agent, agent_manager.generation)
+        
+        logger.info(f"Agent {agent_id} is now {status}")
         return agent
     
-    def delete_agent(self, db: Session, agent_id: int) -> bool:
+    async def delete_agent(self, agent_id: int) -> bool:
         """
         Delete an agent by ID (soft delete)
         
         Returns:
             bool: True if deleted, False if not found
         """
-        agent = db.query(Agent).filter(Agent.id == agent_id, Agent.is_active == True).first()
-        if not agent:
-            return False
+        async def soft_delete(db: AsyncSession) -> bool:
+            agent = await self._get_active_agent(db, agent_id)
+            if not agent:
+                return False
+            agent.is_active = False
+            return True
         
-        # Soft delete
-        agent.is_active = False
-        db.commit()
+        if not await db_writer.run(soft_delete):
+            return False
+        self.row_fragments.invalidate(agent_id)
+        agent_manager.invalidate(agent_id)
         
         logger.info(f"Deleted agent: {agent_id}")
         return True
     
+    async def bulk_delete_agents(self, agent_ids: List[int]) -> Dict[str, Any]:
+        """
+        Soft delete a set of agents with one UPDATE
+        
+        Returns:
+            Dict with totals and per-id results ({id, status} or {id, status, error})
+        """
+        requested = list(dict.fromkeys(agent_ids))
+        
+        async def soft_delete(db: AsyncSession) -> List[int]:
+            result = await db.execute(
+                update(Agent)
+                .where(Agent.id.in_(requested), Agent.is_active == True)
+                .values(is_active=False)
+                .returning(Agent.id),
+                execution_options={"synchronize_session": False}
+            )
+            return result.scalars().all()
+        
+        deleted = set(await db_writer.run(soft_delete)) if requested else set()
+        self.row_fragments.invalidate(*deleted)
+        agent_manager.invalidate(*deleted)
+        results = [
+            {"id": agent_id, "status": "deleted"} if agent_id in deleted
+            else {"id": agent_id, "status": "error", "error": f"Agent with ID {agent_id} not found"}
+            for agent_id in requested
+        ]
+        
+        logger.info(f"Deleted {len(deleted)} agents")
+        return {
+            "total": len(results),
+            "deleted": len(deleted),
+            "failed": len(results) - len(deleted),
+            "results": results
+        }
+    
     def get_available_capabilities(self) -> List[str]:
         """Get list of available capabilities for agents"""
         return agent_factory.get_available_capabilities()
+    
+    def get_capability_details(self) -> List[Dict[str, Any]]:
+        """Get metadata (cost class, CPU/IO bound) for available capabilities"""
+        return intelligence_engine.get_capability_details()
+    
+    def get_capability_cache_stats(self) -> Dict[str, Any]:
+        """Get hit/miss statistics of the capability result cache"""
+        return intelligence_engine.get_cache_stats()
+    
+    async def _get_active_agent(self, db: AsyncSession, agent_id: int) -> Optional[Agent]:
+        """Load an active agent with its capabilities"""
+        return await db.scalar(select(Agent).where(Agent.id == agent_id, Agent.is_active == True))
+    
+    def _format_agent(self, agent: Agent) -> Dict[str, Any]:
+        """Format an agent model for API response"""
+        return self._agent_dict(agent, list(agent.capabilities))
+    
+    @staticmethod
+    def _agent_dict(agent: Any, capabilities: List[str]) -> Dict[str, Any]:
+        """Format an agent model or AGENT_COLUMNS row for API response"""
+        return {
+            "id": agent.id,
+            "name": agent.name,
+            "description": agent.description,
+            "capabilities": capabilities,
+            "status": agent.status,
+            "created_at": agent.created_at.isoformat()
+        }
+    
+    @staticmethod
+    def _agent_version(agent: Any) -> Tuple[datetime, str]:
+        return agent.updated_at, agent.status
+    
+    async def _encode_agents(self, db: AsyncSession, agents: List[Any]) -> bytes:
+        """
+        Encode AGENT_COLUMNS rows as a JSON array
+        
+        Rows whose cached fragment matches their updated_at and status are copied
+        as is; only the rest load capabilities and get encoded.
+        """
+        fragments, missing = self.row_fragments.lookup(agents, self._agent_version)
+        if missing:
+            capabilities = await load_capability_names(
+                db, AgentCapability.agent_id, AgentCapability.name, AgentCapability.position,
+                [agent.id for agent in missing]
+            )
+            for agent in missing:
+                fragment = dumps(self._agent_dict(agent, capabilities.get(agent.id, [])))
+                self.row_fragments.store(agent.id, self._agent_version(agent), fragment)
+                fragments[agent.id] = fragment
+        return encode_array(fragments[agent.id] for agent in agents)
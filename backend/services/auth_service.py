@@ -1,57 +1,141 @@
 from datetime import datetime, timedelta
-from typing import Optional, Union
+from typing import Any, Dict, Optional, Union
+import hashlib
+import time
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from jose import JWTError, jwt
-from sqlalchemy.orm import Session
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, object_session
 from sqlalchemy.exc import IntegrityError
 
-from backend.db.models import User, get_db
-from backend.config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES, REFRESH_TOKEN_EXPIRE_DAYS
+from backend.db.models import User, AsyncSessionLocal, get_async_db
+from backend.db.writer import db_writer
+from backend.services.password_hasher import password_hasher, PasswordHasherBusyError
+from backend.utils.cache import TTLCache
+from backend.config import (
+    SECRET_KEY,
+    ALGORITHM,
+    ACCESS_TOKEN_EXPIRE_MINUTES,
+    REFRESH_TOKEN_EXPIRE_DAYS,
+    PRINCIPAL_CACHE_SIZE,
+    PRINCIPAL_CACHE_TTL,
+)
 
 # OAuth2 scheme for token authentication
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
+# Verified access tokens (keyed by SHA-256 digest) mapped to detached user snapshots
+principal_cache = TTLCache(maxsize=PRINCIPAL_CACHE_SIZE, ttl=PRINCIPAL_CACHE_TTL)
+
+# Session.info key collecting users changed in the current transaction
+_STALE_PRINCIPALS_KEY = "stale_principal_user_ids"
+
+def _token_digest(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+def _user_tag(user_id: int) -> str:
+    return f"user:{user_id}"
+
+def _user_snapshot(user: User) -> User:
+    """Copy a user's column values into a new transient instance safe to share across requests"""
+    return User(**{column.key: getattr(user, column.key) for column in User.__table__.columns})
+
+def invalidate_user_principals(user_id: int):
+    """Drop cached principals for a user; needed after bulk UPDATEs that bypass ORM events"""
+    principal_cache.invalidate_tags(_user_tag(user_id))
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _mark_principal_stale(mapper, connection, target: User):
+    # Drop now, and again after commit so a concurrent request cannot re-cache pre-commit state
+    invalidate_user_principals(target.id)
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault(_STALE_PRINCIPALS_KEY, set()).add(target.id)
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_principals(session: Session):
+    for user_id in session.info.pop(_STALE_PRINCIPALS_KEY, ()):
+        invalidate_user_principals(user_id)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_stale_principals(session: Session):
+    session.info.pop(_STALE_PRINCIPALS_KEY, None)
+
+def get_principal_cache_stats() -> Dict[str, Any]:
+    """Get hit/miss statistics for the authenticated principal cache"""
+    return principal_cache.stats()
+
 # Models for token payloads
 class TokenData:
     def __init__(self, username: Optional[str] = None, token_type: str = "access"):
         self.username = username
         self.token_type = token_type
 
+def _password_busy_exception() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Too many authentication requests, please retry shortly",
+        headers={"Retry-After": "1"},
+    )
+
 # User authentication functions
-def authenticate_user(db: Session, username: str, password: str) -> Optional[User]:
-    """Authenticate a user by username and password"""
-    user = get_user_by_username(db, username)
-    if not user or not user.verify_password(password):
+async def authenticate_user(db: AsyncSession, username: str, password: str) -> Optional[User]:
+    """
+    Authenticate a user by username and password
+    
+    Verification runs on the password hasher pool. If the stored hash uses a
+    different bcrypt cost than configured, it is transparently replaced.
+    """
+    user = await get_user_by_username(db, username)
+    if not user:
         return None
+    try:
+        valid, new_hash = await password_hasher.verify_and_update(password, user.hashed_password)
+    except PasswordHasherBusyError:
+        raise _password_busy_exception()
+    if not valid:
+        return None
+    if new_hash:
+        async def rehash(write_db: AsyncSession):
+            stored_user = await write_db.get(User, user.id)
+            if stored_user is not None:
+                stored_user.hashed_password = new_hash
+        
+        await db_writer.run(rehash)
+        user.hashed_password = new_hash
     return user
 
-def get_user_by_username(db: Session, username: str) -> Optional[User]:
+async def get_user_by_username(db: AsyncSession, username: str) -> Optional[User]:
     """Get a user by username"""
-    return db.query(User).filter(User.username == username).first()
+    return await db.scalar(select(User).where(User.username == username))
 
-def get_user_by_email(db: Session, email: str) -> Optional[User]:
+async def get_user_by_email(db: AsyncSession, email: str) -> Optional[User]:
     """Get a user by email"""
-    return db.query(User).filter(User.email == email).first()
+    return await db.scalar(select(User).where(User.email == email))
 
-def create_user(db: Session, username: str, email: str, password: str, full_name: Optional[str] = None, is_admin: bool = False) -> User:
+async def create_user(db: AsyncSession, username: str, email: str, password: str, full_name: Optional[str] = None, is_admin: bool = False) -> User:
     """Create a new user"""
     # Check if username or email already exists
-    if get_user_by_username(db, username):
+    if await get_user_by_username(db, username):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Username already registered"
         )
     
-    if get_user_by_email(db, email):
+    if await get_user_by_email(db, email):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Email already registered"
         )
     
     # Create new user
-    hashed_password = User.get_password_hash(password)
+    try:
+        hashed_password = await password_hasher.hash(password)
+    except PasswordHasherBusyError:
+        raise _password_busy_exception()
     user = User(
         username=username,
         email=email,
@@ -60,13 +144,14 @@ def create_user(db: Session, username: str, email: str, password: str, full_name
         is_admin=is_admin
     )
     
-    try:
-        db.add(user)
-        db.commit()
-        db.refresh(user)
+    async def insert(write_db: AsyncSession) -> User:
+        write_db.add(user)
+        await write_db.flush()
         return user
+    
+    try:
+        return await db_writer.run(insert)
     except IntegrityError:
-        db.rollback()
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="User creation failed due to database error"
@@ -75,6 +160,8 @@ def create_user(db: Session, username: str, email: str, password: str, full_name
 # Token functions
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create a new access token"""
+    from jose import jwt
+    
     to_encode = data.copy()
     
     # Set expiration time
@@ -95,6 +182,8 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
 
 def create_refresh_token(data: dict) -> str:
     """Create a new refresh token with longer expiration"""
+    from jose import jwt
+    
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
     
@@ -107,8 +196,20 @@ def create_refresh_token(data: dict) -> str:
     return encoded_jwt
 
 # User dependency functions
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
-    """Dependency to get the current user from a token"""
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)) -> User:
+    """
+    Dependency to get the current user from a token
+    
+    Verified tokens are cached by digest until they expire or the cache TTL
+    passes, so repeat requests skip the signature check and the user query.
+    """
+    cache_key = _token_digest(token)
+    cached_user = principal_cache.get(cache_key)
+    if cached_user is not None:
+        return cached_user
+    generation = principal_cache.generation
+    from jose import JWTError, jwt
+    
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -137,10 +238,19 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
         raise credentials_exception
     
     # Get user from database
-    user = get_user_by_username(db, token_data.username)
+    user = await get_user_by_username(db, token_data.username)
     if user is None:
         raise credentials_exception
     
+    # Never cache past the token's own expiry
+    ttl = principal_cache.ttl
+    expires_at = payload.get("exp")
+    if expires_at is not None:
+        ttl = min(ttl, expires_at - time.time())
+    if ttl > 0:
+        principal_cache.set(cache_key, _user_snapshot(user), ttl=ttl,
+                            tags=[_user_tag(user.id)], generation=generation)
+    
     return user
 
 def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
@@ -154,3 +264,12 @@ def get_current_admin_user(current_user: User = Depends(get_current_active_user)
     if not current_user.is_admin:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not enough permissions")
     return current_user
+
+async def is_admin_token(token: str) -> bool:
+    """Whether a bearer token belongs to an active admin, resolved through the principal cache"""
+    try:
+        async with AsyncSessionLocal() as db:
+            user = await get_current_user(token, db)
+    except HTTPException:
+        return False
+    return user.is_active and user.is_admin
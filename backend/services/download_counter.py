@@ -0,0 +1,135 @@
+import asyncio
+import contextvars
+import logging
+import threading
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from sqlalchemy import bindparam, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from backend.db.models import MarketplaceListing
+from backend.db.writer import db_writer
+from backend.config import DOWNLOAD_FLUSH_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+_listings = MarketplaceListing.__table__
+
+# One parameter set per listing, sent as a single executemany
+_INCREMENT_DOWNLOADS = (
+    update(_listings)
+    .where(_listings.c.id == bindparam("listing_id"))
+    .values(downloads=_listings.c.downloads + bindparam("delta"))
+)
+
+class DownloadCounter:
+    """
+    Aggregates listing download increments in memory and flushes them in batches
+
+    Installs only bump a per-listing delta. Every flush_interval seconds, and on
+    shutdown, the accumulated deltas are written as one atomic
+    `UPDATE ... SET downloads = downloads + :delta` batch through the database
+    writer, so a popular listing costs one row update per interval instead of
+    a read-modify-write transaction per install. Deltas not yet written (or
+    being written) are reported by pending() so reads can merge them.
+    """
+
+    def __init__(self, flush_interval: float = DOWNLOAD_FLUSH_INTERVAL,
+                 on_flush: Optional[Callable[[Iterable[int]], Any]] = None):
+        self.flush_interval = flush_interval
+        self.on_flush = on_flush
+        self._pending: Dict[int, int] = {}
+        self._flushing: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._task: Optional[asyncio.Task] = None
+        self.flushes = 0
+        self.failed_flushes = 0
+
+    def increment(self, listing_id: int, amount: int = 1):
+        """Record downloads for a listing; must be called from the event loop"""
+        with self._lock:
+            self._pending[listing_id] = self._pending.get(listing_id, 0) + amount
+        self._ensure_started()
+
+    def pending(self, listing_id: int) -> int:
+        """Downloads recorded for a listing but not yet committed"""
+        with self._lock:
+            return self._pending.get(listing_id, 0) + self._flushing.get(listing_id, 0)
+
+    def discard(self, listing_id: int):
+        """Drop pending downloads for a deleted listing"""
+        with self._lock:
+            self._pending.pop(listing_id, None)
+
+    async def flush(self) -> int:
+        """
+        Write all pending deltas in one batch
+
+        Returns:
+            Number of listings updated; on failure the deltas are kept for the next flush
+        """
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                self._flushing, self._pending = self._pending, {}
+                params = [{"listing_id": listing_id, "delta": delta} for listing_id, delta in self._flushing.items()]
+
+            async def apply(db: AsyncSession):
+                connection = await db.connection()
+                await connection.execute(_INCREMENT_DOWNLOADS, params)
+
+            try:
+                await db_writer.run(apply)
+            except Exception as e:
+                self.failed_flushes += 1
+                logger.error(f"Failed to flush download counts for {len(params)} listings: {str(e)}")
+                with self._lock:
+                    for listing_id, delta in self._flushing.items():
+                        self._pending[listing_id] = self._pending.get(listing_id, 0) + delta
+                    self._flushing = {}
+                return 0
+
+            with self._lock:
+                flushed, self._flushing = self._flushing, {}
+            self.flushes += 1
+            if self.on_flush is not None:
+                self.on_flush(flushed.keys())
+            return len(flushed)
+
+    async def stop(self):
+        """Stop periodic flushing and write whatever is pending"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "pending_listings": len(self._pending),
+                "pending_downloads": sum(self._pending.values()),
+                "flush_interval": self.flush_interval,
+                "flushes": self.flushes,
+                "failed_flushes": self.failed_flushes,
+            }
+
+    def _ensure_started(self):
+        # The task is bound to the running loop; start a new one if that loop went away.
+        # It runs in an empty context so it doesn't keep the first caller's request state
+        if self._task is not None and not self._task.done() and self._task.get_loop() is asyncio.get_running_loop():
+            return
+        self._flush_lock = asyncio.Lock()
+        self._task = contextvars.Context().run(asyncio.get_running_loop().create_task, self._flush_periodically())
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
@@ -1,8 +1,24 @@
-from typing import List, Optional, Dict, Any
-import json
-from sqlalchemy.orm import Session
-from backend.db.models import MarketplaceListing
-from pydantic import BaseModel
+from typing import List, Optional, Dict, Any, AsyncIterable, AsyncIterator, Tuple
+from datetime import datetime
+from sqlalchemy import insert, or_, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.db.models import MarketplaceListing, ListingCapability, AsyncSessionLocal
+from backend.db import search
+from backend.db.writer import db_writer
+from backend.services.download_counter import DownloadCounter
+from backend.utils.helpers import paginate_keyset, filter_by_capabilities, insert_returning_ids, load_capability_names, export_batches
+from backend.utils.cache import TTLCache
+from backend.utils.serialization import FragmentCache, dumps, encode_array, encode_lines
+from backend.config import (
+    PAGE_SIZE_DEFAULT,
+    ROW_FRAGMENT_CACHE_SIZE,
+    EXPORT_BATCH_SIZE,
+    MARKETPLACE_CACHE_SIZE,
+    MARKETPLACE_CACHE_TTL,
+    MARKETPLACE_BULK_LIMIT,
+    MARKETPLACE_BULK_CHUNK_SIZE,
+)
+from pydantic import BaseModel, ValidationError
 
 class MarketplaceListingCreate(BaseModel):
     name: str
@@ -23,70 +39,320 @@ class MarketplaceListingResponse(BaseModel):
     created_at: str
     updated_at: str
 
+# Sort keys accepted by get_listings
+LISTING_SORT_COLUMNS = {
+    "id": MarketplaceListing.id,
+    "name": MarketplaceListing.name,
+    "price": MarketplaceListing.price,
+    "rating": MarketplaceListing.rating,
+    "downloads": MarketplaceListing.downloads,
+    "created_at": MarketplaceListing.created_at,
+}
+
+# Columns listing responses are built from, without loading ORM objects
+LISTING_COLUMNS = (
+    MarketplaceListing.id,
+    MarketplaceListing.name,
+    MarketplaceListing.description,
+    MarketplaceListing.price,
+    MarketplaceListing.author,
+    MarketplaceListing.rating,
+    MarketplaceListing.downloads,
+    MarketplaceListing.created_at,
+    MarketplaceListing.updated_at,
+)
+
+# Cache tags for marketplace responses
+LISTINGS_TAG = "listings"
+
+def listing_tag(listing_id: int) -> str:
+    return f"listing:{listing_id}"
+
+def _validation_message(error: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}" for err in error.errors())
+
 class MarketplaceService:
-    def get_listings(self, db: Session) -> List[Dict[str, Any]]:
-        """Get all marketplace listings"""
-        listings = db.query(MarketplaceListing).all()
-        return [self._format_listing(listing) for listing in listings]
+    def __init__(self):
+        # Encoded read responses; write paths below invalidate the entries they affect
+        self.response_cache = TTLCache(maxsize=MARKETPLACE_CACHE_SIZE, ttl=MARKETPLACE_CACHE_TTL)
+        # Install counts buffered in memory; reads add the pending deltas
+        self.download_counter = DownloadCounter(on_flush=self._downloads_flushed)
+        # Encoded JSON of individual listings, reused across list and search pages
+        self.row_fragments = FragmentCache(ROW_FRAGMENT_CACHE_SIZE)
+    
+    async def get_listings(self, db: AsyncSession, limit: int = PAGE_SIZE_DEFAULT, after: Optional[str] = None,
+                     author: Optional[str] = None, min_price: Optional[float] = None,
+                     max_price: Optional[float] = None, min_rating: Optional[float] = None,
+                     sort: str = "id", capabilities: Optional[List[str]] = None,
+                     capability_match: str = "any") -> Tuple[bytes, Optional[str]]:
+        """
+        Get a page of marketplace listings
+        
+        Returns:
+            Tuple of (listings encoded as a JSON array, cursor for the next page or None)
+        """
+        query = select(*LISTING_COLUMNS)
+        if author is not None:
+            query = query.filter(MarketplaceListing.author == author)
+        if min_price is not None:
+            query = query.filter(MarketplaceListing.price >= min_price)
+        if max_price is not None:
+            query = query.filter(MarketplaceListing.price <= max_price)
+        if min_rating is not None:
+            query = query.filter(MarketplaceListing.rating >= min_rating)
+        if capabilities:
+            query = filter_by_capabilities(
+                query, MarketplaceListing.id, ListingCapability.listing_id, ListingCapability.name,
+                capabilities, capability_match
+            )
+        listings, next_cursor = await paginate_keyset(
+            db, query, LISTING_SORT_COLUMNS, MarketplaceListing.id, sort, limit, after
+        )
+        return await self._encode_listings(db, listings), next_cursor
+    
+    def export_listings(self, after_id: Optional[int] = None,
+                        batch_size: int = EXPORT_BATCH_SIZE) -> AsyncIterator[bytes]:
+        """
+        Stream every listing as NDJSON in id order
+        
+        Batches are read in their own sessions, so the stream outlives the
+        request's session. Pass the last exported id as after_id to resume.
+        """
+        async def encode(db: AsyncSession, listings: List[Any]) -> bytes:
+            capabilities = await load_capability_names(
+                db, ListingCapability.listing_id, ListingCapability.name, ListingCapability.position,
+                [listing.id for listing in listings]
+            )
+            return encode_lines(self._listing_dict(listing, capabilities.get(listing.id, [])) for listing in listings)
+        
+        return export_batches(
+            AsyncSessionLocal, select(*LISTING_COLUMNS), MarketplaceListing.id, encode, batch_size, after_id
+        )
+    
+    async def search_listings(self, db: AsyncSession, query: str, limit: int = 20) -> bytes:
+        """
+        Full-text search over listing name, description and author
+        
+        Results are ranked by relevance (bm25, name matches weighted highest) and
+        every query word matches as a prefix.
+        
+        Returns:
+            Matching listings encoded as a JSON array
+        """
+        match = search.build_match_query(query)
+        if not match:
+            return encode_array([])
+        
+        if not search.fts_enabled:
+            pattern = f"%{query.strip()}%"
+            listings = (await db.execute(select(*LISTING_COLUMNS).where(or_(
+                MarketplaceListing.name.ilike(pattern),
+                MarketplaceListing.description.ilike(pattern),
+                MarketplaceListing.author.ilike(pattern)
+            )).order_by(MarketplaceListing.name).limit(limit))).all()
+            return await self._encode_listings(db, listings)
+        
+        name_weight, description_weight, author_weight = search.LISTING_SEARCH_WEIGHTS
+        rows = (await db.execute(
+            text(
+                f"SELECT rowid FROM {search.LISTING_SEARCH_TABLE} "
+                f"WHERE {search.LISTING_SEARCH_TABLE} MATCH :match "
+                f"ORDER BY bm25({search.LISTING_SEARCH_TABLE}, :w_name, :w_description, :w_author) "
+                f"LIMIT :limit"
+            ),
+            {
+                "match": match,
+                "w_name": name_weight,
+                "w_description": description_weight,
+                "w_author": author_weight,
+                "limit": limit
+            }
+        )).all()
+        ids = [row[0] for row in rows]
+        if not ids:
+            return encode_array([])
+        
+        # Load matched listings by primary key and restore rank order
+        listings = {
+            listing.id: listing
+            for listing in await db.execute(select(*LISTING_COLUMNS).where(MarketplaceListing.id.in_(ids)))
+        }
+        return await self._encode_listings(db, [listings[listing_id] for listing_id in ids if listing_id in listings])
     
-    def get_listing(self, db: Session, listing_id: int) -> Optional[Dict[str, Any]]:
+    async def get_listing(self, db: AsyncSession, listing_id: int) -> Optional[Dict[str, Any]]:
         """Get a specific marketplace listing by ID"""
-        listing = db.query(MarketplaceListing).filter(MarketplaceListing.id == listing_id).first()
+        listing = await db.get(MarketplaceListing, listing_id)
         if not listing:
             return None
         return self._format_listing(listing)
     
-    def create_listing(self, db: Session, listing_data: MarketplaceListingCreate) -> Dict[str, Any]:
+    async def create_listing(self, listing_data: MarketplaceListingCreate) -> Dict[str, Any]:
         """Create a new marketplace listing"""
-        # Convert capabilities list to JSON string
         data_dict = listing_data.dict()
-        data_dict["capabilities"] = json.dumps(data_dict["capabilities"])
+        # Drop duplicates, which the capability table's primary key would reject
+        data_dict["capabilities"] = list(dict.fromkeys(data_dict["capabilities"]))
         
         # Create new listing
         db_listing = MarketplaceListing(**data_dict)
-        db.add(db_listing)
-        db.commit()
-        db.refresh(db_listing)
         
-        return self._format_listing(db_listing)
+        async def insert(db: AsyncSession) -> Dict[str, Any]:
+            db.add(db_listing)
+            await db.flush()
+            return self._format_listing(db_listing)
+        
+        listing = await db_writer.run(insert)
+        
+        self.response_cache.invalidate_tags(LISTINGS_TAG)
+        return listing
     
-    def update_listing(self, db: Session, listing_id: int, listing_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-        """Update an existing marketplace listing"""
-        listing = db.query(MarketplaceListing).filter(MarketplaceListing.id == listing_id).first()
-        if not listing:
-            return None
+    async def bulk_create_listings(self, rows: AsyncIterable[Any], limit: int = MARKETPLACE_BULK_LIMIT,
+                                   chunk_size: int = MARKETPLACE_BULK_CHUNK_SIZE) -> Dict[str, Any]:
+        """
+        Validate and insert listings from a stream of decoded JSON rows
+        
+        Valid rows are inserted in chunks, each a single executemany transaction
+        through the database writer; invalid rows are reported and skipped.
+        Chunks already committed stay committed, so cached listing pages are
+        invalidated even if reading the rows fails partway.
+        
+        Args:
+            rows: Decoded rows; an Exception instance marks a row that could not be decoded,
+                with the reason as its message
+            limit: Maximum number of rows read; later rows are ignored
+            chunk_size: Rows per insert transaction
             
+        Returns:
+            Dict with totals and per-row results ({index, status, id} or {index, status, error}),
+            plus truncated=True if the input exceeded the limit
+        """
+        results: List[Dict[str, Any]] = []
+        chunk: List[Tuple[int, MarketplaceListingCreate]] = []
+        truncated = False
+        index = 0
+        
+        try:
+            async for row in rows:
+                if index >= limit:
+                    truncated = True
+                    break
+                if isinstance(row, Exception):
+                    results.append({"index": index, "status": "error", "error": str(row)})
+                else:
+                    try:
+                        chunk.append((index, MarketplaceListingCreate.parse_obj(row)))
+                    except ValidationError as e:
+                        results.append({"index": index, "status": "error", "error": _validation_message(e)})
+                index += 1
+                if len(chunk) >= chunk_size:
+                    results.extend(await self._insert_listing_chunk(chunk))
+                    chunk = []
+            if chunk:
+                results.extend(await self._insert_listing_chunk(chunk))
+        finally:
+            if any(result["status"] == "created" for result in results):
+                self.response_cache.invalidate_tags(LISTINGS_TAG)
+        
+        results.sort(key=lambda result: result["index"])
+        created = sum(1 for result in results if result["status"] == "created")
+        return {
+            "total": len(results),
+            "created": created,
+            "failed": len(results) - created,
+            "truncated": truncated,
+            "results": results
+        }
+    
+    async def _insert_listing_chunk(self, chunk: List[Tuple[int, MarketplaceListingCreate]]) -> List[Dict[str, Any]]:
+        """Insert validated listings and their capabilities with one executemany each"""
+        listings_table = MarketplaceListing.__table__
+        capabilities_table = ListingCapability.__table__
+        now = datetime.utcnow()
+        values = [
+            {
+                "name": listing.name,
+                "description": listing.description,
+                "price": listing.price,
+                "author": listing.author,
+                "created_at": now,
+                "updated_at": now,
+            }
+            for _, listing in chunk
+        ]
+        
+        async def insert_chunk(db: AsyncSession) -> List[int]:
+            connection = await db.connection()
+            ids = await insert_returning_ids(connection, listings_table, values)
+            capability_rows = [
+                {"listing_id": listing_id, "name": name, "position": position}
+                for listing_id, (_, listing) in zip(ids, chunk)
+                for position, name in enumerate(dict.fromkeys(listing.capabilities))
+            ]
+            if capability_rows:
+                await connection.execute(insert(capabilities_table), capability_rows)
+            return ids
+        
+        try:
+            ids = await db_writer.run(insert_chunk)
+        except Exception as e:
+            return [{"index": index, "status": "error", "error": f"Insert failed: {str(e)}"} for index, _ in chunk]
+        return [{"index": index, "status": "created", "id": listing_id} for (index, _), listing_id in zip(chunk, ids)]
+    
+    async def update_listing(self, listing_id: int, listing_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Update an existing marketplace listing"""
         # Handle capabilities specially
         if "capabilities" in listing_data:
-            listing_data["capabilities"] = json.dumps(listing_data["capabilities"])
+            listing_data["capabilities"] = list(dict.fromkeys(listing_data["capabilities"] or []))
+        
+        async def update(db: AsyncSession) -> Optional[Dict[str, Any]]:
+            listing = await db.get(MarketplaceListing, listing_id)
+            if not listing:
+                return None
             
-        # Update fields
-        for key, value in listing_data.items():
-            setattr(listing, key, value)
+            # Update fields
+            for key, value in listing_data.items():
+                setattr(listing, key, value)
+            # Capability rows live in another table, so bump the timestamp explicitly
+            listing.updated_at = datetime.utcnow()
             
-        db.commit()
-        db.refresh(listing)
-        return self._format_listing(listing)
+            await db.flush()
+            await db.refresh(listing)
+            return self._format_listing(listing)
+        
+        listing = await db_writer.run(update)
+        if not listing:
+            return None
+        
+        self.row_fragments.invalidate(listing_id)
+        self.response_cache.invalidate_tags(LISTINGS_TAG, listing_tag(listing_id))
+        return listing
     
-    def delete_listing(self, db: Session, listing_id: int) -> bool:
+    async def delete_listing(self, listing_id: int) -> bool:
         """Delete a marketplace listing"""
-        listing = db.query(MarketplaceListing).filter(MarketplaceListing.id == listing_id).first()
-        if not listing:
+        async def delete(db: AsyncSession) -> bool:
+            listing = await db.get(MarketplaceListing, listing_id)
+            if not listing:
+                return False
+            await db.delete(listing)
+            return True
+        
+        if not await db_writer.run(delete):
             return False
-            
-        db.delete(listing)
-        db.commit()
+        
+        self.download_counter.discard(listing_id)
+        self.row_fragments.invalidate(listing_id)
+        self.response_cache.invalidate_tags(LISTINGS_TAG, listing_tag(listing_id))
         return True
     
-    def install_agent(self, db: Session, listing_id: int) -> bool:
+    async def install_agent(self, db: AsyncSession, listing_id: int) -> bool:
         """Install a marketplace agent (convert to user's agent)"""
-        listing = db.query(MarketplaceListing).filter(MarketplaceListing.id == listing_id).first()
-        if not listing:
+        exists = await db.scalar(select(MarketplaceListing.id).where(MarketplaceListing.id == listing_id))
+        if exists is None:
             return False
-            
-        # Increment download count
-        listing.downloads += 1
-        db.commit()
+        
+        # Increment download count; written by the counter's next batched flush. Cached
+        # pages re-encode only this listing's row, since its fragment version includes the pending count
+        self.download_counter.increment(listing_id)
+        self.response_cache.invalidate_tags(LISTINGS_TAG, listing_tag(listing_id))
         
         # In a real implementation, we would create a new agent based on this listing
         # and associate it with the current user
@@ -94,18 +360,48 @@ class MarketplaceService:
     
     def _format_listing(self, listing: MarketplaceListing) -> Dict[str, Any]:
         """Format a listing model for API response"""
+        return self._listing_dict(listing, list(listing.capabilities))
+    
+    def _listing_dict(self, listing: Any, capabilities: List[str]) -> Dict[str, Any]:
+        """Format a listing model or LISTING_COLUMNS row for API response"""
         return {
             "id": listing.id,
             "name": listing.name,
             "description": listing.description,
             "price": listing.price,
             "author": listing.author,
-            "capabilities": json.loads(listing.capabilities) if listing.capabilities else [],
+            "capabilities": capabilities,
             "rating": listing.rating,
-            "downloads": listing.downloads,
+            "downloads": listing.downloads + self.download_counter.pending(listing.id),
             "created_at": listing.created_at.isoformat(),
             "updated_at": listing.updated_at.isoformat()
         }
+    
+    def _listing_version(self, listing: Any) -> Tuple[datetime, int]:
+        return listing.updated_at, listing.downloads + self.download_counter.pending(listing.id)
+    
+    async def _encode_listings(self, db: AsyncSession, listings: List[Any]) -> bytes:
+        """
+        Encode LISTING_COLUMNS rows as a JSON array
+        
+        Rows whose cached fragment matches their updated_at and download count
+        are copied as is; only the rest load capabilities and get encoded.
+        """
+        fragments, missing = self.row_fragments.lookup(listings, self._listing_version)
+        if missing:
+            capabilities = await load_capability_names(
+                db, ListingCapability.listing_id, ListingCapability.name, ListingCapability.position,
+                [listing.id for listing in missing]
+            )
+            for listing in missing:
+                fragment = dumps(self._listing_dict(listing, capabilities.get(listing.id, [])))
+                self.row_fragments.store(listing.id, self._listing_version(listing), fragment)
+                fragments[listing.id] = fragment
+        return encode_array(fragments[listing.id] for listing in listings)
+
+    def _downloads_flushed(self, listing_ids):
+        """Drop cached responses whose download counts were just written"""
+        self.response_cache.invalidate_tags(LISTINGS_TAG, *(listing_tag(listing_id) for listing_id in listing_ids))
 
 # Create service instance
 marketplace_service = MarketplaceService()
@@ -0,0 +1,75 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+from backend.db.models import get_pwd_context
+from backend.config import PASSWORD_HASH_WORKERS, PASSWORD_HASH_QUEUE_LIMIT
+
+logger = logging.getLogger(__name__)
+
+class PasswordHasherBusyError(Exception):
+    """Raised when too many hash/verify operations are already queued"""
+
+class PasswordHasher:
+    """
+    Runs bcrypt hashing and verification on a dedicated, size-bounded thread pool.
+
+    bcrypt releases the GIL, so a small pool keeps the event loop free while
+    hashes run. Operations beyond `max_queue` in flight are rejected instead of
+    queueing without bound behind a login burst.
+    """
+
+    def __init__(self, max_workers: int = PASSWORD_HASH_WORKERS, max_queue: int = PASSWORD_HASH_QUEUE_LIMIT):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor: Optional[ThreadPoolExecutor] = None
+        # Only touched from the event loop thread
+        self._in_flight = 0
+        self.rejected = 0
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="password-hash")
+        return self._executor
+
+    async def _run(self, func, *args):
+        if self._in_flight >= self.max_queue:
+            self.rejected += 1
+            raise PasswordHasherBusyError(f"{self._in_flight} password operations already in flight")
+        self._in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+        finally:
+            self._in_flight -= 1
+
+    async def hash(self, password: str) -> str:
+        """Hash a password with the configured bcrypt cost"""
+        return await self._run(get_pwd_context().hash, password)
+
+    async def verify_and_update(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """
+        Verify a password against its hash
+
+        Returns:
+            Tuple of (valid, replacement hash or None); a replacement is produced when
+            the stored hash was made with a different bcrypt cost than configured
+        """
+        return await self._run(get_pwd_context().verify_and_update, password, hashed_password)
+
+    def get_stats(self):
+        return {
+            "workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "in_flight": self._in_flight,
+            "rejected": self.rejected,
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+# Create singleton instance
+password_hasher = PasswordHasher()
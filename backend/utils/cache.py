@@ -0,0 +1,156 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Optional, Set, Tuple
+
+_MISSING = object()
+
+# Markers telling invalidated keys and tags apart in the invalidation log
+_KEY = "key"
+_TAG = "tag"
+
+class TTLCache:
+    """
+    Thread-safe LRU cache with per-entry expiry and tag-based invalidation.
+
+    Entries can be tagged so writers can drop every entry derived from a piece
+    of data without knowing the exact keys. A generation counter, bumped on every
+    invalidation, lets readers avoid storing values computed from data that was
+    invalidated while they were computing it. The generation each key and tag was
+    last invalidated at is logged, so a store is only refused when its own key or
+    one of its tags was invalidated; once the log is trimmed, stores older than
+    the dropped records are refused too.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0, log_size: Optional[int] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.log_size = maxsize if log_size is None else log_size
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._tags: Dict[Hashable, Set[Hashable]] = {}
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._invalidated: "OrderedDict[Tuple[str, Hashable], int]" = OrderedDict()
+        self._horizon = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Get a value, refreshing its LRU position; expired entries count as misses"""
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                value, expires_at, _ = entry
+                if expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                self._remove(key)
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None,
+            tags: Iterable[Hashable] = (), generation: Optional[int] = None) -> bool:
+        """
+        Store a value
+
+        Args:
+            key: Cache key
+            value: Value to store
+            ttl: Seconds until expiry, defaults to the cache TTL
+            tags: Tags the entry can be invalidated by
+            generation: Generation observed before computing the value; the value
+                is discarded if its key or one of its tags was invalidated since
+
+        Returns:
+            True if the value was stored
+        """
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        tags = tuple(tags)
+        with self._lock:
+            if generation is not None and self._stale(generation, key, tags):
+                return False
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (value, expires_at, tags)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._data) > self.maxsize:
+                oldest = next(iter(self._data))
+                self._remove(oldest)
+                self.evictions += 1
+            return True
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            self._generation += 1
+            self._log(_KEY, key)
+            if key in self._data:
+                self._remove(key)
+                self.invalidations += 1
+
+    def invalidate_tags(self, *tags: Hashable):
+        """Drop every entry carrying any of the given tags"""
+        with self._lock:
+            self._generation += 1
+            for tag in tags:
+                self._log(_TAG, tag)
+                for key in list(self._tags.get(tag, ())):
+                    self._remove(key)
+                    self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._horizon = self._generation
+            self._invalidated.clear()
+            self._data.clear()
+            self._tags.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+    def _stale(self, generation: int, key: Hashable, tags: Tuple[Hashable, ...]) -> bool:
+        """Whether the key or a tag was invalidated after the generation (lock must be held)"""
+        if generation < self._horizon:
+            return True
+        invalidated = self._invalidated
+        if invalidated.get((_KEY, key), 0) > generation:
+            return True
+        return any(invalidated.get((_TAG, tag), 0) > generation for tag in tags)
+
+    def _log(self, kind: str, name: Hashable):
+        """Record an invalidation at the current generation (lock must be held)"""
+        marker = (kind, name)
+        self._invalidated.pop(marker, None)
+        self._invalidated[marker] = self._generation
+        while len(self._invalidated) > self.log_size:
+            _, dropped = self._invalidated.popitem(last=False)
+            self._horizon = max(self._horizon, dropped)
+
+    def _remove(self, key: Hashable):
+        """Remove an entry and its tag references (lock must be held)"""
+        _, _, tags = self._data.pop(key)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
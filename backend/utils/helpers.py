@@ -0,0 +1,177 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import DateTime, Select, Table, bindparam, func, insert, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+def encode_cursor(sort: str, value: Any, last_id: int) -> str:
+    """Encode a keyset position as an opaque, URL-safe cursor"""
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    raw = json.dumps([sort, value, last_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[str, Any, int]:
+    """
+    Decode a cursor produced by encode_cursor
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort, value, last_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(last_id, int):
+        raise ValueError("Invalid cursor")
+    return sort, value, last_id
+
+async def paginate_keyset(db: AsyncSession, query: Select, sort_columns: Dict[str, Any], id_column: Any, sort: str,
+                    limit: int, after: Optional[str] = None) -> Tuple[List[Any], Optional[str]]:
+    """
+    Apply keyset (seek) pagination to a query
+
+    Rows are ordered by the sort column with the primary key as tie-breaker, and
+    the page starts strictly after the position encoded in `after`, so each page
+    is an index range scan regardless of how deep the client has paged.
+
+    Args:
+        db: Database session
+        query: Select of the columns to return, including the sort and id columns
+            (filters already applied)
+        sort_columns: Allowed sort keys mapped to columns
+        id_column: Primary key column used as tie-breaker
+        sort: Sort key, prefixed with "-" for descending order
+        limit: Maximum number of rows to return
+        after: Cursor returned with the previous page
+
+    Returns:
+        Tuple of (result rows, next cursor or None on the last page)
+
+    Raises:
+        ValueError: If the sort key or cursor is invalid
+    """
+    descending = sort.startswith("-")
+    key = sort[1:] if descending else sort
+    if key not in sort_columns:
+        raise ValueError(f"Unsupported sort '{sort}', expected one of: {', '.join(sort_columns)}")
+    column = sort_columns[key]
+    single_key = column is id_column
+
+    if after:
+        cursor_sort, value, last_id = decode_cursor(after)
+        if cursor_sort != sort:
+            raise ValueError("Cursor does not match the requested sort order")
+        if single_key:
+            query = query.filter(id_column < last_id if descending else id_column > last_id)
+        else:
+            if isinstance(column.type, DateTime) and isinstance(value, str):
+                value = datetime.fromisoformat(value)
+            position = tuple_(bindparam(None, value, type_=column.type), bindparam(None, last_id))
+            keys = tuple_(column, id_column)
+            query = query.filter(keys < position if descending else keys > position)
+
+    if single_key:
+        order = [id_column.desc() if descending else id_column.asc()]
+    elif descending:
+        order = [column.desc(), id_column.desc()]
+    else:
+        order = [column.asc(), id_column.asc()]
+
+    rows = (await db.execute(query.order_by(*order).limit(limit + 1))).all()
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    last = rows[-1]
+    next_cursor = encode_cursor(sort, getattr(last, column.key), getattr(last, id_column.key))
+    return rows, next_cursor
+
+def filter_by_capabilities(query: Select, id_column: Any, link_id_column: Any, link_name_column: Any,
+                           capabilities: List[str], match: str = "any") -> Select:
+    """
+    Restrict a select to rows linked to any/all of the given capabilities
+
+    The match runs in SQL against the (name, owner id) index of the capability
+    association table.
+
+    Raises:
+        ValueError: If match is not "any" or "all"
+    """
+    names = set(capabilities)
+    linked = select(link_id_column).where(link_name_column.in_(names))
+    if match == "all":
+        linked = linked.group_by(link_id_column).having(func.count(link_name_column) == len(names))
+    elif match != "any":
+        raise ValueError("capability_match must be 'any' or 'all'")
+    return query.filter(id_column.in_(linked))
+
+async def load_capability_names(db: AsyncSession, link_id_column: Any, link_name_column: Any,
+                                link_position_column: Any, ids: List[int]) -> Dict[int, List[str]]:
+    """
+    Load the ordered capability names of many rows with one query
+
+    Returns:
+        Capability names by owner id; owners without capabilities are absent
+    """
+    names: Dict[int, List[str]] = {}
+    if not ids:
+        return names
+    result = await db.execute(
+        select(link_id_column, link_name_column)
+        .where(link_id_column.in_(ids))
+        .order_by(link_id_column, link_position_column)
+    )
+    for owner_id, name in result:
+        names.setdefault(owner_id, []).append(name)
+    return names
+
+async def export_batches(session_factory: Callable[[], AsyncSession], query: Select, id_column: Any,
+                         encode: Callable[[AsyncSession, List[Any]], Awaitable[bytes]],
+                         batch_size: int, after_id: Optional[int] = None) -> AsyncIterator[bytes]:
+    """
+    Stream a whole table as encoded batches in primary key order
+
+    Each batch is read with a keyset query in its own short-lived session, so
+    memory stays bounded by batch_size and no read transaction stays open while
+    a slow client drains the response. Rows changed during the export show up
+    as they were when their batch was read.
+
+    Args:
+        session_factory: Opens a read session per batch
+        query: Select of the exported columns, including id_column
+        id_column: Primary key column to order and resume by
+        encode: Encodes a batch of rows, with the batch's session for related lookups
+        batch_size: Rows read per query
+        after_id: Only export rows with a greater id (to resume an interrupted export)
+    """
+    while True:
+        batch_query = query.order_by(id_column).limit(batch_size)
+        if after_id is not None:
+            batch_query = batch_query.where(id_column > after_id)
+        async with session_factory() as db:
+            rows = (await db.execute(batch_query)).all()
+            if not rows:
+                return
+            chunk = await encode(db, rows)
+        yield chunk
+        if len(rows) < batch_size:
+            return
+        after_id = getattr(rows[-1], id_column.key)
+
+async def insert_returning_ids(connection: AsyncConnection, table: Table,
+                               rows: List[Dict[str, Any]]) -> List[int]:
+    """
+    Insert rows with batched multi-row INSERT ... RETURNING and return their ids in row order
+
+    SQLite hands out rowids in ascending insert order (max rowid + 1), so within
+    one transaction the sorted ids line up with the rows; sort_by_parameter_order
+    would instead make SQLAlchemy fall back to one INSERT per row.
+    """
+    if not rows:
+        return []
+    result = await connection.execute(insert(table).returning(table.c.id), rows)
+    return sorted(result.scalars().all())
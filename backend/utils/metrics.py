@@ -0,0 +1,307 @@
+import contextvars
+import math
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+LabelValues = Tuple[str, ...]
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+class _ShardedMetric:
+    """
+    Base for metrics whose values are sharded per thread
+
+    Each thread records into its own dict, so the hot path takes no lock and
+    never contends with other threads; the lock is only taken the first time a
+    thread records, and when a scrape collects the shards. Dict copies are
+    atomic under the GIL, so a scrape sees each shard in a consistent state.
+    """
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards: List[Dict[LabelValues, Any]] = []
+        self._lock = threading.Lock()
+
+    def _shard(self) -> Dict[LabelValues, Any]:
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._shards.append(shard)
+        return shard
+
+    def _snapshots(self) -> List[Dict[LabelValues, Any]]:
+        with self._lock:
+            shards = list(self._shards)
+        return [shard.copy() for shard in shards]
+
+class Counter(_ShardedMetric):
+    """Monotonically increasing count per label set"""
+
+    kind = "counter"
+
+    def inc(self, labels: LabelValues = (), amount: float = 1):
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0) + amount
+
+    def collect(self) -> Dict[LabelValues, float]:
+        totals: Dict[LabelValues, float] = {}
+        for snapshot in self._snapshots():
+            for labels, value in snapshot.items():
+                totals[labels] = totals.get(labels, 0) + value
+        return totals
+
+    def render(self) -> List[str]:
+        return [f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+                for labels, value in sorted(self.collect().items())]
+
+class Histogram(_ShardedMetric):
+    """Distribution of observed values over fixed buckets per label set"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, labels: LabelValues = ()):
+        shard = self._shard()
+        # Per-bucket (non-cumulative) counts, with the running sum in the last slot
+        slots = shard.get(labels)
+        if slots is None:
+            slots = shard[labels] = [0] * (len(self.buckets) + 2)
+        slots[bisect_left(self.buckets, value)] += 1
+        slots[-1] += value
+
+    def collect(self) -> Dict[LabelValues, List[float]]:
+        totals: Dict[LabelValues, List[float]] = {}
+        for snapshot in self._snapshots():
+            for labels, slots in snapshot.items():
+                slots = list(slots)
+                total = totals.get(labels)
+                if total is None:
+                    totals[labels] = slots
+                else:
+                    for i, value in enumerate(slots):
+                        total[i] += value
+        return totals
+
+    def render(self) -> List[str]:
+        lines = []
+        bounds = [_number(bound) for bound in self.buckets] + ["+Inf"]
+        names = self.labelnames + ("le",)
+        for labels, slots in sorted(self.collect().items()):
+            cumulative = 0
+            for bound, count in zip(bounds, slots):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_labels(names, labels + (bound,))} {_number(cumulative)}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(slots[-1])}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {_number(cumulative)}")
+        return lines
+
+class CallbackMetric:
+    """Metric whose values are read from a callback at scrape time, e.g. a component's get_stats()"""
+
+    def __init__(self, name: str, documentation: str, callback: Callable[[], Any],
+                 labelnames: Sequence[str] = (), kind: str = "gauge"):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+        self.labelnames = tuple(labelnames)
+        self.kind = kind
+
+    def render(self) -> List[str]:
+        values = self.callback()
+        if not isinstance(values, dict):
+            values = {(): values}
+        return [f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+                for labels, value in sorted(values.items())]
+
+class MetricsRegistry:
+    """Collection of metrics rendered together in the Prometheus text format"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def callback(self, name: str, documentation: str, callback: Callable[[], Any],
+                 labelnames: Sequence[str] = (), kind: str = "gauge") -> CallbackMetric:
+        """
+        Register a metric computed at scrape time
+
+        Args:
+            callback: Returns a number, or a dict mapping label value tuples to numbers
+            kind: Prometheus metric type, "gauge" or "counter"
+        """
+        return self._register(CallbackMetric(name, documentation, callback, labelnames, kind))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def _register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric '{metric.name}' is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+def _labels(names: Sequence[str], values: LabelValues) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def _number(value: float) -> str:
+    if isinstance(value, float):
+        if math.isinf(value):
+            return "+Inf" if value > 0 else "-Inf"
+        if value.is_integer():
+            return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+# Shared registry and the metrics recorded by the middleware, engines and capabilities
+metrics = MetricsRegistry()
+
+http_requests = metrics.counter(
+    "http_requests_total", "HTTP requests by method, route and status code",
+    ("method", "route", "status")
+)
+http_request_duration = metrics.histogram(
+    "http_request_duration_seconds", "HTTP request latency by method and route",
+    ("method", "route")
+)
+http_request_queries = metrics.histogram(
+    "http_request_db_queries", "Database statements executed per HTTP request",
+    ("method", "route"), buckets=QUERY_COUNT_BUCKETS
+)
+http_request_db_duration = metrics.histogram(
+    "http_request_db_duration_seconds", "Database time spent per HTTP request",
+    ("method", "route"), buckets=QUERY_LATENCY_BUCKETS
+)
+db_query_duration = metrics.histogram(
+    "db_query_duration_seconds", "Database statement latency by engine and statement type",
+    ("engine", "operation"), buckets=QUERY_LATENCY_BUCKETS
+)
+capability_duration = metrics.histogram(
+    "capability_duration_seconds", "Capability execution latency by capability and outcome",
+    ("capability", "outcome")
+)
+
+class RequestStats:
+    """Database work done on behalf of one request"""
+
+    __slots__ = ("queries", "db_seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+
+# Set by the middleware for the duration of a request; SQLAlchemy runs statements in
+# greenlets and worker threads that inherit the request's context, so they see it too
+_request_stats: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar("request_stats", default=None)
+
+_OPERATIONS = frozenset({"SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "BEGIN", "SAVEPOINT", "RELEASE", "ROLLBACK", "PRAGMA", "CREATE"})
+
+def instrument_engine(engine: Engine, name: str):
+    """
+    Time every statement run on an engine and count it against the current request
+
+    Args:
+        engine: Sync engine; pass `async_engine.sync_engine` for async engines
+        name: Value of the engine label
+    """
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info["metrics_query_started"] = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info.pop("metrics_query_started", time.perf_counter())
+        words = statement[:32].split(None, 1)
+        operation = words[0].upper() if words else ""
+        if operation not in _OPERATIONS:
+            operation = "OTHER"
+        db_query_duration.observe(elapsed, (name, operation))
+        stats = _request_stats.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.db_seconds += elapsed
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording request counts, status codes, latency and database work per route
+
+    Requests are labelled with the route template (e.g. /api/agents/{agent_id}) rather than
+    the raw path, and requests that match no route share one label, so label cardinality
+    stays bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            _request_stats.reset(token)
+            method = scope["method"]
+            route = _route_label(scope)
+            http_requests.inc((method, route, str(status_code)))
+            http_request_duration.observe(elapsed, (method, route))
+            http_request_queries.observe(stats.queries, (method, route))
+            http_request_db_duration.observe(stats.db_seconds, (method, route))
+
+def _route_label(scope) -> str:
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    if "endpoint" in scope:
+        # Plain Starlette routes (docs, openapi.json) have no path parameters
+        return scope["path"]
+    return "unmatched"
@@ -0,0 +1,258 @@
+import asyncio
+import cProfile
+import json
+import logging
+import os
+import random
+import re
+import sys
+import sysconfig
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+FORMAT_COLLAPSED = "collapsed"
+FORMAT_PSTATS = "pstats"
+PROFILE_EXTENSIONS = {FORMAT_COLLAPSED: "collapsed", FORMAT_PSTATS: "prof"}
+
+PROFILE_HEADER = b"x-profile"
+PROFILE_ID_HEADER = "X-Profile-Id"
+
+_PROFILE_ID = re.compile(r"^[0-9]{13}-[0-9a-f]{8}$")
+# Frame paths are shown relative to the repo, site-packages or the standard library
+_PATH_PREFIXES = sorted({
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))) + os.sep,
+    sysconfig.get_paths()["purelib"] + os.sep,
+    sysconfig.get_paths()["stdlib"] + os.sep,
+}, key=len, reverse=True)
+# Leaf frames in these files mean a worker thread is parked waiting for work
+_IDLE_FILES = ("threading.py", "queue.py", "selectors.py", os.path.join("futures", "thread.py"))
+
+class ProfileStore:
+    """
+    Bounded on-disk ring of request profiles
+
+    Each profile is stored as its output file plus a JSON metadata sidecar.
+    Ids start with a millisecond timestamp, so sorting them orders profiles by
+    age; once max_profiles is exceeded the oldest are deleted.
+    """
+
+    def __init__(self, directory: str, max_profiles: int = 50):
+        self.directory = directory
+        self.max_profiles = max(1, max_profiles)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def new_id() -> str:
+        return f"{int(time.time() * 1000):013d}-{uuid.uuid4().hex[:8]}"
+
+    def save(self, profile_id: str, fmt: str, write: Callable[[str], None], metadata: Dict[str, Any]):
+        """
+        Store a profile and evict the oldest ones beyond the ring size
+
+        Args:
+            profile_id: Id from new_id()
+            fmt: FORMAT_COLLAPSED or FORMAT_PSTATS
+            write: Writes the profile output to the path it is given
+            metadata: Request details stored alongside the profile
+        """
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            write(self._path(profile_id, PROFILE_EXTENSIONS[fmt]))
+            with open(self._path(profile_id, "json"), "w") as f:
+                json.dump(dict(metadata, id=profile_id, format=fmt), f)
+            for stale_id in self._ids()[:-self.max_profiles]:
+                for extension in ("json",) + tuple(PROFILE_EXTENSIONS.values()):
+                    try:
+                        os.remove(self._path(stale_id, extension))
+                    except FileNotFoundError:
+                        pass
+
+    def list(self) -> List[Dict[str, Any]]:
+        """Metadata of stored profiles, newest first"""
+        profiles = []
+        for profile_id in reversed(self._ids()):
+            metadata = self.get(profile_id)
+            if metadata is not None:
+                profiles.append(metadata)
+        return profiles
+
+    def get(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        """Metadata of one profile, or None if it doesn't exist"""
+        if not _PROFILE_ID.match(profile_id):
+            return None
+        try:
+            with open(self._path(profile_id, "json")) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def output_path(self, profile_id: str) -> Optional[str]:
+        """Path of a profile's output file, or None if it doesn't exist"""
+        metadata = self.get(profile_id)
+        if metadata is None:
+            return None
+        path = self._path(profile_id, PROFILE_EXTENSIONS[metadata["format"]])
+        return path if os.path.exists(path) else None
+
+    def _ids(self) -> List[str]:
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        return sorted(name[:-5] for name in names if name.endswith(".json") and _PROFILE_ID.match(name[:-5]))
+
+    def _path(self, profile_id: str, extension: str) -> str:
+        return os.path.join(self.directory, f"{profile_id}.{extension}")
+
+class StackSampler(threading.Thread):
+    """
+    Samples the Python stacks of every thread at a fixed interval into collapsed stacks
+
+    Stacks are recorded root first with the thread name as the root frame, in the
+    `frame;frame;frame count` format flamegraph.pl and speedscope read. Worker
+    threads parked waiting for work are skipped; the event loop thread is always
+    kept, so time spent awaiting I/O shows up under the selector.
+    """
+
+    def __init__(self, interval: float, loop_thread_id: int):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.interval = interval
+        self.loop_thread_id = loop_thread_id
+        self.samples: Counter = Counter()
+        self._stopped = threading.Event()
+        self._labels: Dict[Any, str] = {}
+
+    def run(self):
+        own_id = threading.get_ident()
+        while not self._stopped.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                if thread_id != self.loop_thread_id and frame.f_code.co_filename.endswith(_IDLE_FILES):
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(self._label(frame.f_code))
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)).replace(";", ":"))
+                self.samples[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+    def write(self, path: str):
+        with open(path, "w") as f:
+            for stack, count in sorted(self.samples.items()):
+                f.write(f"{stack} {count}\n")
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            filename = code.co_filename
+            for prefix in _PATH_PREFIXES:
+                if filename.startswith(prefix):
+                    filename = filename[len(prefix):]
+                    break
+            label = self._labels[code] = f"{code.co_name} ({filename}:{code.co_firstlineno})".replace(";", ":")
+        return label
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware that profiles selected requests and stores the results in a ProfileStore
+
+    A request is profiled when it carries an `X-Profile` header from an admin
+    (value "collapsed" or "pstats" picks the output, anything else the default),
+    or when it is picked by the sampling rate. Only one request is profiled at a
+    time; the profile covers everything the process does meanwhile, including
+    other requests interleaved on the event loop. Profiled responses carry an
+    `X-Profile-Id` header naming the stored profile.
+    """
+
+    def __init__(self, app, store: ProfileStore, authorize: Callable[[str], Awaitable[bool]],
+                 sample_rate: float = 0.0, default_format: str = FORMAT_COLLAPSED, interval: float = 0.001):
+        self.app = app
+        self.store = store
+        self.authorize = authorize
+        self.sample_rate = sample_rate
+        self.default_format = default_format if default_format in PROFILE_EXTENSIONS else FORMAT_COLLAPSED
+        self.interval = interval
+        self._active = False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self._active:
+            await self.app(scope, receive, send)
+            return
+        fmt = await self._requested_format(scope)
+        if fmt is None or self._active:
+            await self.app(scope, receive, send)
+            return
+
+        self._active = True
+        profile_id = self.store.new_id()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [
+                    (PROFILE_ID_HEADER.lower().encode(), profile_id.encode())
+                ]
+            await send(message)
+
+        if fmt == FORMAT_PSTATS:
+            profiler = cProfile.Profile()
+            write = profiler.dump_stats
+            profiler.enable()
+        else:
+            profiler = StackSampler(self.interval, threading.get_ident())
+            write = profiler.write
+            profiler.start()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            if fmt == FORMAT_PSTATS:
+                profiler.disable()
+            else:
+                profiler.stop()
+            self._active = False
+            metadata = {
+                "method": scope["method"],
+                "path": scope["path"],
+                "route": getattr(scope.get("route"), "path", None),
+                "status": status_code,
+                "duration_ms": round(elapsed * 1000, 3),
+                "created_at": datetime.utcnow().isoformat(),
+            }
+            try:
+                await asyncio.get_running_loop().run_in_executor(
+                    None, self.store.save, profile_id, fmt, write, metadata
+                )
+            except Exception as e:
+                logger.error(f"Failed to store profile {profile_id}: {str(e)}")
+
+    async def _requested_format(self, scope) -> Optional[str]:
+        """Output format if the request should be profiled, else None"""
+        requested = None
+        authorization = None
+        for name, value in scope["headers"]:
+            if name == PROFILE_HEADER:
+                requested = value.decode("latin-1").strip().lower()
+            elif name == b"authorization":
+                authorization = value.decode("latin-1")
+        if requested is not None and authorization and authorization.lower().startswith("bearer "):
+            if await self.authorize(authorization[7:].strip()):
+                return requested if requested in PROFILE_EXTENSIONS else self.default_format
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return self.default_format
+        return None
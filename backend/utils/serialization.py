@@ -0,0 +1,135 @@
+import json
+import math
+import zlib
+from typing import Any, AsyncIterator, Dict, Hashable, Iterable, List, Optional, Tuple
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from backend.utils.cache import TTLCache
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the standard library encoder
+    orjson = None
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+def dumps(obj: Any) -> bytes:
+    """Encode an object to compact JSON bytes, handing unknown types to FastAPI's encoder"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=jsonable_encoder, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, default=jsonable_encoder, separators=(",", ":")).encode("utf-8")
+
+def canonical_json(obj: Any) -> bytes:
+    """
+    Encode an object deterministically (sorted keys, no whitespace) for hashing
+
+    orjson writes NaN and infinities as null, so any output containing null is
+    re-encoded strictly by the json module to keep them from colliding.
+
+    Raises:
+        TypeError: If the object holds values JSON can't represent
+        ValueError: If it holds NaN or infinite floats
+    """
+    if orjson is not None:
+        try:
+            encoded = orjson.dumps(obj, option=orjson.OPT_SORT_KEYS)
+        except TypeError:
+            pass
+        else:
+            if b"null" not in encoded:
+                return encoded
+    return json.dumps(obj, sort_keys=True, separators=(",", ":"), ensure_ascii=False, allow_nan=False).encode("utf-8")
+
+def encode_array(fragments: Iterable[bytes]) -> bytes:
+    """Join already encoded JSON values into a JSON array"""
+    return b"[" + b",".join(fragments) + b"]"
+
+def encode_lines(values: Iterable[Any]) -> bytes:
+    """Encode values as NDJSON, one per line"""
+    return b"".join(dumps(value) + b"\n" for value in values)
+
+def accepts_gzip(accept_encoding: Optional[str]) -> bool:
+    """Check whether an Accept-Encoding header allows a gzip response"""
+    for coding in (accept_encoding or "").split(","):
+        name, _, params = coding.partition(";")
+        if name.strip().lower() in ("gzip", "x-gzip", "*"):
+            quality = params.strip().replace(" ", "")
+            if not quality.startswith("q="):
+                return True
+            try:
+                return float(quality[2:]) > 0
+            except ValueError:
+                return False
+    return False
+
+async def gzip_chunks(chunks: AsyncIterator[bytes], level: int = 6) -> AsyncIterator[bytes]:
+    """Gzip a stream of chunks incrementally, holding at most the compressor's window in memory"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+def ndjson_response(chunks: AsyncIterator[bytes], accept_encoding: Optional[str] = None) -> StreamingResponse:
+    """Stream NDJSON chunks, gzipped when the client accepts it"""
+    headers = {"Vary": "Accept-Encoding"}
+    if accepts_gzip(accept_encoding):
+        chunks = gzip_chunks(chunks)
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(chunks, media_type=NDJSON_MEDIA_TYPE, headers=headers)
+
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered with orjson when installed"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+class FragmentCache:
+    """
+    Encoded JSON fragments of individual rows, keyed by row id
+
+    Each fragment is stored with the version of the row it was encoded from
+    (e.g. its updated_at and counters); a lookup with a different version is a
+    miss, so updated rows are re-encoded without explicit invalidation. Writers
+    that change what a fragment contains without touching its version (such as
+    the row's capabilities) call invalidate.
+    """
+
+    def __init__(self, maxsize: int):
+        self._cache = TTLCache(maxsize=maxsize, ttl=math.inf)
+
+    def lookup(self, rows: Iterable[Any], version) -> Tuple[Dict[Hashable, bytes], List[Any]]:
+        """
+        Split rows into cached fragments and rows that need encoding
+
+        Args:
+            rows: Rows with an `id` attribute
+            version: Function returning the current version of a row
+
+        Returns:
+            Tuple of (fragments by row id, rows without a current fragment)
+        """
+        fragments = {}
+        missing = []
+        for row in rows:
+            entry = self._cache.get(row.id)
+            if entry is not None and entry[0] == version(row):
+                fragments[row.id] = entry[1]
+            else:
+                missing.append(row)
+        return fragments, missing
+
+    def store(self, row_id: Hashable, version: Any, fragment: bytes):
+        self._cache.set(row_id, (version, fragment))
+
+    def invalidate(self, *row_ids: Hashable):
+        for row_id in row_ids:
+            self._cache.invalidate(row_id)
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self._cache.stats()
+        stats.pop("ttl", None)
+        return stats
@@ -0,0 +1,133 @@
+import logging
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+class ImportTimer:
+    """
+    Meta path hook that times every module import while installed
+
+    Each module's loader is wrapped so its exec_module is timed; time spent
+    importing nested modules is subtracted to give the module's own cost.
+    Built-in and frozen modules are not timed.
+    """
+
+    def __init__(self):
+        self.inclusive: Dict[str, float] = {}
+        self.own: Dict[str, float] = {}
+        self._stack = threading.local()
+
+    def install(self):
+        if self not in sys.meta_path:
+            sys.meta_path.insert(0, self)
+
+    def uninstall(self):
+        if self in sys.meta_path:
+            sys.meta_path.remove(self)
+
+    def find_spec(self, fullname, path=None, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                break
+        else:
+            return None
+        loader = spec.loader
+        if loader is not None and not isinstance(loader, type) and hasattr(loader, "exec_module"):
+            loader.exec_module = self._timed(fullname, loader.exec_module)
+        return spec
+
+    def _timed(self, name: str, exec_module):
+        def timed_exec_module(module):
+            stack = getattr(self._stack, "frames", None)
+            if stack is None:
+                stack = self._stack.frames = []
+            frame = [0.0]  # time spent in nested imports
+            stack.append(frame)
+            started = time.perf_counter()
+            try:
+                exec_module(module)
+            finally:
+                elapsed = time.perf_counter() - started
+                stack.pop()
+                if stack:
+                    stack[-1][0] += elapsed
+                self.inclusive[name] = elapsed
+                self.own[name] = elapsed - frame[0]
+        return timed_exec_module
+
+class StartupReport:
+    """
+    Startup timeline of the API process
+
+    Phases are measured from begin(), called before backend.main imports
+    anything heavy: when imports finished, when the startup handlers finished,
+    and (if tracked) when the first request completed. With track_imports the
+    import time of every module loaded after begin() is recorded too.
+    """
+
+    def __init__(self):
+        self.started: Optional[float] = None
+        self.phases: Dict[str, float] = {}
+        self.import_timer: Optional[ImportTimer] = None
+
+    def begin(self, track_imports: bool = False):
+        self.started = time.perf_counter()
+        if track_imports:
+            self.import_timer = ImportTimer()
+            self.import_timer.install()
+
+    def mark(self, phase: str):
+        """Record the time a phase ended, once"""
+        if self.started is not None and phase not in self.phases:
+            self.phases[phase] = time.perf_counter() - self.started
+            if phase == "first_request" and self.import_timer is not None:
+                self.import_timer.uninstall()
+
+    def slowest_imports(self, limit: int = 15) -> List[Dict[str, Any]]:
+        """Modules with the highest own import time"""
+        if self.import_timer is None:
+            return []
+        timer = self.import_timer
+        names = sorted(timer.own, key=timer.own.get, reverse=True)[:limit]
+        return [
+            {"module": name, "own_ms": round(timer.own[name] * 1000, 2),
+             "inclusive_ms": round(timer.inclusive[name] * 1000, 2)}
+            for name in names
+        ]
+
+    def to_dict(self, limit: int = 15) -> Dict[str, Any]:
+        return {
+            "phases_ms": {phase: round(elapsed * 1000, 2) for phase, elapsed in self.phases.items()},
+            "modules_imported": len(self.import_timer.own) if self.import_timer is not None else None,
+            "slowest_imports": self.slowest_imports(limit),
+        }
+
+    def log(self, limit: int = 15):
+        phases = ", ".join(f"{phase} {elapsed * 1000:.1f} ms" for phase, elapsed in self.phases.items())
+        logger.info(f"Startup timeline: {phases}")
+        for item in self.slowest_imports(limit):
+            logger.info(f"  import {item['module']}: {item['own_ms']} ms own, {item['inclusive_ms']} ms inclusive")
+
+class FirstRequestMiddleware:
+    """ASGI middleware marking when the first HTTP request completes, then logging the startup report"""
+
+    def __init__(self, app, report: StartupReport):
+        self.app = app
+        self.report = report
+        self.pending = True
+
+    async def __call__(self, scope, receive, send):
+        await self.app(scope, receive, send)
+        if self.pending and scope["type"] == "http":
+            self.pending = False
+            self.report.mark("first_request")
+            self.report.log()
+
+# Shared report, started at the top of backend.main
+startup_report = StartupReport()
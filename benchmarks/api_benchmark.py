@@ -0,0 +1,324 @@
+"""
+HTTP latency and throughput benchmark for the API routers
+
+Drives the ASGI app in-process through httpx's ASGI transport against a
+temporary SQLite database seeded at each requested size (agents, listings and
+users), and times intelligence engine capabilities directly. For every
+scenario it records throughput and p50/p95/p99 latency.
+
+Usage:
+    # Record a baseline
+    python benchmarks/api_benchmark.py --sizes 1000 10000 100000 --output benchmarks/baseline.json
+
+    # Re-run and fail (exit 1) if any metric regressed more than 20%
+    python benchmarks/api_benchmark.py --sizes 1000 10000 100000 --compare benchmarks/baseline.json --threshold 0.2
+
+Each size runs in a fresh interpreter, since the database location and
+storage mode are fixed when the app is imported; extra environment settings
+(e.g. DB_STORAGE_MODE=wal) are passed through.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BENCH_USER = "benchuser"
+BENCH_PASSWORD = "benchpassword"
+SEARCH_TERMS = ["smart", "support", "analytics", "coding", "workflow", "research", "agent", "triage"]
+CAPABILITY_INPUTS = {
+    "text_processing": {"text": "The quick brown fox jumps over the lazy dog. " * 20},
+    "data_analysis": {"data": [random.Random(0).gauss(100, 15) for _ in range(10000)]},
+    "customer_service": {"query": "How do I reset my password?"},
+    "code_generation": {"language": "python", "prompt": "sort a list of dictionaries by key"},
+    "automation": {"task": "send the weekly report"},
+}
+
+# Metrics compared against a baseline, and whether a higher value is better
+COMPARED_METRICS = {"p50_ms": False, "p95_ms": False, "p99_ms": False, "rps": True}
+# Latency changes smaller than this are timer noise, whatever their relative size
+MIN_LATENCY_DELTA_MS = 0.05
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of already sorted values"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(q / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> Dict[str, Any]:
+    latencies = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+    }
+
+async def measure(call: Callable[[int], Awaitable[bool]], requests: int, concurrency: int) -> Dict[str, Any]:
+    """Run call(i) for i in range(requests) with bounded concurrency; call returns False on error"""
+    latencies: List[float] = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def timed(i: int):
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                ok = await call(i)
+            except Exception:
+                ok = False
+            latencies.append(time.perf_counter() - started)
+            if not ok:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(timed(i) for i in range(requests)))
+    return summarize(latencies, errors, time.perf_counter() - started)
+
+async def seed(size: int):
+    """Seed agents, listings and users through the bulk service paths"""
+    from sqlalchemy import insert
+    from backend.api.agents import AgentCreate
+    from backend.db.models import User, get_pwd_context
+    from backend.db.writer import db_writer
+    from backend.services.agent_service import AgentService
+    from backend.services.marketplace_service import marketplace_service
+
+    sys.path.insert(0, ROOT)
+    from populate_marketplace import generate_listings
+
+    rng = random.Random(size)
+    capabilities = list(CAPABILITY_INPUTS)
+    agent_service = AgentService()
+    for start in range(0, size, 10000):
+        await agent_service.bulk_create_agents([
+            AgentCreate(name=f"agent-{i}", description="benchmark agent",
+                        capabilities=rng.sample(capabilities, rng.randint(1, len(capabilities))))
+            for i in range(start, min(size, start + 10000))
+        ])
+
+    async def listing_rows():
+        for listing in generate_listings(size, seed=size):
+            yield listing
+    await marketplace_service.bulk_create_listings(listing_rows(), limit=size)
+
+    # One real account plus size filler rows sharing a hash, so seeding skips bcrypt
+    pwd_context = get_pwd_context()
+    filler_hash = pwd_context.hash("unused")
+    users = [{"username": BENCH_USER, "email": "bench@example.com", "hashed_password": pwd_context.hash(BENCH_PASSWORD),
+              "is_active": True, "is_admin": True}]
+    users += [{"username": f"user{i}", "email": f"user{i}@example.com", "hashed_password": filler_hash,
+               "is_active": True, "is_admin": False} for i in range(size)]
+
+    async def insert_users(db):
+        connection = await db.connection()
+        await connection.execute(insert(User.__table__), users)
+    await db_writer.run(insert_users)
+
+def build_scenarios(client, size: int, token: str) -> List[Tuple[str, Callable[[int], Awaitable[bool]], float]]:
+    """Scenarios as (name, call, share of --requests to run)"""
+    rng = random.Random(1)
+    auth = {"Authorization": f"Bearer {token}"}
+
+    def ok(response, expected=200) -> bool:
+        return response.status_code == expected
+
+    async def login(i):
+        return ok(await client.post("/api/auth/login", data={"username": BENCH_USER, "password": BENCH_PASSWORD}))
+
+    async def me(i):
+        return ok(await client.get("/api/auth/me", headers=auth))
+
+    async def list_agents(i):
+        return ok(await client.get("/api/agents/", params={"limit": 100}))
+
+    async def list_agents_by_capability(i):
+        return ok(await client.get("/api/agents/", params={"limit": 100, "capability": "data_analysis", "sort": "-name"}))
+
+    async def get_agent(i):
+        return ok(await client.get(f"/api/agents/{rng.randint(1, size)}"))
+
+    async def create_agent(i):
+        return ok(await client.post("/api/agents/", json={"name": f"new-agent-{i}", "capabilities": ["automation"]}), 201)
+
+    async def task_batch(i):
+        tasks = [{"type": "text_processing", "data": {"text": f"benchmark task {n}"}} for n in range(10)]
+        return ok(await client.post(f"/api/agents/{rng.randint(1, size)}/tasks/batch", json={"tasks": tasks}))
+
+    async def list_listings_cached(i):
+        return ok(await client.get("/api/marketplace/listings", params={"limit": 100}))
+
+    async def list_listings_uncached(i):
+        params = {"limit": 100, "sort": "-rating", "min_price": round(rng.uniform(0, 150), 2)}
+        return ok(await client.get("/api/marketplace/listings", params=params))
+
+    async def get_listing(i):
+        return ok(await client.get(f"/api/marketplace/listings/{rng.randint(1, size)}"))
+
+    async def search(i):
+        return ok(await client.get("/api/marketplace/search", params={"q": rng.choice(SEARCH_TERMS)}))
+
+    async def install(i):
+        return ok(await client.post(f"/api/marketplace/listings/{rng.randint(1, size)}/install"))
+
+    return [
+        ("auth.login", login, 0.05),
+        ("auth.me", me, 1.0),
+        ("agents.list", list_agents, 1.0),
+        ("agents.list_by_capability", list_agents_by_capability, 1.0),
+        ("agents.get", get_agent, 1.0),
+        ("agents.create", create_agent, 1.0),
+        ("agents.task_batch", task_batch, 1.0),
+        ("marketplace.list_cached", list_listings_cached, 1.0),
+        ("marketplace.list_uncached", list_listings_uncached, 1.0),
+        ("marketplace.get", get_listing, 1.0),
+        ("marketplace.search", search, 1.0),
+        ("marketplace.install", install, 1.0),
+    ]
+
+async def measure_capabilities(requests: int) -> Dict[str, Dict[str, Any]]:
+    """Time intelligence engine capabilities directly, one call at a time"""
+    from backend.core.intelligence import intelligence_engine
+
+    results = {}
+    for name, input_data in CAPABILITY_INPUTS.items():
+        if name not in intelligence_engine.capabilities:
+            continue
+        intelligence_engine.execute_capability(name, input_data)  # warm up / lazy import
+        latencies, errors = [], 0
+        started = time.perf_counter()
+        for _ in range(requests):
+            call_started = time.perf_counter()
+            if "error" in intelligence_engine.execute_capability(name, input_data):
+                errors += 1
+            latencies.append(time.perf_counter() - call_started)
+        results[f"capability.{name}"] = summarize(latencies, errors, time.perf_counter() - started)
+    return results
+
+async def run_size(size: int, requests: int, concurrency: int) -> Dict[str, Dict[str, Any]]:
+    import httpx
+    from backend.main import app
+
+    await app.router.startup()
+    try:
+        await seed(size)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            response = await client.post("/api/auth/login", data={"username": BENCH_USER, "password": BENCH_PASSWORD})
+            response.raise_for_status()
+            token = response.json()["access_token"]
+
+            results = {}
+            for name, call, share in build_scenarios(client, size, token):
+                count = max(10, int(requests * share))
+                await call(-1)  # warm up
+                results[name] = await measure(call, count, concurrency)
+        results.update(await measure_capabilities(requests))
+        return results
+    finally:
+        await app.router.shutdown()
+
+def spawn(size: int, requests: int, concurrency: int) -> Dict[str, Dict[str, Any]]:
+    """Benchmark one dataset size in a fresh interpreter with its own temporary database"""
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, DB_PATH=os.path.join(tmp, "benchmark.db"), PYTHONPATH=ROOT)
+        completed = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--run-size", str(size),
+             "--requests", str(requests), "--concurrency", str(concurrency)],
+            env=env, capture_output=True, text=True
+        )
+    if completed.returncode != 0:
+        sys.stderr.write(completed.stderr)
+        raise SystemExit(f"Benchmark for size {size} failed")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """List metrics that regressed by more than threshold (a fraction) against the baseline"""
+    regressions = []
+    for size, scenarios in current["results"].items():
+        for name, metrics in scenarios.items():
+            base = baseline.get("results", {}).get(size, {}).get(name)
+            if not base:
+                continue
+            for metric, higher_is_better in COMPARED_METRICS.items():
+                old, new = base.get(metric), metrics.get(metric)
+                if not old or new is None:
+                    continue
+                if metric.endswith("_ms") and abs(new - old) < MIN_LATENCY_DELTA_MS:
+                    continue
+                change = (new - old) / old
+                if (-change if higher_is_better else change) > threshold:
+                    regressions.append(f"size={size} {name} {metric}: {old} -> {new} ({change:+.1%})")
+    return regressions
+
+def print_report(report: Dict[str, Any]):
+    for size, scenarios in report["results"].items():
+        print(f"\nsize={size}")
+        print(f"  {'scenario':<30} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+        for name, m in scenarios.items():
+            print(f"  {name:<30} {m['rps']:>9} {m['p50_ms']:>9} {m['p95_ms']:>9} {m['p99_ms']:>9} {m['errors']:>7}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000], help="Seeded row counts")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=8, help="Requests in flight per scenario")
+    parser.add_argument("--output", help="Write results to this JSON file")
+    parser.add_argument("--compare", metavar="BASELINE", help="Compare against a baseline JSON file")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed regression as a fraction (default 0.2)")
+    parser.add_argument("--run-size", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_size is not None:
+        import logging
+        logging.disable(logging.WARNING)
+        print(json.dumps(asyncio.run(run_size(args.run_size, args.requests, args.concurrency))))
+        return
+
+    report = {
+        "meta": {
+            "created_at": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "storage_mode": os.getenv("DB_STORAGE_MODE", "rollback"),
+        },
+        "results": {},
+    }
+    for size in args.sizes:
+        print(f"Benchmarking with {size} seeded rows...", file=sys.stderr)
+        report["results"][str(size)] = spawn(size, args.requests, args.concurrency)
+    print_report(report)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} metrics regressed by more than {args.threshold:.0%}:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"\nNo regressions beyond {args.threshold:.0%} against {args.compare}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Cold start benchmark for the API process
+
+Boots the app in fresh interpreters against a temporary database and reports
+the startup timeline recorded by backend.utils.startup: time to finish
+imports, to finish the startup handlers, and to serve the first request. The
+first boot builds the schema and is reported separately; later boots find
+the schema current and skip DDL. The slowest imports of the last run are
+listed to show where import time goes.
+
+Usage:
+    python benchmarks/startup_time.py [--runs 5] [--output startup.json]
+    python benchmarks/startup_time.py --compare startup.json --threshold 0.2
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+async def _boot() -> dict:
+    started = time.perf_counter()
+    sys.path.insert(0, ROOT)
+    import httpx
+    from backend.main import app
+    from backend.utils.startup import startup_report
+
+    await app.router.startup()
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://benchmark") as client:
+            (await client.get("/health")).raise_for_status()
+    finally:
+        await app.router.shutdown()
+    report = startup_report.to_dict()
+    report["wall_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    return report
+
+def _spawn(db_path: str) -> dict:
+    """Boot the app in a fresh interpreter and return its startup report"""
+    env = dict(os.environ, DB_PATH=db_path, STARTUP_REPORT="true")
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--boot"],
+        env=env, check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Warm boots to take the median of")
+    parser.add_argument("--output", help="Write results to this JSON file")
+    parser.add_argument("--compare", metavar="BASELINE", help="Compare against a baseline JSON file")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed regression as a fraction (default 0.2)")
+    parser.add_argument("--boot", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.boot:
+        import logging
+        logging.disable(logging.INFO)
+        print(json.dumps(asyncio.run(_boot())))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "startup.db")
+        first = _spawn(db_path)
+        runs = [_spawn(db_path) for _ in range(args.runs)]
+
+    phases = list(runs[0]["phases_ms"]) + ["wall_ms"]
+    result = {
+        "first_boot": dict(first["phases_ms"], wall_ms=first["wall_ms"]),
+        "median": {
+            phase: round(statistics.median(
+                run["wall_ms"] if phase == "wall_ms" else run["phases_ms"][phase] for run in runs
+            ), 2)
+            for phase in phases
+        },
+        "modules_imported": runs[-1]["modules_imported"],
+        "slowest_imports": runs[-1]["slowest_imports"],
+    }
+
+    print(f"{'phase':<15} {'first boot ms':>14} {'median ms':>10}")
+    for phase in phases:
+        print(f"{phase:<15} {result['first_boot'].get(phase, 0):>14} {result['median'][phase]:>10}")
+    print(f"\n{result['modules_imported']} modules imported; slowest (own time):")
+    for item in result["slowest_imports"]:
+        print(f"  {item['module']:<45} {item['own_ms']:>8} ms")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = []
+        for phase, value in result["median"].items():
+            old = baseline.get("median", {}).get(phase)
+            if old and (value - old) / old > args.threshold:
+                regressions.append(f"{phase}: {old} -> {value} ms ({(value - old) / old:+.1%})")
+        if regressions:
+            print(f"\nStartup regressed by more than {args.threshold:.0%}:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"\nNo regressions beyond {args.threshold:.0%} against {args.compare}")
+
+if __name__ == "__main__":
+    main()
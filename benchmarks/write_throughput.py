@@ -0,0 +1,107 @@
+"""
+Write throughput benchmark for the SQLite storage modes
+
+Runs the same burst of concurrent agent inserts against a fresh database in
+each scenario and reports writes/sec:
+
+    baseline  rollback journal, every request commits on its own connection
+              (the write path before the group commit writer)
+    rollback  rollback journal, writes merged into group commits
+    wal       WAL + tuned pragmas, writes merged into group commits
+
+Usage:
+    python benchmarks/write_throughput.py [--writes 2000] [--concurrency 64]
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCENARIOS = {
+    "baseline": "rollback",
+    "rollback": "rollback",
+    "wal": "wal",
+}
+
+async def _run_scenario(scenario: str, writes: int, concurrency: int) -> dict:
+    sys.path.insert(0, ROOT)
+    from backend.db.models import Agent, AsyncSessionLocal, create_tables
+    from backend.db.writer import db_writer
+    from backend.services.agent_service import AgentService
+    from backend.api.agents import AgentCreate
+
+    create_tables()
+    agent_service = AgentService()
+    errors = 0
+
+    async def write(i: int):
+        if scenario == "baseline":
+            async with AsyncSessionLocal() as db:
+                db.add(Agent(name=f"agent-{i}", description="benchmark", capabilities=["text_processing"]))
+                await db.commit()
+        else:
+            await agent_service.create_agent(
+                AgentCreate(name=f"agent-{i}", description="benchmark", capabilities=["text_processing"])
+            )
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def bounded(i: int):
+        nonlocal errors
+        async with semaphore:
+            try:
+                await write(i)
+            except Exception:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(bounded(i) for i in range(writes)))
+    elapsed = time.perf_counter() - started
+    await db_writer.stop()
+
+    return {
+        "scenario": scenario,
+        "writes": writes,
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "writes_per_sec": round((writes - errors) / elapsed, 1),
+        "average_batch": round(db_writer.get_stats()["average_batch"], 1),
+    }
+
+def _spawn(scenario: str, writes: int, concurrency: int) -> dict:
+    """Run one scenario in a fresh interpreter, since the storage mode is fixed at import"""
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, DB_PATH=os.path.join(tmp, "bench.db"), DB_STORAGE_MODE=SCENARIOS[scenario])
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--scenario", scenario,
+             "--writes", str(writes), "--concurrency", str(concurrency)],
+            env=env, check=True, capture_output=True, text=True
+        ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--writes", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), help="Run a single scenario in this process")
+    args = parser.parse_args()
+
+    if args.scenario:
+        import logging
+        logging.disable(logging.INFO)
+        print(json.dumps(asyncio.run(_run_scenario(args.scenario, args.writes, args.concurrency))))
+        return
+
+    print(f"{'scenario':<10} {'writes/sec':>10} {'errors':>7} {'seconds':>8} {'avg batch':>9}")
+    for scenario in SCENARIOS:
+        result = _spawn(scenario, args.writes, args.concurrency)
+        print(f"{scenario:<10} {result['writes_per_sec']:>10} {result['errors']:>7} "
+              f"{result['seconds']:>8} {result['average_batch']:>9}")
+
+if __name__ == "__main__":
+    main()
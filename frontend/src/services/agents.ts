@@ -1,4 +1,4 @@
-import api from './api';
+import api, { getAllPages } from './api';
 
 export interface Agent {
   id: number;
@@ -17,8 +17,7 @@ export interface CreateAgentDto {
 
 class AgentService {
   async getAgents(): Promise<Agent[]> {
-    const response = await api.get('/agents');
-    return response.data;
+    return getAllPages<Agent>('/agents');
   }
 
   async getAgent(id: number): Promise<Agent> {
@@ -87,4 +87,19 @@ export const isAuthenticated = () => {
   return !!getAccessToken();
 };
 
+// Largest page the list endpoints serve
+const PAGE_SIZE_MAX = 1000;
+
+// Fetch every item of a keyset-paginated list endpoint by following X-Next-Cursor
+export const getAllPages = async <T>(url: string, params: Record<string, unknown> = {}): Promise<T[]> => {
+  const items: T[] = [];
+  let after: string | undefined;
+  do {
+    const response = await api.get<T[]>(url, { params: { ...params, limit: PAGE_SIZE_MAX, after } });
+    items.push(...response.data);
+    after = response.headers['x-next-cursor'] || undefined;
+  } while (after);
+  return items;
+};
+
 export default api;
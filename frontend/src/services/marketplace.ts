@@ -1,10 +1,9 @@
-import api from './api';
+import api, { getAllPages } from './api';
 import { MarketplaceListing, CreateMarketplaceListingDto } from '../types/Marketplace';
 
 class MarketplaceService {
   async getListings(): Promise<MarketplaceListing[]> {
-    const response = await api.get('/marketplace/listings');
-    return response.data;
+    return getAllPages<MarketplaceListing>('/marketplace/listings');
   }
 
   async getListing(id: number): Promise<MarketplaceListing> {
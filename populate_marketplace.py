@@ -1,5 +1,8 @@
-import requests
+import argparse
 import json
+import random
+
+import requests
 
 BASE_URL = "http://localhost:8000/api"
 MARKETPLACE_URL = f"{BASE_URL}/marketplace/listings"
@@ -43,6 +46,27 @@ sample_listings = [
     }
 ]
 
+BULK_URL = f"{MARKETPLACE_URL}/bulk"
+
+CAPABILITIES = ["customer_service", "data_analysis", "code_generation", "automation", "text_processing"]
+NAME_ADJECTIVES = ["Smart", "Rapid", "Insightful", "Reliable", "Adaptive", "Precise", "Friendly", "Tireless"]
+NAME_ROLES = ["Support", "Analytics", "Coding", "Workflow", "Research", "Reporting", "Onboarding", "Triage"]
+AUTHORS = ["Enterprise Solutions Inc.", "DataSmart Technologies", "CodeCraft AI", "Automate Everything Ltd.", "AI Staff Solutions"]
+
+def generate_listings(count, seed=0):
+    """Generate synthetic listings lazily, so catalogs of any size stay out of memory"""
+    rng = random.Random(seed)
+    for i in range(count):
+        adjective = rng.choice(NAME_ADJECTIVES)
+        role = rng.choice(NAME_ROLES)
+        yield {
+            "name": f"{adjective} {role} Agent {i + 1}",
+            "description": f"{adjective} AI agent for {role.lower()} tasks, generated for catalog testing.",
+            "price": round(rng.uniform(0, 200), 2),
+            "author": rng.choice(AUTHORS),
+            "capabilities": rng.sample(CAPABILITIES, rng.randint(1, len(CAPABILITIES)))
+        }
+
 def create_listing(listing_data):
     try:
         response = requests.post(MARKETPLACE_URL, json=listing_data)
@@ -53,11 +77,54 @@ def create_listing(listing_data):
         print(f"Error creating listing {listing_data['name']}: {e}")
         return None
 
+def bulk_create_listings(listings, batch_size=50000):
+    """Stream listings to the bulk import endpoint as NDJSON, one request per batch"""
+    created = failed = 0
+    batch = []
+    
+    def send(rows):
+        body = (json.dumps(row).encode("utf-8") + b"\n" for row in rows)
+        response = requests.post(BULK_URL, data=body, headers={"Content-Type": "application/x-ndjson"})
+        response.raise_for_status()
+        result = response.json()
+        for item in result["results"]:
+            if item["status"] == "error":
+                print(f"Error importing row {item['index']}: {item['error']}")
+        return result["created"], result["failed"]
+    
+    try:
+        for listing in listings:
+            batch.append(listing)
+            if len(batch) >= batch_size:
+                batch_created, batch_failed = send(batch)
+                created, failed = created + batch_created, failed + batch_failed
+                print(f"Imported {created} listings...")
+                batch = []
+        if batch:
+            batch_created, batch_failed = send(batch)
+            created, failed = created + batch_created, failed + batch_failed
+    except requests.exceptions.RequestException as e:
+        print(f"Error during bulk import: {e}")
+    
+    print(f"Created {created} listings ({failed} failed)")
+
 def main():
-    print("Populating marketplace with sample listings...")
+    parser = argparse.ArgumentParser(description="Populate the marketplace with listings")
+    parser.add_argument("--bulk", action="store_true", help="Use the bulk import endpoint")
+    parser.add_argument("--synthetic", type=int, metavar="N", help="Generate N synthetic listings (implies --bulk)")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed for synthetic listings")
+    args = parser.parse_args()
     
-    for listing in sample_listings:
-        create_listing(listing)
+    if args.synthetic is not None:
+        print(f"Populating marketplace with {args.synthetic} synthetic listings...")
+        bulk_create_listings(generate_listings(args.synthetic, args.seed))
+    elif args.bulk:
+        print("Populating marketplace with sample listings...")
+        bulk_create_listings(sample_listings)
+    else:
+        print("Populating marketplace with sample listings...")
+        for listing in sample_listings:
+            create_listing(listing)
     
     print("Done populating marketplace!")
 
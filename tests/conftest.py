@@ -0,0 +1,11 @@
+import os
+import tempfile
+
+# Point the app at a throwaway database before any backend module reads the config
+_db_dir = tempfile.mkdtemp(prefix="aistaff-tests-")
+os.environ.setdefault("DB_PATH", os.path.join(_db_dir, "aistaff.db"))
+# Cheapest bcrypt cost so registering and logging in don't dominate the run
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+# Mount the admin profile routes; profiles are only taken when an admin asks for one
+os.environ.setdefault("PROFILING_ENABLED", "true")
+os.environ.setdefault("PROFILING_DIR", os.path.join(_db_dir, "profiles"))
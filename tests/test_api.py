@@ -0,0 +1,733 @@
+import asyncio
+import gzip
+import json
+import uuid
+
+import httpx
+import pytest
+from sqlalchemy import select
+
+from backend.db.models import AsyncSessionLocal, MarketplaceListing, User
+from backend.db.writer import db_writer
+from backend.main import app
+from backend.services.marketplace_service import marketplace_service
+
+def _run(scenario):
+    """Run a scenario against the app inside its startup/shutdown lifecycle"""
+    async def main():
+        await app.router.startup()
+        try:
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+                return await scenario(client)
+        finally:
+            await app.router.shutdown()
+    return asyncio.run(main())
+
+async def _create_agent(client, name="agent", capabilities=("data_analysis",)):
+    response = await client.post("/api/agents/", json={"name": name, "capabilities": list(capabilities)})
+    assert response.status_code == 201, response.text
+    return response.json()
+
+async def _register_and_login(client, prefix="user"):
+    """Register a new user and return (user id, auth headers)"""
+    username = f"{prefix}{uuid.uuid4().hex[:12]}"
+    registered = await client.post("/api/auth/register", json={
+        "username": username, "email": f"{username}@example.com", "password": "secret-pass"
+    })
+    assert registered.status_code == 201, registered.text
+    login = await client.post("/api/auth/login", data={"username": username, "password": "secret-pass"})
+    assert login.status_code == 200, login.text
+    return registered.json()["id"], {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+async def _update_user(user_id, **fields):
+    """Change a user through the ORM in the database writer"""
+    async def update(db):
+        user = await db.get(User, user_id)
+        for key, value in fields.items():
+            setattr(user, key, value)
+
+    await db_writer.run(update)
+
+def _listing(author, index, **fields):
+    return {"name": f"Listing {index}", "description": "", "price": float(index), "author": author,
+            "capabilities": ["text_processing"], **fields}
+
+async def _create_listings(client, author, count):
+    for index in range(count):
+        response = await client.post("/api/marketplace/listings", json=_listing(author, index))
+        assert response.status_code == 201, response.text
+
+async def _get_all_pages(client, url, params):
+    """Follow X-Next-Cursor to the last page; returns (items, number of pages)"""
+    items, after, pages = [], None, 0
+    while True:
+        response = await client.get(url, params=dict(params, after=after) if after else params)
+        assert response.status_code == 200, response.text
+        items += response.json()
+        pages += 1
+        after = response.headers.get("x-next-cursor")
+        if not after:
+            return items, pages
+
+# Batched tasks
+
+def test_batch_runs_tasks_and_reports_per_item_results():
+    async def scenario(client):
+        agent = await _create_agent(client, "batcher", ["data_analysis", "text_processing"])
+        tasks = [
+            {"type": "data_analysis", "data": {"data": [1, 2, 3]}},
+            {"type": "text_processing", "data": {"text": "hello world"}},
+            {"type": "code_generation", "data": {}},
+        ]
+        return await client.post(f"/api/agents/{agent['id']}/tasks/batch", json={"tasks": tasks})
+
+    response = _run(scenario)
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["total"], body["succeeded"], body["failed"]) == (3, 2, 1)
+    assert body["results"][0]["result"]["average"] == 2
+    assert body["results"][2]["error"] == "No matching capability for task type 'code_generation'"
+
+def test_batch_over_queue_limit_returns_429(monkeypatch):
+    from backend.core.agent_manager import task_manager
+
+    async def scenario(client):
+        agent = await _create_agent(client, "queued batcher")
+        tasks = [{"type": "data_analysis", "data": {"data": [1, 2, 3]}}] * 3
+        monkeypatch.setattr("backend.core.agent_manager.TASK_BATCH_CHUNK_SIZE", 1)
+        monkeypatch.setattr(task_manager, "max_pending", 2)
+        rejected = await client.post(f"/api/agents/{agent['id']}/tasks/batch", json={"tasks": tasks})
+        accepted = await client.post(f"/api/agents/{agent['id']}/tasks/batch", json={"tasks": tasks[:2]})
+        return rejected.status_code, accepted.status_code, accepted.json()["succeeded"]
+
+    assert _run(scenario) == (429, 200, 2)
+
+# Streaming analysis
+
+def _stream_analysis(body, chunk_size=7, **params):
+    async def scenario(client):
+        agent = await _create_agent(client, "streamer")
+
+        async def chunks():
+            for start in range(0, len(body), chunk_size):
+                yield body[start:start + chunk_size]
+
+        return await client.post(f"/api/agents/{agent['id']}/analysis/stream", params=params, content=chunks())
+    return _run(scenario)
+
+def test_stream_analysis_reads_csv_column(monkeypatch):
+    monkeypatch.setattr("backend.api.agents.ANALYSIS_STREAM_BATCH_BYTES", 16)
+    body = b'note,2024\n"multi\nline, note",1\nplain,2\n"x",3\n,\n'
+    response = _stream_analysis(body, format="csv", column="2024")
+    assert response.status_code == 200, response.text
+    result = response.json()
+    assert (result["count"], result["numeric_count"], result["sum"]) == (4, 3, 6)
+    assert result["type_counts"] == {"null": 1, "number": 3}
+
+def test_stream_analysis_reads_ndjson_field():
+    body = b"".join(b'{"v": %d}\n' % value for value in range(1, 101))
+    response = _stream_analysis(body, format="ndjson", field="v", percentiles=[50])
+    assert response.status_code == 200, response.text
+    result = response.json()
+    assert (result["count"], result["average"], result["max"]) == (100, 50.5, 100)
+    assert result["percentiles"]["p50"] == 50.5
+
+@pytest.mark.parametrize("body, params, message", [
+    (b"a,b\n1,2\n", {"format": "csv", "column": "c"}, "not found in CSV header"),
+    (b'value\n"never closed\n', {"format": "csv"}, "not closed"),
+    (b'{"v": 1}\n{bad\n', {"format": "ndjson", "field": "v"}, "Invalid ndjson input"),
+])
+def test_stream_analysis_rejects_bad_input(body, params, message):
+    response = _stream_analysis(body, **params)
+    assert response.status_code == 400
+    assert message in response.json()["detail"]
+
+def test_stream_analysis_requires_data_analysis_capability():
+    async def scenario(client):
+        agent = await _create_agent(client, "writer", ["text_processing"])
+        return await client.post(f"/api/agents/{agent['id']}/analysis/stream?format=csv", content=b"1\n")
+
+    assert _run(scenario).status_code == 400
+
+# Keyset pagination
+
+def test_listings_follow_next_cursor_across_pages():
+    author = uuid.uuid4().hex
+
+    async def scenario(client):
+        await _create_listings(client, author, 5)
+        return await _get_all_pages(client, "/api/marketplace/listings",
+                                    {"author": author, "sort": "-price", "limit": 2})
+
+    listings, pages = _run(scenario)
+    assert [listing["name"] for listing in listings] == [f"Listing {index}" for index in range(4, -1, -1)]
+    assert pages == 3
+
+def test_agents_page_by_name_with_capability_filter():
+    prefix = uuid.uuid4().hex[:8]
+
+    async def scenario(client):
+        for index in range(5):
+            capabilities = ["data_analysis", "automation"] if index % 2 else ["automation"]
+            await _create_agent(client, f"{prefix}-{index}", capabilities)
+        agents, pages = await _get_all_pages(client, "/api/agents/", {
+            "sort": "-name", "limit": 1, "capability": ["data_analysis", "automation"], "capability_match": "all"
+        })
+        return [agent["name"] for agent in agents if agent["name"].startswith(prefix)]
+
+    assert _run(scenario) == [f"{prefix}-3", f"{prefix}-1"]
+
+def test_listings_reject_cursor_from_another_sort():
+    author = uuid.uuid4().hex
+
+    async def scenario(client):
+        await _create_listings(client, author, 3)
+        first = await client.get("/api/marketplace/listings", params={"author": author, "sort": "price", "limit": 1})
+        cursor = first.headers["x-next-cursor"]
+        mismatched = await client.get("/api/marketplace/listings",
+                                      params={"author": author, "sort": "name", "after": cursor})
+        malformed = await client.get("/api/marketplace/listings", params={"after": "garbage"})
+        unknown_sort = await client.get("/api/marketplace/listings", params={"sort": "secret"})
+        return mismatched.status_code, malformed.status_code, unknown_sort.status_code
+
+    assert _run(scenario) == (400, 400, 400)
+
+# Listing search
+
+def _search_word():
+    return "zq" + uuid.uuid4().hex[:10]
+
+async def _search(client, q):
+    response = await client.get("/api/marketplace/search", params={"q": q})
+    assert response.status_code == 200, response.text
+    return [listing["name"] for listing in response.json()]
+
+def test_search_ranks_name_matches_first_and_matches_prefixes():
+    word = _search_word()
+
+    async def scenario(client):
+        await client.post("/api/marketplace/listings", json=_listing("a", 0, name="Plain tool", description=f"{word} inside"))
+        await client.post("/api/marketplace/listings", json=_listing("b", 1, name=f"{word} analytics"))
+        return await _search(client, word), await _search(client, word[:6]), await _search(client, f"{word} analytics")
+
+    ranked, by_prefix, both_terms = _run(scenario)
+    assert ranked == [f"{word} analytics", "Plain tool"]
+    assert set(by_prefix) >= {f"{word} analytics", "Plain tool"}
+    assert both_terms == [f"{word} analytics"]
+
+def test_search_treats_fts_syntax_as_text():
+    word = _search_word()
+
+    async def scenario(client):
+        await client.post("/api/marketplace/listings", json=_listing("c", 0, name=f"{word} helper"))
+        return [await client.get("/api/marketplace/search", params={"q": q})
+                for q in (f'"{word}', f"{word} OR", f"NEAR({word}", "*", '"')]
+
+    responses = _run(scenario)
+    assert [response.status_code for response in responses] == [200] * 5
+    assert [len(response.json()) for response in responses[:3]] == [1, 0, 0]
+    assert responses[3].json() == [] and responses[4].json() == []
+
+def test_search_index_follows_updates_and_deletes():
+    word, renamed = _search_word(), _search_word()
+
+    async def scenario(client):
+        listing = (await client.post("/api/marketplace/listings", json=_listing("d", 0, name=f"{word} bot"))).json()
+        found = await _search(client, word)
+        await client.put(f"/api/marketplace/listings/{listing['id']}", json={"name": f"{renamed} bot"})
+        after_rename = await _search(client, word), await _search(client, renamed)
+        await client.delete(f"/api/marketplace/listings/{listing['id']}")
+        return found, after_rename, await _search(client, renamed)
+
+    found, (old_name, new_name), after_delete = _run(scenario)
+    assert found == [f"{word} bot"]
+    assert (old_name, new_name) == ([], [f"{renamed} bot"])
+    assert after_delete == []
+
+def test_search_falls_back_to_like_without_fts(monkeypatch):
+    from backend.db import search
+    word = _search_word()
+
+    async def scenario(client):
+        await client.post("/api/marketplace/listings", json=_listing("e", 0, description=f"has {word} here"))
+        monkeypatch.setattr(search, "fts_enabled", False)
+        return await _search(client, word[2:8])
+
+    assert _run(scenario) == ["Listing 0"]
+
+# Capability storage
+
+def test_listing_capabilities_keep_order_and_drop_duplicates():
+    author = uuid.uuid4().hex
+
+    async def scenario(client):
+        created = (await client.post("/api/marketplace/listings", json=_listing(
+            author, 0, capabilities=["text_processing", "automation", "text_processing"]
+        ))).json()
+        updated = (await client.put(f"/api/marketplace/listings/{created['id']}",
+                                    json={"capabilities": ["data_analysis", "automation"]})).json()
+        filtered = (await client.get("/api/marketplace/listings",
+                                     params={"author": author, "capability": "data_analysis"})).json()
+        return created, updated, filtered
+
+    created, updated, filtered = _run(scenario)
+    assert created["capabilities"] == ["text_processing", "automation"]
+    assert updated["capabilities"] == ["data_analysis", "automation"]
+    assert [listing["capabilities"] for listing in filtered] == [["data_analysis", "automation"]]
+
+# Response cache
+
+def test_listing_etag_revalidates_until_the_listing_changes():
+    author = uuid.uuid4().hex
+
+    async def scenario(client):
+        listing = (await client.post("/api/marketplace/listings", json=_listing(author, 0))).json()
+        url = f"/api/marketplace/listings/{listing['id']}"
+        first = await client.get(url)
+        revalidated = await client.get(url, headers={"If-None-Match": first.headers["etag"]})
+        await client.put(url, json={"price": 99})
+        changed = await client.get(url, headers={"If-None-Match": first.headers["etag"]})
+        return first, revalidated, changed
+
+    first, revalidated, changed = _run(scenario)
+    assert first.status_code == 200 and first.headers["cache-control"] == "no-cache"
+    assert revalidated.status_code == 304 and revalidated.content == b""
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != first.headers["etag"]
+    assert changed.json()["price"] == 99
+
+def test_listing_pages_are_invalidated_by_writes():
+    author = uuid.uuid4().hex
+
+    async def scenario(client):
+        await _create_listings(client, author, 1)
+        before = (await client.get("/api/marketplace/listings", params={"author": author})).json()
+        await client.post("/api/marketplace/listings", json=_listing(author, 1))
+        after = (await client.get("/api/marketplace/listings", params={"author": author})).json()
+        return len(before), len(after)
+
+    assert _run(scenario) == (1, 2)
+
+# Principal cache
+
+def _principal_stats():
+    from backend.services.auth_service import get_principal_cache_stats
+    return get_principal_cache_stats()
+
+def test_repeat_requests_reuse_the_cached_principal():
+    async def scenario(client):
+        _, headers = await _register_and_login(client)
+        await client.get("/api/auth/me", headers=headers)
+        hits = _principal_stats()["hits"]
+        me = await client.get("/api/auth/me", headers=headers)
+        return me.status_code, _principal_stats()["hits"] - hits
+
+    assert _run(scenario) == (200, 1)
+
+def test_orm_update_drops_the_cached_principal():
+    async def scenario(client):
+        user_id, headers = await _register_and_login(client)
+        await client.get("/api/auth/me", headers=headers)
+        await _update_user(user_id, full_name="Renamed")
+        renamed = (await client.get("/api/auth/me", headers=headers)).json()["full_name"]
+        await _update_user(user_id, is_active=False)
+        deactivated = await client.get("/api/auth/me", headers=headers)
+        return renamed, deactivated.status_code
+
+    assert _run(scenario) == ("Renamed", 403)
+
+def test_orm_delete_drops_the_cached_principal():
+    async def scenario(client):
+        user_id, headers = await _register_and_login(client)
+        await client.get("/api/auth/me", headers=headers)
+
+        async def delete(db):
+            await db.delete(await db.get(User, user_id))
+
+        await db_writer.run(delete)
+        return (await client.get("/api/auth/me", headers=headers)).status_code
+
+    assert _run(scenario) == 401
+
+def test_principal_cached_before_commit_is_dropped_after_commit():
+    from backend.services.auth_service import get_current_user
+
+    async def scenario(client):
+        user_id, headers = await _register_and_login(client)
+        token = headers["Authorization"][7:]
+
+        async def update(db):
+            user = await db.get(User, user_id)
+            user.full_name = "Committed"
+            await db.flush()
+            # A concurrent request re-caches the pre-commit row between flush and commit
+            async with AsyncSessionLocal() as read_db:
+                stale = await get_current_user(token, read_db)
+            return stale.full_name
+
+        seen_before_commit = await db_writer.run(update)
+        me = (await client.get("/api/auth/me", headers=headers)).json()
+        async with AsyncSessionLocal() as db:
+            stored = await db.scalar(select(User.full_name).where(User.id == user_id))
+        return seen_before_commit, me["full_name"], stored
+
+    assert _run(scenario) == (None, "Committed", "Committed")
+
+# Password hashing
+
+def test_logins_beyond_hasher_queue_return_429(monkeypatch):
+    from backend.services.password_hasher import password_hasher
+
+    async def scenario(client):
+        username = f"busy{uuid.uuid4().hex[:12]}"
+        await client.post("/api/auth/register", json={
+            "username": username, "email": f"{username}@example.com", "password": "secret-pass"
+        })
+        monkeypatch.setattr(password_hasher, "max_queue", 0)
+        login = await client.post("/api/auth/login", data={"username": username, "password": "secret-pass"})
+        register = await client.post("/api/auth/register", json={
+            "username": f"{username}x", "email": f"{username}x@example.com", "password": "secret-pass"
+        })
+        return login, register
+
+    login, register = _run(scenario)
+    assert (login.status_code, register.status_code) == (429, 429)
+    assert login.headers["retry-after"] == "1"
+
+def test_login_rehashes_passwords_stored_with_another_cost():
+    from passlib.hash import bcrypt
+
+    async def scenario(client):
+        user_id, _ = await _register_and_login(client)
+        await _update_user(user_id, hashed_password=bcrypt.using(rounds=5).hash("secret-pass"))
+        async with AsyncSessionLocal() as db:
+            username = await db.scalar(select(User.username).where(User.id == user_id))
+        login = await client.post("/api/auth/login", data={"username": username, "password": "secret-pass"})
+        async with AsyncSessionLocal() as db:
+            stored = await db.scalar(select(User.hashed_password).where(User.id == user_id))
+        return login.status_code, stored
+
+    status_code, stored = _run(scenario)
+    assert status_code == 200
+    assert stored.startswith("$2b$04$")
+
+# Download counter
+
+async def _stored_downloads(listing_id):
+    async with AsyncSessionLocal() as db:
+        return await db.scalar(select(MarketplaceListing.downloads).where(MarketplaceListing.id == listing_id))
+
+def test_installs_are_merged_into_reads_and_flushed_in_one_batch():
+    author = uuid.uuid4().hex
+
+    async def scenario(client):
+        await _create_listings(client, author, 2)
+        listings = (await client.get("/api/marketplace/listings", params={"author": author})).json()
+        first, second = (listing["id"] for listing in listings)
+        for listing_id in (first, first, first, second):
+            assert (await client.post(f"/api/marketplace/listings/{listing_id}/install")).status_code == 200
+
+        counter = marketplace_service.download_counter
+        listed = (await client.get("/api/marketplace/listings", params={"author": author})).json()
+        before_flush = (
+            (await client.get(f"/api/marketplace/listings/{first}")).json()["downloads"],
+            [listing["downloads"] for listing in listed],
+            await _stored_downloads(first),
+            counter.pending(first),
+        )
+        flushed = await counter.flush()
+        after_flush = (
+            (await client.get(f"/api/marketplace/listings/{first}")).json()["downloads"],
+            await _stored_downloads(first),
+            await _stored_downloads(second),
+            counter.pending(first),
+        )
+        return before_flush, flushed, after_flush
+
+    before_flush, flushed, after_flush = _run(scenario)
+    assert before_flush == (3, [3, 1], 0, 3)
+    assert flushed == 2
+    assert after_flush == (3, 3, 1, 0)
+
+def test_install_refreshes_cached_list_pages():
+    author = uuid.uuid4().hex
+
+    async def scenario(client):
+        await _create_listings(client, author, 2)
+        url, params = "/api/marketplace/listings", {"author": author}
+        cached = await client.get(url, params=params)
+        listing_id = cached.json()[0]["id"]
+        await client.post(f"/api/marketplace/listings/{listing_id}/install")
+        refreshed = await client.get(url, params=params, headers={"If-None-Match": cached.headers["etag"]})
+        return refreshed.status_code, [listing["downloads"] for listing in refreshed.json()]
+
+    assert _run(scenario) == (200, [1, 0])
+
+def test_install_unknown_listing_returns_404():
+    async def scenario(client):
+        return (await client.post("/api/marketplace/listings/999999/install")).status_code
+
+    assert _run(scenario) == 404
+
+# Bulk listing import
+
+def test_bulk_import_reports_bad_lines_and_keeps_good_rows():
+    author = uuid.uuid4().hex
+    good = [json.dumps(_listing(author, index)).encode() for index in range(3)]
+    oversized = b'{"name": "' + b"x" * (1024 * 1024 + 10) + b'"}'
+    invalid_row = json.dumps({"author": author}).encode()
+    body = b"\n".join([good[0], b"\xff\xfe", good[1], b"{bad", b"", oversized, invalid_row, good[2]]) + b"\n"
+
+    async def scenario(client):
+        async def chunks():
+            for start in range(0, len(body), 65536):
+                yield body[start:start + 65536]
+
+        response = await client.post("/api/marketplace/listings/bulk", content=chunks(),
+                                     headers={"content-type": "application/x-ndjson"})
+        listed = await client.get("/api/marketplace/listings", params={"author": author})
+        return response, listed
+
+    response, listed = _run(scenario)
+    assert response.status_code == 200
+    result = response.json()
+    assert (result["total"], result["created"], result["failed"]) == (7, 3, 4)
+    errors = [row["error"] for row in result["results"] if row["status"] == "error"]
+    assert errors[0].startswith("Invalid UTF-8")
+    assert errors[1].startswith("Invalid JSON")
+    assert errors[2].startswith("Line exceeds")
+    assert "name" in errors[3]
+    assert sorted(listing["name"] for listing in listed.json()) == ["Listing 0", "Listing 1", "Listing 2"]
+
+def test_bulk_import_accepts_json_arrays():
+    author = uuid.uuid4().hex
+
+    async def scenario(client):
+        imported = await client.post("/api/marketplace/listings/bulk",
+                                     json=[_listing(author, index) for index in range(2)])
+        not_array = await client.post("/api/marketplace/listings/bulk", json={"name": "x"})
+        malformed = await client.post("/api/marketplace/listings/bulk", content=b"[{",
+                                      headers={"content-type": "application/json"})
+        return imported.json(), not_array.status_code, malformed.status_code
+
+    imported, not_array, malformed = _run(scenario)
+    assert (imported["total"], imported["created"]) == (2, 2)
+    assert [row["status"] for row in imported["results"]] == ["created", "created"]
+    assert (not_array, malformed) == (400, 400)
+
+# Bulk agents
+
+def test_bulk_create_inserts_valid_agents_and_reports_invalid_ones():
+    prefix = uuid.uuid4().hex[:8]
+
+    async def scenario(client):
+        response = await client.post("/api/agents/bulk", json={"agents": [
+            {"name": f"{prefix}-a", "capabilities": ["data_analysis", "automation"]},
+            {"name": f"{prefix}-b", "capabilities": ["no_such_capability"]},
+            {"name": "", "capabilities": []},
+            {"name": f"{prefix}-c", "description": "third"},
+        ]})
+        body = response.json()
+        created = [await client.get(f"/api/agents/{row['id']}") for row in body["results"] if row["status"] == "created"]
+        return response.status_code, body, [agent.json() for agent in created]
+
+    status_code, body, created = _run(scenario)
+    assert status_code == 200
+    assert (body["total"], body["created"], body["failed"]) == (4, 2, 2)
+    assert [row["status"] for row in body["results"]] == ["created", "error", "error", "created"]
+    assert "Invalid capabilities: no_such_capability" in body["results"][1]["error"]
+    assert "name is required" in body["results"][2]["error"]
+    assert [(agent["name"], agent["capabilities"]) for agent in created] == [
+        (f"{prefix}-a", ["data_analysis", "automation"]), (f"{prefix}-c", [])
+    ]
+
+def test_bulk_delete_soft_deletes_found_agents_once():
+    from backend.core.agent_manager import agent_manager
+
+    async def scenario(client):
+        first = await _create_agent(client, "bulk delete a")
+        second = await _create_agent(client, "bulk delete b")
+        await client.post(f"/api/agents/{first['id']}/activate")
+        cached = agent_manager.get(first["id"]) is not None
+        response = await client.request("DELETE", "/api/agents/bulk",
+                                        json={"ids": [first["id"], first["id"], 999999, second["id"]]})
+        again = await client.request("DELETE", "/api/agents/bulk", json={"ids": [first["id"]]})
+        lookups = [(await client.get(f"/api/agents/{agent['id']}")).status_code for agent in (first, second)]
+        return cached, agent_manager.get(first["id"]), response.json(), again.json(), lookups
+
+    cached, runtime_after, body, again, lookups = _run(scenario)
+    assert cached and runtime_after is None
+    assert (body["total"], body["deleted"], body["failed"]) == (3, 2, 1)
+    assert body["results"][1] == {"id": 999999, "status": "error", "error": "Agent with ID 999999 not found"}
+    assert (again["deleted"], again["failed"]) == (0, 1)
+    assert lookups == [404, 404]
+
+def test_bulk_requests_over_the_limit_return_413(monkeypatch):
+    monkeypatch.setattr("backend.api.agents.AGENT_BULK_LIMIT", 2)
+
+    async def scenario(client):
+        create = await client.post("/api/agents/bulk", json={"agents": [{"name": f"a{i}"} for i in range(3)]})
+        delete = await client.request("DELETE", "/api/agents/bulk", json={"ids": [1, 2, 3]})
+        return create.status_code, delete.status_code
+
+    assert _run(scenario) == (413, 413)
+
+# Request profiling
+
+def test_profile_routes_require_an_admin():
+    async def scenario(client):
+        anonymous = await client.get("/api/admin/profiles")
+        user_id, headers = await _register_and_login(client, "profiler")
+        as_user = await client.get("/api/admin/profiles", headers=headers)
+        ignored = await client.get("/health", headers=dict(headers, **{"X-Profile": "collapsed"}))
+        await _update_user(user_id, is_admin=True)
+        as_admin = await client.get("/api/admin/profiles", headers=headers)
+        return anonymous.status_code, as_user.status_code, "x-profile-id" in ignored.headers, as_admin.status_code
+
+    assert _run(scenario) == (401, 403, False, 200)
+
+def test_admin_can_profile_a_request_and_download_it():
+    async def scenario(client):
+        admin_id, admin_headers = await _register_and_login(client, "admin")
+        await _update_user(admin_id, is_admin=True)
+        _, user_headers = await _register_and_login(client, "viewer")
+
+        profiled = await client.get("/api/agents/capabilities/available",
+                                    headers=dict(admin_headers, **{"X-Profile": "collapsed"}))
+        profile_id = profiled.headers["x-profile-id"]
+        listed = (await client.get("/api/admin/profiles", headers=admin_headers)).json()
+        download = await client.get(f"/api/admin/profiles/{profile_id}", headers=admin_headers)
+        forbidden = await client.get(f"/api/admin/profiles/{profile_id}", headers=user_headers)
+        missing = await client.get("/api/admin/profiles/does-not-exist", headers=admin_headers)
+        return profiled.status_code, profile_id, listed, download, forbidden.status_code, missing.status_code
+
+    status_code, profile_id, listed, download, forbidden, missing = _run(scenario)
+    assert status_code == 200
+    entry = next(profile for profile in listed if profile["id"] == profile_id)
+    assert (entry["path"], entry["format"], entry["status"]) == ("/api/agents/capabilities/available", "collapsed", 200)
+    assert download.status_code == 200
+    assert download.headers["content-type"].startswith("text/plain")
+    assert (forbidden, missing) == (403, 404)
+
+# NDJSON export
+
+def _ndjson(body):
+    return [json.loads(line) for line in body.splitlines()]
+
+def test_agent_export_streams_active_agents_and_resumes():
+    from backend.api.agents import agent_service
+    prefix = uuid.uuid4().hex[:8]
+
+    async def scenario(client):
+        agents = [await _create_agent(client, f"{prefix}-{index}", ["automation"]) for index in range(3)]
+        await client.delete(f"/api/agents/{agents[1]['id']}")
+        first_id = agents[0]["id"] - 1
+        exported = await client.get("/api/agents/export", params={"after_id": first_id},
+                                    headers={"Accept-Encoding": "identity"})
+        resumed = await client.get("/api/agents/export", params={"after_id": agents[0]["id"]},
+                                   headers={"Accept-Encoding": "identity"})
+        batches = [chunk async for chunk in agent_service.export_agents(first_id, batch_size=1)]
+        return agents, exported, resumed, batches
+
+    agents, exported, resumed, batches = _run(scenario)
+    assert exported.status_code == 200
+    assert exported.headers["content-type"].startswith("application/x-ndjson")
+    assert "content-encoding" not in exported.headers
+    rows = [row for row in _ndjson(exported.content) if row["name"].startswith(agents[0]["name"][:8])]
+    assert [row["id"] for row in rows] == [agents[0]["id"], agents[2]["id"]]
+    assert rows[0]["capabilities"] == ["automation"]
+    assert agents[0]["id"] not in [row["id"] for row in _ndjson(resumed.content)]
+    assert all(len(_ndjson(batch)) == 1 for batch in batches)
+
+def test_listing_export_is_gzipped_when_accepted():
+    author = uuid.uuid4().hex
+
+    async def scenario(client):
+        await _create_listings(client, author, 3)
+        async with client.stream("GET", "/api/marketplace/listings/export",
+                                 headers={"Accept-Encoding": "gzip"}) as response:
+            raw = b"".join([chunk async for chunk in response.aiter_raw()])
+            return response.headers, raw
+
+    headers, raw = _run(scenario)
+    assert headers["content-encoding"] == "gzip"
+    assert headers["vary"] == "Accept-Encoding"
+    rows = [row for row in _ndjson(gzip.decompress(raw)) if row["author"] == author]
+    assert [row["name"] for row in rows] == ["Listing 0", "Listing 1", "Listing 2"]
+
+# Agent runtimes
+
+def test_activate_caches_runtime_and_deactivate_drops_it():
+    from backend.core.agent_manager import agent_manager
+
+    async def scenario(client):
+        agent = await _create_agent(client, "runtime toggler")
+        activated = await client.post(f"/api/agents/{agent['id']}/activate")
+        cached = agent_manager.get(agent["id"])
+        deactivated = await client.post(f"/api/agents/{agent['id']}/deactivate")
+        return activated.json(), cached, deactivated.json(), agent_manager.get(agent["id"])
+
+    activated, cached, deactivated, after = _run(scenario)
+    assert activated["status"] == "active" and cached.status == "active"
+    assert deactivated["status"] == "inactive" and after is None
+
+def test_inactive_agent_dispatches_without_being_cached():
+    from backend.core.agent_manager import agent_manager
+
+    async def scenario(client):
+        agent = await _create_agent(client, "inactive dispatcher")
+        await client.post(f"/api/agents/{agent['id']}/activate")
+        await client.post(f"/api/agents/{agent['id']}/deactivate")
+        task = await client.post(f"/api/agents/{agent['id']}/tasks",
+                                 json={"type": "data_analysis", "data": {"data": [1, 2]}})
+        runtime = await client.get(f"/api/agents/{agent['id']}/runtime")
+        return task.status_code, runtime.json(), agent_manager.get(agent["id"])
+
+    task_status, runtime, cached = _run(scenario)
+    assert task_status == 202
+    assert runtime["status"] == "inactive"
+    assert cached is None
+
+def test_status_change_of_unknown_agent_returns_404():
+    async def scenario(client):
+        activate = await client.post("/api/agents/999999/activate")
+        deactivate = await client.post("/api/agents/999999/deactivate")
+        return activate.status_code, deactivate.status_code
+
+    assert _run(scenario) == (404, 404)
+
+# Pipelines
+
+def test_pipeline_feeds_step_outputs_into_later_steps():
+    async def scenario(client):
+        agent = await _create_agent(client, "pipeliner", ["data_analysis", "text_processing"])
+        return await client.post(f"/api/agents/{agent['id']}/pipelines", json={"steps": [
+            {"id": "stats", "capability": "data_analysis", "input": {"data": [1, 2, 3]}},
+            {"id": "words", "capability": "text_processing", "inputs": {"text": "stats.type"}},
+        ]})
+
+    response = _run(scenario)
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert body["status"] == "completed"
+    assert [step["status"] for step in body["steps"]] == ["completed", "completed"]
+    assert body["steps"][1]["result"]["processed_text"] == "Processed: numeric"
+
+def test_pipeline_rejects_unavailable_capability_and_full_queue(monkeypatch):
+    from backend.core.agent_manager import task_manager
+
+    async def scenario(client):
+        agent = await _create_agent(client, "limited pipeliner", ["data_analysis"])
+        url = f"/api/agents/{agent['id']}/pipelines"
+        unavailable = await client.post(url, json={"steps": [{"id": "a", "capability": "text_processing"}]})
+        monkeypatch.setattr(task_manager, "max_pending", 1)
+        full = await client.post(url, json={"steps": [
+            {"id": "a", "capability": "data_analysis", "input": {"data": [1]}},
+            {"id": "b", "capability": "data_analysis", "input": {"data": [2]}},
+        ]})
+        return unavailable, full.status_code
+
+    unavailable, full_status = _run(scenario)
+    assert unavailable.status_code == 400
+    assert "unavailable capability 'text_processing'" in unavailable.json()["detail"]
+    assert full_status == 429
@@ -0,0 +1,585 @@
+import asyncio
+import json
+import math
+import random
+import statistics
+import sys
+import threading
+import time
+import types
+from datetime import datetime
+from importlib.metadata import EntryPoint
+
+import pytest
+from sqlalchemy import Column, Integer, String, create_engine, select, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import declarative_base
+
+from backend.core import analysis, capabilities
+from backend.core.agent_manager import JOB_COMPLETED, TaskManager, TaskQueueFullError
+from backend.core.pipeline import Pipeline, PipelineError, PipelineStep
+from backend.core.result_cache import ResultCache
+from backend.db.migrations import SCHEMA_VERSION, get_schema_version, run_migrations
+from backend.db.models import Base
+from backend.db.search import build_match_query
+from backend.db.writer import GroupCommitWriter
+from backend.services.password_hasher import PasswordHasher, PasswordHasherBusyError
+from backend.utils.cache import TTLCache
+from backend.utils.helpers import decode_cursor, encode_cursor
+
+class _FakeAgent:
+    """Stands in for an AgentRuntime; tasks block until `release` is set"""
+
+    def __init__(self, agent_id=1, capabilities=("echo",)):
+        self.id = agent_id
+        self.capabilities = frozenset(capabilities)
+        self.release = threading.Event()
+        self.release.set()
+
+    def process_task(self, task_input):
+        return self.execute(task_input.get("type", ""), task_input.get("data", {}))
+
+    def execute(self, capability, data):
+        self.release.wait(5)
+        if capability not in self.capabilities:
+            return {"error": f"No matching capability for task type '{capability}'"}
+        if data.get("fail"):
+            return {"error": "failed on purpose"}
+        return {"capability": capability, "echo": data}
+
+def _wait_for_job(manager, job_id, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = manager.get_job(job_id)
+        if job["status"] in ("completed", "failed"):
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"Job {job_id} did not finish")
+
+# Task queue
+
+def test_submitted_task_runs_on_worker_pool():
+    manager = TaskManager(max_workers=2, max_pending=4)
+    try:
+        job = manager.submit(_FakeAgent(), {"type": "echo", "data": {"x": 1}})
+        assert job["status"] == "queued"
+        finished = _wait_for_job(manager, job["id"])
+        assert finished["status"] == JOB_COMPLETED
+        assert finished["result"] == {"capability": "echo", "echo": {"x": 1}}
+        assert manager.get_stats()["pending"] == 0
+    finally:
+        manager.shutdown(wait=True)
+
+def test_submit_rejects_when_queue_is_full():
+    manager = TaskManager(max_workers=1, max_pending=2)
+    agent = _FakeAgent()
+    agent.release.clear()
+    try:
+        jobs = [manager.submit(agent, {"type": "echo"}) for _ in range(2)]
+        with pytest.raises(TaskQueueFullError):
+            manager.submit(agent, {"type": "echo"})
+        agent.release.set()
+        for job in jobs:
+            _wait_for_job(manager, job["id"])
+        assert manager.submit(agent, {"type": "echo"})["status"] == "queued"
+    finally:
+        agent.release.set()
+        manager.shutdown(wait=True)
+
+# Batches
+
+def test_batch_keeps_input_order_across_capability_groups(monkeypatch):
+    monkeypatch.setattr("backend.core.agent_manager.TASK_BATCH_CHUNK_SIZE", 2)
+    manager = TaskManager(max_workers=2, max_pending=10)
+    agent = _FakeAgent(capabilities=("echo", "shout"))
+    tasks = [
+        {"type": "echo", "data": {"i": 0}},
+        {"type": "shout", "data": {"i": 1}},
+        {"type": "missing", "data": {"i": 2}},
+        {"type": "echo", "data": {"i": 3, "fail": True}},
+        {"type": "echo", "data": {"i": 4}},
+    ]
+    try:
+        results = asyncio.run(manager.run_batch(agent, tasks))
+    finally:
+        manager.shutdown(wait=True)
+    assert [entry["index"] for entry in results] == [0, 1, 2, 3, 4]
+    assert [entry["status"] for entry in results] == ["completed", "completed", "failed", "failed", "completed"]
+    assert results[1]["result"] == {"capability": "shout", "echo": {"i": 1}}
+    assert results[2]["error"] == "No matching capability for task type 'missing'"
+    assert manager.get_stats()["pending"] == 0
+
+def test_batch_chunks_count_against_queue_limit(monkeypatch):
+    monkeypatch.setattr("backend.core.agent_manager.TASK_BATCH_CHUNK_SIZE", 1)
+    manager = TaskManager(max_workers=2, max_pending=3)
+    agent = _FakeAgent()
+    tasks = [{"type": "echo", "data": {"i": i}} for i in range(4)]
+    try:
+        with pytest.raises(TaskQueueFullError):
+            asyncio.run(manager.run_batch(agent, tasks))
+        assert manager.get_stats()["pending"] == 0
+        assert len(asyncio.run(manager.run_batch(agent, tasks[:3]))) == 3
+        assert manager.get_stats()["pending"] == 0
+    finally:
+        manager.shutdown(wait=True)
+
+# Statistics engine
+
+@pytest.fixture(params=["numpy", "pure"])
+def stats_backend(request, monkeypatch):
+    """Run a test with NumPy and again with the pure Python fallback"""
+    if request.param == "numpy":
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(analysis, "_numpy", None)
+        monkeypatch.setattr(analysis, "_numpy_loaded", True)
+    return request.param
+
+def test_numeric_stats_match_reference(stats_backend):
+    values = [random.Random(3).uniform(-50, 150) for _ in range(1001)]
+    result = analysis.analyze_data(values, percentiles=[50, 90], bins=4)
+    assert result["type"] == "numeric"
+    assert result["average"] == pytest.approx(statistics.fmean(values))
+    assert result["variance"] == pytest.approx(statistics.pvariance(values))
+    assert (result["min"], result["max"]) == (min(values), max(values))
+    assert result["percentiles"]["p50"] == pytest.approx(statistics.median(values))
+    assert sum(result["histogram"]["counts"]) == len(values)
+    assert len(result["histogram"]["bin_edges"]) == 5
+
+def test_mixed_input_is_partitioned_by_type(stats_backend):
+    result = analysis.analyze_data([1, "a", 2.5, None, "a", True, {"k": 1}, "b"])
+    assert result["type"] == "mixed"
+    assert result["numeric_count"] == 3
+    assert result["type_counts"] == {"string": 3, "null": 1, "object": 1, "number": 3}
+    assert result["strings"]["top"][0] == {"value": "a", "count": 2}
+
+def test_non_finite_values_are_counted_not_summarized(stats_backend):
+    result = analysis.analyze_data([1, 2, float("nan"), math.inf, -math.inf, 3])
+    assert result["numeric_count"] == 3
+    assert (result["min"], result["max"], result["average"]) == (1, 3, 2)
+    assert result["type_counts"] == {analysis.NON_FINITE: 3, "number": 3}
+    assert sum(result["histogram"]["counts"]) == 3
+
+    only_nan = analysis.analyze_data([float("nan")])
+    assert "average" not in only_nan
+    assert only_nan["type_counts"][analysis.NON_FINITE] == 1
+
+def test_streaming_matches_batch_analysis(stats_backend):
+    values = [random.Random(5).gauss(10, 3) for _ in range(5000)] + [float("nan"), "x"]
+    streaming = analysis.StreamingAnalyzer(reservoir_size=10000)
+    for start in range(0, len(values), 700):
+        streaming.feed(values[start:start + 700])
+    streamed = streaming.result()
+    batch = analysis.analyze_data(values)
+    for field in ("count", "numeric_count", "min", "max"):
+        assert streamed[field] == batch[field]
+    assert streamed["average"] == pytest.approx(batch["average"])
+    assert streamed["variance"] == pytest.approx(batch["variance"])
+    assert streamed["type_counts"] == batch["type_counts"]
+
+# Streaming ingestion
+
+def test_csv_column_resolves_header_names_before_indexes():
+    parser = analysis.CsvValueParser(column="2024")
+    assert parser.parse(["year,2024,2025", "a,1,2", "b,3,"]) == [1.0, 3.0]
+
+    by_index = analysis.CsvValueParser(column="2")
+    assert by_index.parse(["name,x,y", "a,1,2", "b,3"]) == [2.0, None]
+
+    headerless = analysis.CsvValueParser(column="1", has_header=False)
+    assert headerless.parse(["1,2", "3,four"]) == [2.0, "four"]
+
+@pytest.mark.parametrize("column, has_header, message", [
+    ("missing", True, "not found in CSV header"),
+    ("name", False, "must be a 0-based index"),
+])
+def test_csv_column_errors(column, has_header, message):
+    parser = analysis.CsvValueParser(column=column, has_header=has_header)
+    with pytest.raises(ValueError, match=message):
+        parser.parse(["name,value", "a,1"])
+
+def test_csv_quoted_newlines_carry_over_between_batches():
+    parser = analysis.CsvValueParser(column="value")
+    assert parser.parse(['note,value', '"first', 'line",1', '"second'], final=False) == [1.0]
+    assert parser.parse(['line, with comma",2', 'plain,3']) == [2.0, 3.0]
+
+def test_csv_unclosed_quote_is_rejected():
+    parser = analysis.CsvValueParser()
+    assert parser.parse(["value", '"open'], final=False) == []
+    with pytest.raises(ValueError, match="not closed"):
+        parser.parse(["still open"])
+
+    bounded = analysis.CsvValueParser(max_record_bytes=16)
+    with pytest.raises(ValueError, match="exceeds 16 bytes"):
+        bounded.parse(["value", '"' + "x" * 20], final=False)
+
+def test_ndjson_parser_reads_scalars_and_object_fields():
+    assert analysis.NdjsonValueParser().parse(["1", "", "2.5", '"x"']) == [1, 2.5, "x"]
+    assert analysis.NdjsonValueParser(field="v").parse(['{"v": 3}', '{"w": 1}']) == [3, None]
+    with pytest.raises(ValueError, match="require a field name"):
+        analysis.NdjsonValueParser().parse(['{"v": 3}'])
+
+def test_line_buffer_holds_partial_lines():
+    buffer = analysis.LineBuffer(max_line_bytes=8)
+    assert buffer.feed(b"1\n2") == ["1"]
+    assert buffer.feed(b"2\n3") == ["22"]
+    assert buffer.close() == ["3"]
+    with pytest.raises(ValueError, match="exceeds 8 bytes"):
+        buffer.feed(b"x" * 9)
+
+# Capability registry
+
+@pytest.fixture
+def plugin_modules(monkeypatch):
+    """A plugin shipping a spec module and a handler module that must stay unimported"""
+    spec_module = types.ModuleType("aistaff_test_plugin_spec")
+    spec_module.SPEC = capabilities.CapabilitySpec(
+        "sentiment", "aistaff_test_plugin_impl:run", "Sentiment scoring",
+        capabilities.COST_HIGH, cpu_bound=True, cacheable=True, cache_ttl=30
+    )
+    spec_module.NOT_A_SPEC = object()
+    monkeypatch.setitem(sys.modules, "aistaff_test_plugin_spec", spec_module)
+
+    handler_module = types.ModuleType("aistaff_test_plugin_impl")
+    handler_module.run = lambda data: {"score": 1}
+    handler_module.classify = lambda data: {"label": "ok"}
+    return handler_module
+
+def _registry_with_entry_points(monkeypatch, advertised):
+    monkeypatch.setattr(capabilities, "entry_points", lambda group: advertised.get(group, []))
+    return capabilities.CapabilityRegistry()
+
+def test_registry_discovers_plugin_specs_without_importing_handlers(monkeypatch, plugin_modules):
+    spec_group, plain_group = capabilities.SPEC_ENTRY_POINT_GROUP, capabilities.ENTRY_POINT_GROUP
+    registry = _registry_with_entry_points(monkeypatch, {
+        spec_group: [
+            EntryPoint("sentiment", "aistaff_test_plugin_spec:SPEC", spec_group),
+            EntryPoint("broken", "aistaff_test_plugin_spec:NOT_A_SPEC", spec_group),
+            EntryPoint("missing", "aistaff_test_no_such_module:SPEC", spec_group),
+        ],
+        plain_group: [EntryPoint("classify", "aistaff_test_plugin_impl:classify", plain_group)],
+    })
+
+    assert registry.names == frozenset({"sentiment", "classify"})
+    sentiment = registry.get_spec("sentiment").to_dict()
+    assert (sentiment["cost_class"], sentiment["cpu_bound"], sentiment["cacheable"]) == ("high", True, True)
+    assert registry.get_spec("classify").cost_class == capabilities.COST_LOW
+    assert "aistaff_test_plugin_impl" not in sys.modules
+
+    monkeypatch.setitem(sys.modules, "aistaff_test_plugin_impl", plugin_modules)
+    assert registry.get_handler("sentiment")({}) == {"score": 1}
+    assert registry.get_handler("classify")({}) == {"label": "ok"}
+
+def test_registry_ignores_duplicate_registrations(monkeypatch):
+    registry = _registry_with_entry_points(monkeypatch, {})
+    registry.register(capabilities.CapabilitySpec("echo", "mod:first"))
+    registry.register(capabilities.CapabilitySpec("echo", "mod:second"))
+    assert registry.get_spec("echo").target == "mod:first"
+    registry.register(capabilities.CapabilitySpec("echo", "mod:second"), replace=True)
+    assert registry.get_spec("echo").target == "mod:second"
+    with pytest.raises(KeyError):
+        registry.get_handler("unknown")
+
+def test_factory_dedupes_and_filters_capabilities():
+    from backend.core.factory import agent_factory
+
+    config = agent_factory.create_agent(
+        "dedupe", capabilities=["automation", "unknown", "data_analysis", "automation"]
+    )
+    assert config["capabilities"] == ["automation", "data_analysis"]
+
+# Keyset cursors
+
+def test_cursor_round_trip():
+    created = datetime(2024, 5, 1, 12, 30, 15, 250000)
+    sort, value, last_id = decode_cursor(encode_cursor("-created_at", created, 42))
+    assert (sort, last_id) == ("-created_at", 42)
+    assert datetime.fromisoformat(value) == created
+
+    cursor = encode_cursor("name", "Zoë & co", 7)
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == ("name", "Zoë & co", 7)
+
+@pytest.mark.parametrize("cursor", ["", "not-a-cursor", encode_cursor("id", 1, "7")])
+def test_cursor_rejects_malformed(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+# Listing search
+
+@pytest.mark.parametrize("query, expected", [
+    ("data anal", '"data"* "anal"*'),
+    ('name:"x" OR y*', '"name"* "x"* "OR"* "y"*'),
+    ("NEAR(a b) -c ^d", '"NEAR"* "a"* "b"* "c"* "d"*'),
+    ("Café  déjà", '"Café"* "déjà"*'),
+])
+def test_match_query_quotes_every_term(query, expected):
+    assert build_match_query(query) == expected
+
+@pytest.mark.parametrize("query", ["", "   ", '"*()-:^'])
+def test_match_query_without_terms(query):
+    assert build_match_query(query) is None
+
+# Schema migrations
+
+def test_migration_moves_json_capabilities_and_drops_column(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    try:
+        Base.metadata.create_all(bind=engine)
+        with engine.begin() as conn:
+            # Recreate the pre-migration layout: capabilities as a JSON text column
+            conn.execute(text("ALTER TABLE agents ADD COLUMN capabilities TEXT"))
+            conn.execute(text("ALTER TABLE marketplace_listings ADD COLUMN capabilities TEXT"))
+            conn.execute(
+                text("INSERT INTO agents (id, name, capabilities) VALUES (:id, :name, :capabilities)"),
+                [
+                    {"id": 1, "name": "a", "capabilities": json.dumps(["data_analysis", "automation", "data_analysis"])},
+                    {"id": 2, "name": "b", "capabilities": "not json"},
+                ]
+            )
+            conn.execute(
+                text("INSERT INTO marketplace_listings (id, name, capabilities) VALUES (1, 'l', :capabilities)"),
+                {"capabilities": json.dumps(["text_processing"])}
+            )
+
+        run_migrations(engine)
+        run_migrations(engine)
+
+        with engine.connect() as conn:
+            assert get_schema_version(conn) == SCHEMA_VERSION
+            for table in ("agents", "marketplace_listings"):
+                columns = [row[1] for row in conn.execute(text(f"PRAGMA table_info({table})"))]
+                assert "capabilities" not in columns
+            agent_links = conn.execute(
+                text("SELECT agent_id, name, position FROM agent_capabilities ORDER BY agent_id, position")
+            ).all()
+            listing_links = conn.execute(
+                text("SELECT listing_id, name, position FROM marketplace_listing_capabilities")
+            ).all()
+        assert [tuple(row) for row in agent_links] == [(1, "data_analysis", 0), (1, "automation", 1)]
+        assert [tuple(row) for row in listing_links] == [(1, "text_processing", 0)]
+    finally:
+        engine.dispose()
+
+# Response cache generations
+
+def test_cache_discards_store_racing_an_invalidation():
+    cache = TTLCache(maxsize=8, ttl=60)
+    generation = cache.generation
+    cache.invalidate_tags("listing:1")
+    assert not cache.set("/listings/1", "stale", tags=["listing:1"], generation=generation)
+    assert cache.get("/listings/1") is None
+
+    cache.invalidate("agent:1")
+    assert not cache.set("agent:1", "stale", generation=generation)
+
+def test_cache_keeps_store_unrelated_to_the_invalidation():
+    cache = TTLCache(maxsize=8, ttl=60)
+    generation = cache.generation
+    cache.invalidate_tags("listing:1")
+    cache.invalidate("agent:2")
+    assert cache.set("/listings", "page", tags=["listings"], generation=generation)
+    assert cache.get("/listings") == "page"
+
+def test_cache_discards_stores_older_than_the_invalidation_log():
+    cache = TTLCache(maxsize=8, ttl=60, log_size=2)
+    generation = cache.generation
+    for i in range(3):
+        cache.invalidate_tags(f"listing:{i}")
+    assert not cache.set("/listings", "page", tags=["listings"], generation=generation)
+    assert cache.set("/listings", "page", tags=["listings"], generation=cache.generation)
+
+    generation = cache.generation
+    cache.clear()
+    assert not cache.set("/listings", "page", tags=["listings"], generation=generation)
+
+def test_cache_evicts_least_recently_used_and_expires():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == (1, None, 3)
+    cache.set("d", 4, ttl=-1)
+    assert cache.get("d") is None
+    assert cache.stats()["evictions"] == 2
+
+# Password hashing
+
+class _BlockingContext:
+    """Password context whose hash blocks until released"""
+
+    def __init__(self):
+        self.release = threading.Event()
+
+    def hash(self, password):
+        self.release.wait(5)
+        return f"hashed:{password}"
+
+def test_password_hasher_rejects_beyond_queue_limit(monkeypatch):
+    context = _BlockingContext()
+    monkeypatch.setattr("backend.services.password_hasher.get_pwd_context", lambda: context)
+    hasher = PasswordHasher(max_workers=1, max_queue=2)
+
+    async def scenario():
+        running = [asyncio.ensure_future(hasher.hash(f"p{i}")) for i in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(PasswordHasherBusyError):
+            await hasher.hash("rejected")
+        in_flight = hasher.get_stats()["in_flight"]
+        context.release.set()
+        return in_flight, await asyncio.gather(*running)
+
+    try:
+        in_flight, hashes = asyncio.run(scenario())
+    finally:
+        context.release.set()
+        hasher.shutdown()
+    assert in_flight == 2
+    assert hashes == ["hashed:p0", "hashed:p1"]
+    assert hasher.get_stats()["in_flight"] == 0
+    assert hasher.rejected == 1
+
+# Group-commit writer
+
+_WriterBase = declarative_base()
+
+class _Note(_WriterBase):
+    __tablename__ = "notes"
+
+    id = Column(Integer, primary_key=True)
+    body = Column(String(50), nullable=False)
+
+def _run_writer(tmp_path, units):
+    """Run units of work concurrently through a fresh writer; returns (outcomes, stored bodies, writer)"""
+    async def scenario():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'writer.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(_WriterBase.metadata.create_all)
+        writer = GroupCommitWriter(async_sessionmaker(engine, expire_on_commit=False), max_batch=64)
+        try:
+            outcomes = await asyncio.gather(*(writer.run(unit) for unit in units), return_exceptions=True)
+            await writer.stop()
+            async with engine.connect() as conn:
+                bodies = sorted(row[0] for row in await conn.execute(select(_Note.body)))
+        finally:
+            await engine.dispose()
+        return outcomes, bodies, writer
+    return asyncio.run(scenario())
+
+def _insert(body):
+    async def work(session):
+        session.add(_Note(body=body))
+        await session.flush()
+        return body
+    return work
+
+def _failing(body):
+    async def work(session):
+        session.add(_Note(body=body))
+        await session.flush()
+        raise RuntimeError(f"rejected {body}")
+    return work
+
+def test_group_commit_merges_concurrent_writes(tmp_path):
+    outcomes, bodies, writer = _run_writer(tmp_path, [_insert(f"n{i}") for i in range(20)])
+    assert outcomes == [f"n{i}" for i in range(20)]
+    assert bodies == sorted(f"n{i}" for i in range(20))
+    stats = writer.get_stats()
+    assert stats["writes"] == 20
+    assert stats["commits"] < 20
+    assert stats["largest_batch"] > 1
+
+def test_group_commit_rolls_back_failing_unit_alone(tmp_path):
+    outcomes, bodies, writer = _run_writer(tmp_path, [_insert("a"), _failing("b"), _insert("c")])
+    assert outcomes[0] == "a" and outcomes[2] == "c"
+    assert isinstance(outcomes[1], RuntimeError)
+    assert bodies == ["a", "c"]
+    assert writer.get_stats()["failed"] == 1
+
+# Capability result cache
+
+def test_result_cache_key_ignores_dict_order():
+    first = ResultCache.make_key("data_analysis", {"data": [1, 2], "bins": 5})
+    second = ResultCache.make_key("data_analysis", {"bins": 5, "data": [1, 2]})
+    assert first == second
+    assert first[0] == "data_analysis"
+
+def test_result_cache_key_separates_capabilities_and_inputs():
+    key = ResultCache.make_key("data_analysis", {"data": [1, 2]})
+    assert key != ResultCache.make_key("text_processing", {"data": [1, 2]})
+    assert key != ResultCache.make_key("data_analysis", {"data": [2, 1]})
+
+def test_result_cache_key_none_without_canonical_json():
+    assert ResultCache.make_key("data_analysis", {"data": {1, 2}}) is None
+
+def test_result_cache_returns_copies():
+    cache = ResultCache(maxsize=4, max_bytes=1 << 20, default_ttl=60)
+    key = ResultCache.make_key("text_processing", {"text": "hi"})
+    assert cache.get(key) is None
+    assert cache.set(key, {"words": ["hi"]})
+    hit = cache.get(key)
+    hit["words"].append("mutated")
+    assert cache.get(key) == {"words": ["hi"]}
+    stats = cache.stats()["capabilities"]["text_processing"]
+    assert (stats["hits"], stats["misses"], stats["stores"]) == (2, 1, 1)
+
+def test_result_cache_bounds_entries_bytes_and_age():
+    cache = ResultCache(maxsize=2, max_bytes=4096, default_ttl=60)
+    keys = [ResultCache.make_key("data_analysis", {"data": [index]}) for index in range(3)]
+    for key in keys:
+        cache.set(key, {"average": 1})
+    assert cache.get(keys[0]) is None
+    assert cache.get(keys[2]) == {"average": 1}
+    assert not cache.set(keys[0], {"blob": "x" * 8192})
+    cache.set(keys[0], {"average": 0}, ttl=-1)
+    assert cache.get(keys[0]) is None
+    stats = cache.stats()
+    assert stats["size"] == 1
+    assert (stats["evictions"], stats["expirations"]) == (2, 1)
+
+# Pipelines
+
+def test_pipeline_orders_steps_in_layers():
+    pipeline = Pipeline([
+        PipelineStep("report", "automation", inputs={"task": "stats.average"}, depends_on=["text"]),
+        PipelineStep("stats", "data_analysis", {"data": [1, 2, 3]}),
+        PipelineStep("text", "text_processing", {"text": "hello"}),
+    ])
+    assert pipeline.layers == [["stats", "text"], ["report"]]
+    assert pipeline.steps["report"].depends_on == ("text", "stats")
+
+def test_pipeline_rejects_cycle():
+    with pytest.raises(PipelineError, match="cycle through steps: a, b"):
+        Pipeline([
+            PipelineStep("a", "automation", inputs={"task": "b.result"}),
+            PipelineStep("b", "automation", depends_on=["a"]),
+            PipelineStep("c", "automation"),
+        ])
+
+@pytest.mark.parametrize("steps, message", [
+    ([PipelineStep("a", "automation", inputs={"task": "missing.value"})], "unknown step 'missing'"),
+    ([PipelineStep("a", "automation", depends_on=["b"])], "unknown step 'b'"),
+    ([PipelineStep("a", "automation", depends_on=["a"])], "depends on itself"),
+    ([PipelineStep("a", "automation"), PipelineStep("a", "automation")], "Duplicate step id"),
+    ([], "no steps"),
+])
+def test_pipeline_rejects_invalid_references(steps, message):
+    with pytest.raises(PipelineError, match=message):
+        Pipeline(steps)
+
+def test_pipeline_skips_dependents_of_failed_step():
+    def execute(capability, data):
+        if capability == "data_analysis":
+            return {"error": "No data provided"}
+        return {"echo": data}
+
+    pipeline = Pipeline([
+        PipelineStep("stats", "data_analysis"),
+        PipelineStep("report", "automation", inputs={"task": "stats.average"}),
+        PipelineStep("text", "text_processing", {"text": "hi"}),
+    ])
+    result = asyncio.run(pipeline.run(execute))
+    statuses = {step["id"]: step["status"] for step in result["steps"]}
+    assert result["status"] == "failed"
+    assert statuses == {"stats": "failed", "report": "skipped", "text": "completed"}